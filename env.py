@@ -12,6 +12,35 @@ def get_missing_env():
         "SYS_DEBUG"
     ]))
 
+def get_pool_env(prefix, pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping=True):
+    """ Returns the sqlalchemy pool engine options from the optional prefixed environment vars or its defaults """
+
+    def get_env(name, default):
+        value = os.getenv(prefix + name)
+        if value == None:
+            return default
+        if isinstance(default, bool):
+            return value.lower() == "true"
+        return int(value)
+
+    return {
+        "pool_size": get_env("_SIZE", pool_size),
+        "max_overflow": get_env("_MAX_OVERFLOW", max_overflow),
+        "pool_timeout": get_env("_TIMEOUT", pool_timeout),
+        "pool_recycle": get_env("_RECYCLE", pool_recycle),
+        "pool_pre_ping": get_env("_PRE_PING", pool_pre_ping)
+    }
+
+def get_rate_limit_env(name, hits, window_seconds):
+    """ Returns the (hits, window seconds) of a rate limit from its optional environment var, formatted as hits/seconds """
+
+    value = os.getenv(name)
+    if value == None:
+        return hits, window_seconds
+
+    hits, window_seconds = value.split("/")
+    return int(hits), int(window_seconds)
+
 if get_missing_env():
 
     print("# Loading and checking environment from .env")
@@ -35,6 +64,75 @@ MYSQL = {
 }
 DB_URI = "mysql+pymysql://%(user)s:%(password)s@%(host)s:%(port)s/%(schema)s" % MYSQL
 
+# mysql pool envs, recycles connections before mysql wait_timeout closes them
+#   SQL_POOL_* is used by the web app and SQL_BACKGROUND_POOL_* by the background scheduler thread
+SQL_POOL = get_pool_env("SQL_POOL", pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800)
+SQL_BACKGROUND_POOL = get_pool_env("SQL_BACKGROUND_POOL", pool_size=2, max_overflow=2, pool_timeout=30, pool_recycle=1800)
+
+# applies the pending sql/migrations scripts when the server starts, otherwise run migrate.py
+SQL_MIGRATE_ON_STARTUP = os.getenv("SQL_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+# reads the advisor students from the user_has_profile_advisor_student_count table, kept current on each user solicitation write
+#   it must be rebuilt with python migrate.py --rebuild-advisor-student-counts before enabling it
+ADVISOR_STUDENT_COUNT_TABLE = os.getenv("ADVISOR_STUDENT_COUNT_TABLE", "false").lower() == "true"
+
+# optional mysql read replica envs, missing SQL_REPLICA_* connection envs default to the primary ones
+#   SQL_REPLICA_URI accepts any sqlalchemy uri instead, like a sqlite file standing in for the replica
+MYSQL_REPLICA = {key: os.getenv("SQL_REPLICA_" + key.upper()) or value for key, value in MYSQL.items()}
+REPLICA_DB_URI = os.getenv("SQL_REPLICA_URI")
+if REPLICA_DB_URI == None and os.getenv("SQL_REPLICA_HOST") != None:
+    REPLICA_DB_URI = "mysql+pymysql://%(user)s:%(password)s@%(host)s:%(port)s/%(schema)s" % MYSQL_REPLICA
+SQL_REPLICA_POOL = get_pool_env("SQL_REPLICA_POOL", pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800)
+
+# seconds that a user reads from the primary after its own writes, covers the replica lag
+SQL_REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv("SQL_REPLICA_READ_YOUR_WRITES_SECONDS", "5"))
+
+# cache backend envs, "local" keeps the caches in each worker and "sqlite" shares them with the workers of the host
+#   through the CACHE_SQLITE_PATH file, whose writes and invalidations are seen by every worker
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./cache.sqlite3")
+
+# jwt signing algorithm, RS256, ES256 or EdDSA, and the optional kid of the signing key, the newest key of the algorithm if missing
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "RS256")
+JWT_SIGNING_KID = os.getenv("JWT_SIGNING_KID")
+
+# password key derivation, scrypt or pbkdf2_sha256, its optional cost and the workers and seconds of its pool
+#   the cost is the log2 of n for scrypt (default 14) and the iterations for pbkdf2_sha256 (default 600000)
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+PASSWORD_HASH_COST = int(os.getenv("PASSWORD_HASH_COST")) if os.getenv("PASSWORD_HASH_COST") else None
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# sliding window limits of the login and signup posts by client ip and by email, formatted as hits/seconds
+#   RATE_LIMIT_SHARED counts the hits of every worker through the cache backend
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "false").lower() == "true"
+RATE_LIMITS = {
+    "login_ip": get_rate_limit_env("RATE_LIMIT_LOGIN_IP", 30, 60),
+    "login_email": get_rate_limit_env("RATE_LIMIT_LOGIN_EMAIL", 10, 300),
+    "signup_ip": get_rate_limit_env("RATE_LIMIT_SIGNUP_IP", 10, 600),
+    "signup_email": get_rate_limit_env("RATE_LIMIT_SIGNUP_EMAIL", 3, 600)
+}
+
+# quantity of reverse proxies in front of the server whose X-Forwarded-For is trusted, the rate limits count the client ip it forwards
+#   must be 0 when the server is reached directly, otherwise clients could choose the ip they are counted by
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
+# seconds of the login access jwt and of its refresh jwt, renewed at /login/refresh
+#   JWT_ACCESS_TOKEN_SECONDS=0 keeps the login answering only the access jwt, without exp
+JWT_ACCESS_TOKEN_SECONDS = int(os.getenv("JWT_ACCESS_TOKEN_SECONDS", "0"))
+JWT_REFRESH_TOKEN_SECONDS = int(os.getenv("JWT_REFRESH_TOKEN_SECONDS", "604800"))
+
+# signs only the user id, profile acronyms, role keys and exp in the login jwt, the server expands the profiles
+#   the front end must not read the profiles from the token when it is enabled
+JWT_COMPACT_CLAIMS = os.getenv("JWT_COMPACT_CLAIMS", "false").lower() == "true"
+JWT_COMPACT_CLAIMS_SECONDS = int(os.getenv("JWT_COMPACT_CLAIMS_SECONDS", "86400"))
+
+# verified jwt claims cache envs, JWT_CLAIMS_CACHE=false verifies the signature of every request
+JWT_CLAIMS_CACHE = os.getenv("JWT_CLAIMS_CACHE", "true").lower() == "true"
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "4096"))
+JWT_CLAIMS_CACHE_SECONDS = int(os.getenv("JWT_CLAIMS_CACHE_SECONDS", "300"))
+
 # smtp envs
 SMTP_LOGIN = os.getenv("SMTP_LOGIN")
 SMTP_HOST = os.getenv("SMTP_HOST")
@@ -0,0 +1,74 @@
+"""
+JWT algorithms benchmark
+
+Compares the sign and verify throughput of the supported JWT algorithms with the full and the compact user claims
+Usage: python jwt_benchmark.py [--operations N]
+"""
+import argparse
+import json
+import time
+
+import jwt
+
+from util.security import generate_private_key, JWT_ALGORITHMS
+
+# claims of a coordinator with its profile fields metadata, like the full tokens signed at the login
+FULL_PAYLOAD = {
+    "user_id": 1,
+    "institutional_email": "student@ufu.br",
+    "secondary_email": "student@gmail.com",
+    "user_name": "Student Name",
+    "gender": "M",
+    "phone": "34999999999",
+    "creation_datetime": "2023-01-01 00:00:00",
+    "profiles": [{
+        "profile_name": profile_name,
+        "profile_acronym": profile_acronym,
+        "profile_dynamic_fields_metadata": json.dumps([
+            {"name": f"field_{field}", "label": f"Campo {field}", "type": "text", "required": True} for field in range(8)
+        ]),
+        "user_dinamyc_profile_fields_data": json.dumps({f"field_{field}": f"valor {field}" for field in range(8)}),
+        "start_datetime": "2023-01-01 00:00:00",
+        "end_datetime": "",
+        "siape": "1234567",
+        **students
+    } for profile_name, profile_acronym, students in (
+        ("Coordenador", "COO", {"coordinator_students": 120}), ("Orientador", "ADV", {"advisor_students": 12})
+    )],
+    "profile_acronyms": ["COO", "ADV"]
+}
+
+# the compact claims of the same user
+COMPACT_PAYLOAD = {
+    "user_id": 1,
+    "profile_acronyms": ["COO", "ADV"],
+    "role_keys": {"COO": "1234567", "ADV": "1234567"},
+    "exp": int(time.time()) + 86400
+}
+
+def get_operations_per_second(operation, operations):
+    """ Returns the operations per second of a function """
+    start = time.perf_counter()
+    for _ in range(operations):
+        operation()
+    return operations / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compares the sign and verify throughput of the JWT algorithms")
+    parser.add_argument("--operations", type=int, default=1000, help="sign and verify operations by algorithm")
+    args = parser.parse_args()
+
+    print(f"# {args.operations} operations by algorithm and claims")
+    print(f"{'algorithm':<10}{'claims':<10}{'sign/s':>12}{'verify/s':>12}{'header bytes':>14}")
+
+    for algorithm in JWT_ALGORITHMS:
+        private_key = generate_private_key(algorithm)
+        public_key = private_key.public_key()
+
+        for claims, payload in (("full", FULL_PAYLOAD), ("compact", COMPACT_PAYLOAD)):
+            token = jwt.encode(payload, private_key, algorithm=algorithm, headers={"kid": "benchmark"})
+
+            signs = get_operations_per_second(lambda: jwt.encode(payload, private_key, algorithm=algorithm), args.operations)
+            verifies = get_operations_per_second(lambda: jwt.decode(token, public_key, algorithms=[algorithm]), args.operations)
+            print(f"{algorithm:<10}{claims:<10}{signs:>12.0f}{verifies:>12.0f}{len('Authorization: Bearer ' + token):>14}")
@@ -0,0 +1,45 @@
+"""
+Database migrations command line
+
+Applies the pending sql/migrations scripts without starting the server
+Usage: python migrate.py [--status] [--target VERSION] [--rebuild-advisor-student-counts]
+"""
+from flask import Flask
+
+import argparse
+import logging
+
+import env
+from models import db
+from repositories import AdvisorsRepository
+from util import db_check_create, db_migrate, db_pending_migrations
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Applies the pending database migrations")
+    parser.add_argument("--status", action="store_true", help="only lists the pending migrations")
+    parser.add_argument("--target", type=int, default=None, help="last migration version to apply, all if missing")
+    parser.add_argument("--rebuild-advisor-student-counts", action="store_true",
+        help="also rebuilds the advisor student count table, needed before enabling ADVISOR_STUDENT_COUNT_TABLE")
+    args = parser.parse_args()
+
+    db_check_create()
+
+    if args.status:
+        pending_migrations = db_pending_migrations()
+        print(f"# {len(pending_migrations)} pending migration{'s' if len(pending_migrations) != 1 else ''}")
+        for version, name, path in pending_migrations:
+            print(f"{version} {name}")
+    else:
+        print(f"# Schema {env.MYSQL['schema']} migrated to version {db_migrate(args.target)}")
+
+        # rebuilds the count table through the repositories, which need an app with the database
+        if args.rebuild_advisor_student_counts:
+            app = Flask(__name__)
+            app.config["SQLALCHEMY_DATABASE_URI"] = env.DB_URI
+            app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = env.SQLALCHEMY_TRACK_MODIFICATIONS
+            db.init_app(app)
+            with app.app_context():
+                print(f"# Advisor student count table rebuilt with {AdvisorsRepository.rebuild_advisor_student_counts()} advisors")
@@ -1,6 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from .session import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+from .unit_of_work import UnitOfWork
 
 from .attachment import Attachment
 from .config import Config, ConfigSystemPath, ConfigMail, ConfigYear, ConfigYearHoliday, ConfigReasonClass, ConfigReason
@@ -13,12 +17,14 @@ from .dynamic_page import (
 from .mail_validation import MailValidation
 from .profile import Profile
 from .scheduling import Scheduling, SchedulingStateTransition
-from .solicitation import Solicitation, SolicitationStartMail, SolicitationState, SolicitationStateProfileEditors
+from .solicitation import (
+    Solicitation, SolicitationStartMail, SolicitationState, SolicitationStateProfileEditors, SolicitationWorkflowVersion
+)
 from .transitions import (
     SolicitationStateTransition, SolicitationStateTransitionManual, SolicitationStateTransitionFromDynamicPage,
     SolicitationStateTransitionScheduled, SolicitationStateTransitionMail
 )
 from .user import (
-    User, UserHasProfile, UserHasProfileCoordinatorData, UserHasProfileAdvisorData, UserHasProfileStudentData,
-    UserHasAttachment, UserHasSolicitation, UserHasSolicitationState
+    User, UserHasProfile, UserHasProfileCoordinatorData, UserHasProfileAdvisorData, UserHasProfileAdvisorStudentCount,
+    UserHasProfileStudentData, UserHasAttachment, UserHasSolicitation, UserHasSolicitationState
 )
\ No newline at end of file
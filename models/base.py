@@ -10,6 +10,7 @@ from sqlalchemy.orm import aliased
 from sqlalchemy.orm.collections import InstrumentedList
 
 from . import db
+from .unit_of_work import UnitOfWork
 
 class MetaBaseModel(db.Model.__class__):
     """ Define a metaclass for the BaseModel
@@ -60,6 +61,19 @@ class BaseModel:
             if column not in self.to_json_filter and not isinstance(value, (InstrumentedList, BaseModel))
         }
 
+    @property
+    def columns_json(self):
+        """ Same as json but reading only the column attributes, so no relationship is lazy loaded
+            Differs from json only on models with empty 1-1 relationships, which json returns as None """
+
+        columns_json = {}
+        for column in inspect(self.__class__).column_attrs:
+            if column.key not in self.to_json_filter:
+                value = getattr(self, column.key)
+                columns_json[column.key] = value.strftime("%Y-%m-%d") if isinstance(value, datetime) else value
+
+        return columns_json
+
     def _to_dict(self):
         """ Allows to_json to be overriden without impacting __repr__ 
             Because this method is used in __repr__ """
@@ -69,12 +83,20 @@ class BaseModel:
         }
 
     def save(self):
-        """ Saves the object to db """
+        """ Saves the object to db
+            Inside a unit of work it is only flushed, the unit commits it """
         db.session.add(self)
-        db.session.commit()
+        if UnitOfWork.current():
+            db.session.flush()
+        else:
+            db.session.commit()
         return self
 
     def delete(self):
-        """ Deletes the object from db """
+        """ Deletes the object from db
+            Inside a unit of work it is only flushed, the unit commits it """
         db.session.delete(self)
-        db.session.commit()
+        if UnitOfWork.current():
+            db.session.flush()
+        else:
+            db.session.commit()
@@ -0,0 +1,114 @@
+"""
+The routing session
+
+Allows each thread to send its statements to a configured bind engine
+and its reads to the optional read replica bind
+"""
+from contextlib import contextmanager
+
+import threading
+import time
+
+from flask_sqlalchemy.session import Session
+
+class RoutingSession(Session):
+    """ Session that routes the statements of the current thread to its bind, if configured in SQLALCHEMY_BINDS
+        Threads without a bind use the default engine
+        Reads go to the replica bind when allowed, a session stays on the primary after its first write """
+
+    REPLICA_BIND_KEY = "replica"
+
+    # seconds that a user reads from the primary after its own writes
+    read_your_writes_seconds = 5
+
+    _local = threading.local()
+    _recent_writers = {}
+    _recent_writers_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pinned_to_primary = False
+
+    @staticmethod
+    def route_thread(bind_key):
+        """ Routes the statements of the current thread to the bind_key engine, None routes to the default engine """
+        RoutingSession._local.bind_key = bind_key
+
+    @staticmethod
+    def thread_bind_key():
+        """ Returns the bind key of the current thread """
+        return getattr(RoutingSession._local, "bind_key", None)
+
+    @staticmethod
+    def route_reads(to_replica, replica_blocked=False):
+        """ Routes the reads of the current thread to the replica or to the primary
+            A blocked replica is not used even by read only calls, used for read-your-writes """
+        RoutingSession._local.read_replica = to_replica
+        RoutingSession._local.replica_blocked = replica_blocked
+
+    @staticmethod
+    @contextmanager
+    def reading_from_replica():
+        """ Routes the reads done inside the context to the replica, unless it is blocked """
+        read_replica = getattr(RoutingSession._local, "read_replica", False)
+        RoutingSession._local.read_replica = True
+        try:
+            yield
+        finally:
+            RoutingSession._local.read_replica = read_replica
+
+    @staticmethod
+    @contextmanager
+    def writing():
+        """ Keeps every statement done inside the context on the primary """
+        RoutingSession._local.writing = getattr(RoutingSession._local, "writing", 0) + 1
+        try:
+            yield
+        finally:
+            RoutingSession._local.writing -= 1
+
+    @staticmethod
+    def mark_user_write(user_id):
+        """ Starts the read-your-writes window of a user, its reads use the primary until the window ends """
+
+        now = time.monotonic()
+        with RoutingSession._recent_writers_lock:
+            RoutingSession._recent_writers[user_id] = now + RoutingSession.read_your_writes_seconds
+
+            # removes finished windows to keep the dictionary small
+            if len(RoutingSession._recent_writers) > 1024:
+                for writer_id, window_end in list(RoutingSession._recent_writers.items()):
+                    if window_end < now:
+                        del RoutingSession._recent_writers[writer_id]
+
+    @staticmethod
+    def is_user_write_recent(user_id):
+        """ Returns if a user is inside its read-your-writes window """
+        with RoutingSession._recent_writers_lock:
+            window_end = RoutingSession._recent_writers.get(user_id)
+        return window_end != None and window_end >= time.monotonic()
+
+    def __is_replica_read(self, clause):
+        """ Returns if a statement can be sent to the replica, pinning the session to the primary on writes """
+
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.pinned_to_primary = True
+
+        local = RoutingSession._local
+        return getattr(local, "read_replica", False) and not getattr(local, "replica_blocked", False)\
+            and not getattr(local, "writing", 0) and not self.pinned_to_primary
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """ Returns the replica or the current thread engine, or the default flask_sqlalchemy bind resolution """
+
+        if bind is None:
+            engines = self._db.engines
+
+            if self.__is_replica_read(clause) and RoutingSession.REPLICA_BIND_KEY in engines:
+                return engines[RoutingSession.REPLICA_BIND_KEY]
+
+            bind_key = RoutingSession.thread_bind_key()
+            if bind_key is not None and bind_key in engines:
+                return engines[bind_key]
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -70,4 +70,17 @@ class SolicitationStateProfileEditors(db.Model, BaseModel, metaclass=MetaBaseMod
     """ Create a new SolicitationStateProfileEditors """
     def __init__(self, solicitation_state_id, state_profile_editor):
         self.solicitation_state_id = solicitation_state_id
-        self.state_profile_editor = state_profile_editor
\ No newline at end of file
+        self.state_profile_editor = state_profile_editor
+
+class SolicitationWorkflowVersion(db.Model, BaseModel, metaclass=MetaBaseModel):
+    
+    __tablename__ = "solicitation_workflow_version"
+
+    # single row incremented whenever a solicitation workflow is edited
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+    """ Create a new SolicitationWorkflowVersion """
+    def __init__(self, id=1, version=0):
+        self.id = id
+        self.version = version
\ No newline at end of file
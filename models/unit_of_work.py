@@ -0,0 +1,86 @@
+"""
+The unit of work
+
+Groups the writes done by a block of code in a single transaction committed once at its end
+"""
+import threading
+
+from . import db
+from .session import RoutingSession
+
+class UnitOfWork:
+    """ Context that commits the session once when it ends, or rolls it back on exceptions or when requested
+        Model saves inside it only flush, the objects are not expired by the commit so they are not selected again
+        Nested units join the outermost one and callbacks registered with on_commit run only after its commit """
+
+    _local = threading.local()
+
+    def __init__(self):
+        self.outer_unit = None
+        self.rollback_requested = False
+        self.commit_callbacks = []
+
+    @staticmethod
+    def current():
+        """ Returns the unit of work of the current thread or None outside of units """
+        return getattr(UnitOfWork._local, "unit", None)
+
+    @staticmethod
+    def on_commit(callback, *args, **kwargs):
+        """ Runs the callback after the current unit commits, or right now outside of units
+            Used for side effects that must not happen if the writes are rolled back, like mails and scheduler events """
+
+        unit = UnitOfWork.current()
+        if unit:
+            unit.commit_callbacks.append((callback, args, kwargs))
+        else:
+            callback(*args, **kwargs)
+
+    def rollback(self):
+        """ Discards every write of the unit when its context ends """
+        self.rollback_requested = True
+
+    def __enter__(self):
+
+        # joins the outermost unit
+        self.outer_unit = UnitOfWork.current()
+        if self.outer_unit:
+            return self.outer_unit
+
+        UnitOfWork._local.unit = self
+
+        # the commit does not expire the objects to avoid selecting them again after it
+        self.session = db.session()
+        self.expire_on_commit = self.session.expire_on_commit
+        self.session.expire_on_commit = False
+
+        # every statement of the unit uses the primary
+        self.writing = RoutingSession.writing()
+        self.writing.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if self.outer_unit:
+            return False
+
+        committed = False
+        try:
+            if exc_type is None and not self.rollback_requested:
+                self.session.commit()
+                committed = True
+            else:
+                self.session.rollback()
+        except Exception:
+            self.session.rollback()
+            raise
+        finally:
+            self.session.expire_on_commit = self.expire_on_commit
+            self.writing.__exit__(None, None, None)
+            UnitOfWork._local.unit = None
+
+        if committed:
+            for callback, args, kwargs in self.commit_callbacks:
+                callback(*args, **kwargs)
+
+        return False
@@ -14,9 +14,10 @@ class User(db.Model, BaseModel, metaclass=MetaBaseModel):
     user_name = db.Column(db.String(100), nullable=False)
     gender = db.Column(db.Enum('M', 'F'), nullable=False)
     phone = db.Column(db.String(15))
-    password_hash = db.Column(db.String(65))
+    password_hash = db.Column(db.String(128))
     password_salt = db.Column(db.String(16))
     creation_datetime = db.Column(db.DateTime)
+    profile_version = db.Column(db.Integer, default=0, nullable=False)                  # incremented by every profile write
 
     user_has_profile = db.Relationship("UserHasProfile", backref="user")                # 1-N
     user_has_attachment = db.Relationship("UserHasAttachment", backref="user")          # 1-N
@@ -78,12 +79,26 @@ class UserHasProfileAdvisorData(db.Model, BaseModel, metaclass=MetaBaseModel):
     siape = db.Column(db.String(15), unique=True, nullable=False)
 
     user_has_solicitation = db.Relationship("UserHasSolicitation", backref="user_has_profile_advisor_data") # 1-N
+    user_has_profile_advisor_student_count = db.Relationship("UserHasProfileAdvisorStudentCount", 
+        backref="user_has_profile_advisor_data", uselist=False) # 1-1
 
     """ Create a new UserHasProfileAdvisorData """
     def __init__(self, user_has_profile_id, siape):
         self.user_has_profile_id = user_has_profile_id
         self.siape = siape
 
+class UserHasProfileAdvisorStudentCount(db.Model, BaseModel, metaclass=MetaBaseModel):
+    
+    __tablename__ = "user_has_profile_advisor_student_count"
+
+    advisor_siape = db.Column(db.String(15), db.ForeignKey("user_has_profile_advisor_data.siape"), primary_key=True)
+    student_count = db.Column(db.Integer, nullable=False)
+
+    """ Create a new UserHasProfileAdvisorStudentCount """
+    def __init__(self, advisor_siape, student_count=0):
+        self.advisor_siape = advisor_siape
+        self.student_count = student_count
+
 class UserHasProfileStudentData(db.Model, BaseModel, metaclass=MetaBaseModel):
     
     __tablename__ = "user_has_profile_student_data"
@@ -0,0 +1,60 @@
+"""
+Request parsing benchmark
+
+Compares the per request overhead of building a reqparse.RequestParser by request with the compiled parser of the parse_params decorators
+Usage: python parse_params_benchmark.py [--requests N]
+"""
+from flask import Flask
+from flask_restful import inputs
+from flask_restful.reqparse import Argument, RequestParser
+
+import argparse
+import time
+
+from util.parse_params import CompiledParser
+
+# arguments and request of a solicitation put, the widest parse of the api
+ARGUMENTS = [
+    Argument("Authorization", location="headers", type=str, required=True, help="Required. Bearer with jwt given by server in user autentication"),
+    Argument("user_has_state_id", location="json", type=int, required=True, help="Required. Id of the user has state."),
+    Argument("transition_id", location="json", type=int, required=True, help="Required. Id of the transition."),
+    Argument("solicitation_user_data", location="json", type=str, help="Data of the solicitation."),
+    Argument("start_date", location="json", type=inputs.date, help="Start date."),
+    Argument("page", location="args", type=int, help="Page number."),
+    Argument("filter", location="args", type=str, help="Filter.")
+]
+REQUEST = {
+    "path": "/solicitation?page=2&filter=abc",
+    "method": "PUT",
+    "headers": {"Authorization": "Bearer token"},
+    "json": {"user_has_state_id": 10, "transition_id": 3, "solicitation_user_data": "{}", "start_date": "2023-01-01"}
+}
+
+def get_microseconds_per_request(parse, requests):
+    """ Returns the mean microseconds of a parse function """
+    start = time.perf_counter()
+    for _ in range(requests):
+        parse()
+    return (time.perf_counter() - start) / requests * 1000000
+
+def parse_with_request_parser():
+    """ The parsing done before the compiled parsers, a new parser by request """
+    parser = RequestParser()
+    for argument in ARGUMENTS:
+        parser.add_argument(argument)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compares the per request parsing overhead of reqparse and of the compiled parsers")
+    parser.add_argument("--requests", type=int, default=10000, help="parsed requests by parser")
+    args = parser.parse_args()
+
+    compiled_parser = CompiledParser(ARGUMENTS)
+
+    with Flask(__name__).test_request_context(**REQUEST):
+        assert dict(parse_with_request_parser()) == compiled_parser.parse_args()
+
+        print(f"# {args.requests} requests by parser")
+        print(f"reqparse by request  {get_microseconds_per_request(parse_with_request_parser, args.requests):8.1f} us")
+        print(f"compiled parser      {get_microseconds_per_request(compiled_parser.parse_args, args.requests):8.1f} us")
@@ -0,0 +1,46 @@
+"""
+Password hash benchmark
+
+Reports the logins per second of the password key derivations at each cost, verifying through the bounded hash pool
+Usage: python password_hash_benchmark.py [--logins N] [--clients N] [--workers N]
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import argparse
+import time
+
+from util.security import Security
+
+# costs compared for each key derivation, the log2 of n for scrypt and the iterations for pbkdf2_sha256
+COSTS = {
+    "scrypt": [12, 13, 14, 15],
+    "pbkdf2_sha256": [100000, 300000, 600000]
+}
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Reports the logins per second of the password key derivations at each cost")
+    parser.add_argument("--logins", type=int, default=200, help="logins verified by cost")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent logins, like the request threads")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the password hash pool")
+    args = parser.parse_args()
+
+    security = Security()
+
+    print(f"# {args.logins} logins by cost, {args.clients} concurrent clients and {args.workers} hash workers")
+    print(f"{'algorithm':<16}{'cost':>8}{'logins/s':>12}{'ms/login':>12}")
+
+    for algorithm, costs in COSTS.items():
+        for cost in costs:
+            security.configure_password_hasher(algorithm, cost, args.workers, timeout=600)
+            password_hash, password_salt = security.hash_password("benchmark password")
+
+            with ThreadPoolExecutor(max_workers=args.clients) as clients:
+                start = time.perf_counter()
+                logins = list(clients.map(
+                    lambda _: security.verify_password("benchmark password", password_hash, password_salt)[0], range(args.logins)
+                ))
+                elapsed = time.perf_counter() - start
+
+            assert all(logins)
+            print(f"{algorithm:<16}{cost:>8}{args.logins / elapsed:>12.1f}{elapsed / args.logins * 1000:>12.1f}")
@@ -0,0 +1,138 @@
+"""
+Query count check
+
+Creates the models in a temporary sqlite database, seeds a fixture of users and solicitations, and checks the quantity
+of SQL statements sent by the repository reads and the listings, counted by QueryCounter
+Single row reads must do one round trip and the listings a fixed quantity whatever the quantity of rows
+Usage: python query_count_check.py [--solicitations 50]
+"""
+import argparse
+import logging
+import sys
+from datetime import date, datetime
+
+from flask import Flask
+
+from models import (
+    db, Attachment, Config, MailValidation, Profile, Scheduling, Solicitation, SolicitationState, SolicitationStateProfileEditors,
+    User, UserHasAttachment, UserHasProfile, UserHasProfileAdvisorData, UserHasProfileStudentData, UserHasSolicitation,
+    UserHasSolicitationState
+)
+from repositories import (
+    AdvisorsRepository, AttachmentRepository, ConfigRepository, MailValidationRepository, QueryCounter, SchedulingRepository,
+    SolicitationRepository, SolicitationsRepository, UserProfileTokenRepository, UserRepository
+)
+from resources.solicitations import get_formated_user_solicitations
+
+ADVISORS = 3
+
+def create_app():
+    """ Creates an app with the models in a private in memory sqlite database """
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    return app
+
+def add(*models):
+    """ Adds and flushes models, returning the first """
+    db.session.add_all(models)
+    db.session.flush()
+    return models[0]
+
+def seed(solicitations):
+    """ Seeds the fixture, each student has one solicitation with two states, returns the ids used by the checks """
+
+    now = datetime.now()
+    student_profile = add(Profile("Aluno", "STU", None))
+    advisor_profile = add(Profile("Orientador", "ADV", None))
+
+    solicitation = add(Solicitation("Solicitação teste"))
+    first_state = add(SolicitationState(solicitation.id, True, "Primeiro estado"))
+    second_state = add(SolicitationState(solicitation.id, False, "Segundo estado"))
+    add(SolicitationStateProfileEditors(first_state.id, student_profile.id), SolicitationStateProfileEditors(second_state.id, advisor_profile.id))
+
+    advisors = []
+    for index in range(ADVISORS):
+        advisor = add(User(f"orientador{index}@ufv.br", None, f"Orientador {index}", "M", None, None, None, now))
+        advisor_has_profile = add(UserHasProfile(advisor.id, advisor_profile.id, None, date.today(), None))
+        advisors.append((advisor, add(UserHasProfileAdvisorData(advisor_has_profile.id, f"9000{index}"))))
+
+    for index in range(solicitations):
+        student = add(User(f"aluno{index}@ufv.br", None, f"Aluno {index}", "F", None, None, None, now))
+        student_has_profile = add(UserHasProfile(student.id, student_profile.id, None, date.today(), None))
+        add(UserHasProfileStudentData(student_has_profile.id, f"1100{index}", "BCC"))
+
+        advisor_data = advisors[index % ADVISORS][1]
+        uhs = add(UserHasSolicitation(student.id, advisor_data.siape, solicitation.id, second_state.id, True))
+        add(UserHasSolicitationState(uhs.id, first_state.id, "Deferido", now, end_datetime=now))
+        uhss = add(UserHasSolicitationState(uhs.id, second_state.id, "Em analise", now))
+
+    attachment = add(Attachment("hash_teste"))
+    add(UserHasAttachment(student.id, attachment.id))
+    add(MailValidation(student.institutional_email, "123456"))
+    add(Config("config_teste"))
+    scheduling = add(Scheduling("Send Mail", now))
+    db.session.commit()
+
+    return {
+        "student_id": student.id, "student_email": student.institutional_email, "advisor_id": advisors[0][0].id,
+        "advisor_siape": advisors[0][1].siape, "user_has_solicitation_id": uhs.id, "user_has_state_id": uhss.id,
+        "solicitation_id": solicitation.id, "state_id": second_state.id, "scheduling_id": scheduling.id,
+        "all_user_ids": [user.id for user in User.query.all()]
+    }
+
+def checks(ids):
+    """ Returns the checks as (name, read, expected statements) """
+
+    return [
+        ("UserRepository.read_user by id", lambda: UserRepository.read_user(id=ids["student_id"]), 1),
+        ("UserRepository.read_user by email", lambda: UserRepository.read_user(institutional_email=ids["student_email"]), 1),
+        ("UserRepository.read_user missing", lambda: UserRepository.read_user(id=-1), 1),
+        ("AttachmentRepository.read_attachment", lambda: AttachmentRepository.read_attachment("hash_teste"), 1),
+        ("AttachmentRepository.read_attachment by user", lambda: AttachmentRepository.read_attachment("hash_teste", ids["student_id"]), 1),
+        ("MailValidationRepository.read_mail_validation", lambda: MailValidationRepository.read_mail_validation(ids["student_email"], "123456"), 1),
+        ("ConfigRepository.read_config", lambda: ConfigRepository.read_config("config_teste"), 1),
+        ("SchedulingRepository.read_scheduling", lambda: SchedulingRepository.read_scheduling(ids["scheduling_id"]), 1),
+        ("SolicitationRepository.read_user_solicitation", lambda: SolicitationRepository.read_user_solicitation(ids["user_has_solicitation_id"]), 1),
+        ("SolicitationRepository.read_user_solicitation_state",
+            lambda: SolicitationRepository.read_user_solicitation_state(ids["user_has_state_id"], format=False), 1),
+        ("SolicitationRepository.read_solicitation_user_ids",
+            lambda: SolicitationRepository.read_solicitation_user_ids(ids["user_has_solicitation_id"], cached=False), 1),
+        ("SolicitationRepository.read_solicitation_state_user_ids",
+            lambda: SolicitationRepository.read_solicitation_state_user_ids(ids["user_has_state_id"], cached=False), 2),
+        ("SolicitationsRepository.read_user_solicitations of all",
+            lambda: get_formated_user_solicitations(*SolicitationsRepository.read_user_solicitations(limit=100)), 3),
+        ("SolicitationsRepository.read_user_solicitations of a student",
+            lambda: get_formated_user_solicitations(*SolicitationsRepository.read_user_solicitations(student_id=ids["student_id"])), 3),
+        ("SolicitationsRepository.read_user_solicitations of an advisor",
+            lambda: get_formated_user_solicitations(*SolicitationsRepository.read_user_solicitations(advisor_id=ids["advisor_id"], limit=100)), 3),
+        ("AdvisorsRepository.read_advisors", lambda: AdvisorsRepository.read_advisors(), 2),
+        ("UserProfileTokenRepository.build_user_profile_tokens",
+            lambda: UserProfileTokenRepository.build_user_profile_tokens(ids["all_user_ids"]), 2),
+    ]
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Checks the SQL statements sent by the repository reads")
+    parser.add_argument("--solicitations", type=int, default=50, help="quantity of seeded solicitations, one per student")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        ids = seed(args.solicitations)
+
+        print(f"# {args.solicitations} solicitations, {ADVISORS} advisors")
+        for name, read, expected in checks(ids):
+            db.session.expire_all()
+            QueryCounter.reset()
+            read()
+            count = QueryCounter.reset()
+            failures += count != expected
+            print(f"{'ok  ' if count == expected else 'FAIL'} {name:<64} {count} statements, expected {expected}")
+
+    sys.exit(1 if failures else 0)
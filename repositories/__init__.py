@@ -1,5 +1,7 @@
 from .advisors import AdvisorsRepository
 from .attachment import AttachmentRepository
+from .base import BaseRepository, QueryCounter
+from .cache import Cache, CacheBackend, LocalCacheBackend, SqliteCacheBackend
 from .config import ConfigRepository, ConfigsRepository
 from .dynamic_page import DynamicPageRepository
 from .mail_validation import MailValidationRepository
@@ -9,4 +11,5 @@ from .solicitation import SolicitationRepository
 from .solicitations import SolicitationsRepository
 from .transitions import SolicitationStateTransitionRepository, SolicitationStateTransitionsRepository
 from .user import UserRepository, UsersRepository
-from .user_profile_token import UserProfileTokenRepository
\ No newline at end of file
+from .user_profile_token import UserProfileClaims, UserProfileTokenRepository
+from .workflow import WorkflowRepository
\ No newline at end of file
@@ -1,20 +1,74 @@
 """ Defines the advisor repository """
 
-from models import User, UserHasProfile, UserHasProfileAdvisorData, UserHasSolicitation
+from sqlalchemy import distinct, func
+from sqlalchemy.dialects.mysql import insert
 
-class AdvisorsRepository:
-    """ The repository for multiple advisors """
+from models import (
+    db, UnitOfWork, User, UserHasProfile, UserHasProfileAdvisorData, UserHasProfileAdvisorStudentCount, UserHasSolicitation
+)
+from .base import BaseRepository, read_only
+
+class AdvisorsRepository(BaseRepository):
+    """ The repository for multiple advisors
+        The student counts are grouped from the user solicitations unless the count table is enabled """
+
+    # reads the advisor students from the count table and keeps it current on each user solicitation write
+    student_count_table = False
+
+    @staticmethod
+    def configure_student_count_table(enabled):
+        """ Enables the advisor student count table, it must be rebuilt with migrate.py before enabling it """
+        AdvisorsRepository.student_count_table = enabled
+
+    @staticmethod
+    def advisor_students_query(from_count_table=False):
+        """ Query the advisor_siape and advisor_students columns of every advisor with students
+            Grouped from the user solicitations or read from the incrementally maintained count table """
+
+        if from_count_table:
+            return UserHasProfileAdvisorStudentCount.query\
+                .with_entities(
+                    UserHasProfileAdvisorStudentCount.advisor_siape.label("advisor_siape"),
+                    UserHasProfileAdvisorStudentCount.student_count.label("advisor_students")
+                )
+
+        return UserHasSolicitation.query\
+            .with_entities(
+                UserHasSolicitation.advisor_siape.label("advisor_siape"),
+                func.count(distinct(UserHasSolicitation.user_id)).label("advisor_students")
+            )\
+            .filter(UserHasSolicitation.advisor_siape != None)\
+            .group_by(UserHasSolicitation.advisor_siape)
 
     @staticmethod
+    @read_only
+    def read_advisors_students(siapes):
+        """ Query the quantity of distinct students of each siape with a single grouped query """
+
+        if not siapes:
+            return {}
+
+        advisors_students = AdvisorsRepository.advisor_students_query()\
+            .filter(UserHasSolicitation.advisor_siape.in_(siapes))
+
+        return {adv.advisor_siape: adv.advisor_students for adv in AdvisorsRepository.read_all(advisors_students)}
+
+    @staticmethod
+    @read_only
     def read_advisors(advisor_name=None, limit=None, offset=None, format=True):
-        """ Query advisor users by name or applying custom offsets """
-        
+        """ Query advisor users by name or applying custom offsets
+            Their students quantity is joined in the same query """
+
+        advisor_students = AdvisorsRepository.advisor_students_query(AdvisorsRepository.student_count_table).subquery()
+
         # query
         advisors_query = UserHasProfileAdvisorData.query\
             .join(UserHasProfile, UserHasProfileAdvisorData.user_has_profile_id == UserHasProfile.id)\
             .join(User, UserHasProfile.user_id == User.id)\
-            .add_columns(User.id.label("user_id"), User.institutional_email, User.secondary_email, User.user_name, User.gender, User.phone)
-        
+            .outerjoin(advisor_students, UserHasProfileAdvisorData.siape == advisor_students.c.advisor_siape)\
+            .add_columns(User.id.label("user_id"), User.institutional_email, User.secondary_email, User.user_name, User.gender, User.phone,
+                func.coalesce(advisor_students.c.advisor_students, 0).label("advisor_students"))
+
         # filters
         if advisor_name != None:
             advisors_query = advisors_query.filter(User.user_name.like("%{}%".format(advisor_name)))
@@ -27,7 +81,7 @@ class AdvisorsRepository:
 
         # validation
         count = count_query.count()
-        advisors = advisors_query.all()
+        advisors = AdvisorsRepository.read_all(advisors_query)
 
         if not format or not advisors:
             return advisors
@@ -39,11 +93,6 @@ class AdvisorsRepository:
         }
 
         for adv in advisors:
-            advisor_students = UserHasSolicitation.query\
-                .with_entities(UserHasSolicitation.advisor_siape, UserHasSolicitation.user_id)\
-                .filter_by(advisor_siape=adv.UserHasProfileAdvisorData.siape)\
-                .distinct().count()
-
             formated_advs["advisors"].append({
                 "user_id": adv.user_id,
                 "institutional_email": adv.institutional_email,
@@ -52,7 +101,51 @@ class AdvisorsRepository:
                 "gender": adv.gender,
                 "phone": adv.phone,
                 "siape": adv.UserHasProfileAdvisorData.siape,
-                "advisor_students": advisor_students
+                "advisor_students": adv.advisor_students
             })
 
-        return formated_advs
\ No newline at end of file
+        return formated_advs
+
+    @staticmethod
+    def update_advisor_student_count(student_id, old_advisor_siape, new_advisor_siape):
+        """ Keeps the advisor student count table current after a user solicitation changes its advisor
+            Must be called after the user solicitation is saved, does nothing while the count table is disabled """
+
+        if not AdvisorsRepository.student_count_table or old_advisor_siape == new_advisor_siape:
+            return
+
+        # the new advisor gains the student if this is their only solicitation together
+        if new_advisor_siape:
+            together = UserHasSolicitation.query.filter_by(user_id=student_id, advisor_siape=new_advisor_siape).count()
+            if together == 1:
+                AdvisorsRepository.increment_advisor_student_count(new_advisor_siape, 1)
+
+        # the old advisor loses the student if they have no more solicitations together
+        if old_advisor_siape:
+            together = UserHasSolicitation.query.filter_by(user_id=student_id, advisor_siape=old_advisor_siape).count()
+            if together == 0:
+                AdvisorsRepository.increment_advisor_student_count(old_advisor_siape, -1)
+
+    @staticmethod
+    def increment_advisor_student_count(advisor_siape, increment):
+        """ Increments an advisor student count creating it if needed, in a single statement so concurrent writes are not lost """
+
+        student_count = insert(UserHasProfileAdvisorStudentCount).values(advisor_siape=advisor_siape, student_count=max(increment, 0))
+        student_count = student_count.on_duplicate_key_update(
+            student_count=func.greatest(UserHasProfileAdvisorStudentCount.student_count + increment, 0)
+        )
+
+        with UnitOfWork():
+            db.session.execute(student_count)
+
+    @staticmethod
+    def rebuild_advisor_student_counts():
+        """ Rebuilds the whole advisor student count table from the user solicitations in a single transaction """
+
+        with UnitOfWork():
+            advisor_students = AdvisorsRepository.read_all(AdvisorsRepository.advisor_students_query())
+
+            UserHasProfileAdvisorStudentCount.query.delete()
+            db.session.add_all([UserHasProfileAdvisorStudentCount(adv.advisor_siape, adv.advisor_students) for adv in advisor_students])
+
+        return len(advisor_students)
@@ -1,8 +1,9 @@
 """ Defines the Attachment repository """
 
 from models import Attachment, UserHasAttachment
+from .base import BaseRepository
 
-class AttachmentRepository:
+class AttachmentRepository(BaseRepository):
     """ The repository for attachment """
 
     @staticmethod
@@ -17,10 +18,10 @@ class AttachmentRepository:
         # without user restriction
         if not user_id:
             attachment_query = Attachment.query.filter_by(hash_name=hash_name)
-            return attachment_query.one() if attachment_query.count() == 1 else None
+            return AttachmentRepository.read_one(attachment_query)
         
         # with user_id restriction to check allowed access
         attachment_query = Attachment.query\
             .join(UserHasAttachment, Attachment.id == UserHasAttachment.attachment_id)\
             .filter(Attachment.hash_name == hash_name, UserHasAttachment.user_id == user_id)
-        return attachment_query.one() if attachment_query.count() == 1 else None
\ No newline at end of file
+        return AttachmentRepository.read_one(attachment_query)
\ No newline at end of file
@@ -0,0 +1,64 @@
+""" Defines the base repository with the query primitives shared by all repositories """
+
+from functools import wraps
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import MultipleResultsFound
+
+from models import RoutingSession
+
+class QueryCounter:
+    """ Counts the SQL statements sent to the database by the current thread
+        Used to measure the round trips done by a request or by a repository call """
+
+    _local = threading.local()
+
+    @staticmethod
+    def increment():
+        """ Adds one statement to the current thread counter """
+        QueryCounter._local.count = QueryCounter.count() + 1
+
+    @staticmethod
+    def count():
+        """ Returns the statements counted by the current thread since its last reset """
+        return getattr(QueryCounter._local, "count", 0)
+
+    @staticmethod
+    def reset():
+        """ Resets the current thread counter and returns its old value """
+        count = QueryCounter.count()
+        QueryCounter._local.count = 0
+        return count
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    """ Counts every statement executed by any engine """
+    QueryCounter.increment()
+
+def read_only(func):
+    """ Marks a repository method that only reads, its queries may use the read replica """
+
+    @wraps(func)
+    def read(*args, **kwargs):
+        with RoutingSession.reading_from_replica():
+            return func(*args, **kwargs)
+
+    return read
+
+class BaseRepository:
+    """ The base repository, its read primitives do a single database round trip """
+
+    @staticmethod
+    def read_one(query):
+        """ Query exactly one row, returns None if there is no row or more than one """
+        try:
+            return query.one_or_none()
+        except MultipleResultsFound:
+            return None
+
+    @staticmethod
+    def read_all(query):
+        """ Query all rows, returns an empty list if there is no row """
+        return query.all()
@@ -0,0 +1,276 @@
+""" Defines the cache backends used by the repository caches """
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+
+class CacheBackend(ABC):
+    """ Stores values by namespace and key, the stored values are shared and must not be modified """
+
+    name = None
+
+    @abstractmethod
+    def get(self, namespace, key):
+        """ Returns the value of a key or None if it is missing or expired """
+
+    @abstractmethod
+    def set(self, namespace, key, value, ttl=None, max_entries=None):
+        """ Stores the value of a key for ttl seconds, forever if None, keeping at most max_entries in the namespace """
+
+    @abstractmethod
+    def update(self, namespace, key, function, ttl=None, max_entries=None):
+        """ Stores function(current value or None) as the value of a key atomically for every user of the backend, returns it """
+
+    @abstractmethod
+    def delete(self, namespace, keys):
+        """ Drops the values of the keys """
+
+    @abstractmethod
+    def clear(self, namespace):
+        """ Drops every value of the namespace """
+
+    @abstractmethod
+    def statistics(self):
+        """ Returns the quantity of entries of each namespace """
+
+class LocalCacheBackend(CacheBackend):
+    """ The default backend, a LRU by namespace kept by each worker process
+        Its invalidations only reach the worker that does them """
+
+    name = "local"
+
+    def __init__(self):
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self.lock:
+            entries = self.namespaces.get(namespace)
+            entry = entries.get(key) if entries else None
+            if not entry:
+                return None
+
+            if entry[1] != None and entry[1] <= time.monotonic():
+                del entries[key]
+                return None
+
+            entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, namespace, key, value, ttl=None, max_entries=None):
+        with self.lock:
+            self.write_entry(namespace, key, value, ttl, max_entries)
+
+    def write_entry(self, namespace, key, value, ttl, max_entries):
+        """ Stores a value, must be called holding the lock """
+
+        expiration = time.monotonic() + ttl if ttl != None else None
+        entries = self.namespaces.setdefault(namespace, OrderedDict())
+        entries[key] = (value, expiration)
+        entries.move_to_end(key)
+        while max_entries != None and len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def update(self, namespace, key, function, ttl=None, max_entries=None):
+        with self.lock:
+            entry = self.namespaces.get(namespace, {}).get(key)
+            current = entry[0] if entry and (entry[1] == None or entry[1] > time.monotonic()) else None
+
+            value = function(current)
+            self.write_entry(namespace, key, value, ttl, max_entries)
+            return value
+
+    def delete(self, namespace, keys):
+        with self.lock:
+            entries = self.namespaces.get(namespace, {})
+            for key in keys:
+                entries.pop(key, None)
+
+    def clear(self, namespace):
+        with self.lock:
+            self.namespaces.pop(namespace, None)
+
+    def statistics(self):
+        with self.lock:
+            return {namespace: len(entries) for namespace, entries in self.namespaces.items()}
+
+class SqliteCacheBackend(CacheBackend):
+    """ A backend shared by the workers of a host through a sqlite file, the values are stored as JSON
+        The table is also the invalidation channel, a replaced or dropped entry is seen by every worker on its next get
+        Each worker keeps the decoded values and reuses them while the stamp of their entries does not change
+        The file is readable only by its owner, the backend refuses files that other users can read or write """
+
+    name = "sqlite"
+
+    def __init__(self, path, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        self.decoded = LocalCacheBackend()
+        self.namespace_max_entries = {}
+
+        # creates the file only readable by its owner before sqlite creates it with the default umask
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise PermissionError(f"Cache file {path} must be readable and writable only by its owner, like with chmod 600")
+
+        with self.connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entry(
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    stamp TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expiration REAL,
+                    written REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    def connection(self):
+        """ Returns the connection of the current thread, reconnecting in forked workers """
+
+        connection = getattr(self.local, "connection", None)
+        if connection == None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+
+        return connection
+
+    def get(self, namespace, key):
+        row = self.connection().execute(
+            "SELECT stamp, expiration FROM cache_entry WHERE namespace = ? AND key = ?", (namespace, repr(key))
+        ).fetchone()
+        if not row or (row[1] != None and row[1] <= time.time()):
+            return None
+
+        # only decodes the values written after the last read of this worker
+        decoded = self.decoded.get(namespace, key)
+        if decoded and decoded[0] == row[0]:
+            return decoded[1]
+
+        row = self.connection().execute(
+            "SELECT stamp, value FROM cache_entry WHERE namespace = ? AND key = ?", (namespace, repr(key))
+        ).fetchone()
+        if not row:
+            return None
+
+        value = json.loads(row[1])
+        self.decoded.set(namespace, key, (row[0], value), max_entries=self.namespace_max_entries.get(namespace))
+        return value
+
+    def set(self, namespace, key, value, ttl=None, max_entries=None):
+        with self.connection() as connection:
+            self.write_entry(connection, namespace, key, value, ttl, max_entries)
+
+    def write_entry(self, connection, namespace, key, value, ttl, max_entries):
+        """ Stores a value in the transaction of the connection """
+
+        stamp = uuid.uuid4().hex
+        expiration = time.time() + ttl if ttl != None else None
+
+        connection.execute(
+            "INSERT OR REPLACE INTO cache_entry(namespace, key, stamp, value, expiration, written) VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, repr(key), stamp, json.dumps(value), expiration, time.time())
+        )
+
+        # drops the expired entries and the oldest written ones beyond the limit
+        connection.execute("DELETE FROM cache_entry WHERE namespace = ? AND expiration <= ?", (namespace, time.time()))
+        if max_entries != None:
+            connection.execute("""
+                DELETE FROM cache_entry WHERE namespace = ? AND key NOT IN (
+                    SELECT key FROM cache_entry WHERE namespace = ? ORDER BY written DESC LIMIT ?
+                )
+            """, (namespace, namespace, max_entries))
+
+        # keeps the value as it is read back, so every worker sees the same JSON types
+        self.namespace_max_entries[namespace] = max_entries
+        self.decoded.set(namespace, key, (stamp, json.loads(json.dumps(value))), max_entries=max_entries)
+
+    def update(self, namespace, key, function, ttl=None, max_entries=None):
+
+        # the immediate transaction holds the write lock of the file from the read until the commit
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT value, expiration FROM cache_entry WHERE namespace = ? AND key = ?", (namespace, repr(key))
+            ).fetchone()
+            current = json.loads(row[0]) if row and (row[1] == None or row[1] > time.time()) else None
+
+            value = function(current)
+            self.write_entry(connection, namespace, key, value, ttl, max_entries)
+            return value
+
+    def delete(self, namespace, keys):
+        with self.connection() as connection:
+            connection.executemany("DELETE FROM cache_entry WHERE namespace = ? AND key = ?", [(namespace, repr(key)) for key in keys])
+        self.decoded.delete(namespace, keys)
+
+    def clear(self, namespace):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM cache_entry WHERE namespace = ?", (namespace,))
+        self.decoded.clear(namespace)
+
+    def statistics(self):
+        rows = self.connection().execute("SELECT namespace, COUNT(*) FROM cache_entry GROUP BY namespace").fetchall()
+        return {namespace: entries for namespace, entries in rows}
+
+class Cache:
+    """ A namespace of the configured cache backend, used by every repository cache
+        The backend is the worker local LRU unless configure is called before the caches are used
+        Shared namespaces must hold JSON values, the others always stay in the worker local LRU """
+
+    local_backend = LocalCacheBackend()
+    backend = local_backend
+
+    def __init__(self, namespace, ttl=None, max_entries=None, shared=True):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+
+    @staticmethod
+    def configure(backend):
+        """ Sets the backend of every shared cache """
+        Cache.backend = backend
+
+    @staticmethod
+    def statistics():
+        """ Returns the configured backend name and its entries by namespace, with the worker local namespaces """
+        namespaces = Cache.local_backend.statistics()
+        if Cache.backend is not Cache.local_backend:
+            namespaces.update(Cache.backend.statistics())
+        return {"backend": Cache.backend.name, "namespaces": namespaces}
+
+    def get_backend(self):
+        """ Returns the backend of the namespace """
+        return Cache.backend if self.shared else Cache.local_backend
+
+    def get(self, key):
+        """ Returns the cached value of a key or None """
+        return self.get_backend().get(self.namespace, key)
+
+    def set(self, key, value):
+        """ Caches the value of a key """
+        self.get_backend().set(self.namespace, key, value, self.ttl, self.max_entries)
+
+    def update(self, key, function):
+        """ Caches function(cached value or None) as the value of a key atomically for every worker sharing the backend, returns it """
+        return self.get_backend().update(self.namespace, key, function, self.ttl, self.max_entries)
+
+    def delete(self, *keys):
+        """ Drops the cached values of the keys """
+        self.get_backend().delete(self.namespace, keys)
+
+    def clear(self):
+        """ Drops every cached value of the namespace """
+        self.get_backend().clear(self.namespace)
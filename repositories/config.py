@@ -1,8 +1,10 @@
 """ Defines the Config repository """
 
 from models import Config, ConfigYear, ConfigYearHoliday
+from .base import BaseRepository
+from .cache import Cache
 
-class ConfigRepository:
+class ConfigRepository(BaseRepository):
     """ The repository for the config model """
 
     @staticmethod
@@ -21,13 +23,15 @@ class ConfigRepository:
     def create_config_year_holiday(year, get_by, holiday_name, holiday_date):
         """ Create a config year holiday """
         config_year = ConfigYearHoliday(year, get_by, holiday_name, holiday_date)
-        return config_year.save()
+        config_year = config_year.save()
+        ConfigsRepository._holidays.delete(str(year))
+        return config_year
 
     @staticmethod
     def read_config(config_name):
         """ Query a config by config_name """
         config_query = Config.query.filter_by(config_name=config_name)
-        return config_query.one() if config_query.count() == 1 else None
+        return ConfigRepository.read_one(config_query)
     
     @staticmethod
     def read_config_system_path(config_name):
@@ -45,17 +49,32 @@ class ConfigRepository:
     def read_config_year(year):
         """ Query a config year by year """
         config_year = ConfigYear.query.filter_by(year=year)
-        return config_year.one() if config_year.count() == 1 else None
+        return ConfigRepository.read_one(config_year)
+
+class ConfigsRepository(BaseRepository):
+    """ The repository for all configs
+        The holidays of each year are cached formatted, they are shared and must not be modified """
 
-class ConfigsRepository:
-    """ The repository for all configs """
+    _holidays = Cache("config_year_holidays", max_entries=2)
 
     @staticmethod
     def read_configs():
         """ Query all configs """
-        return Config.query.all()
+        return ConfigsRepository.read_all(Config.query)
 
     @staticmethod
     def read_config_year_holidays(year):
-        """ Query all config year holidays """
-        return ConfigYearHoliday.query.filter(ConfigYearHoliday.year == year).all()
\ No newline at end of file
+        """ Query and format all config year holidays, served from the cache """
+
+        holidays = ConfigsRepository._holidays.get(str(year))
+        if holidays == None:
+            holidays = [{
+                "id": holiday.id,
+                "year": holiday.year,
+                "get_by": holiday.get_by,
+                "holiday_name": holiday.holiday_name,
+                "holiday_date": holiday.holiday_date.strftime("%Y-%m-%d")
+            } for holiday in ConfigsRepository.read_all(ConfigYearHoliday.query.filter(ConfigYearHoliday.year == year))]
+            ConfigsRepository._holidays.set(str(year), holidays)
+
+        return holidays
\ No newline at end of file
@@ -1,13 +1,35 @@
 """ Defines the Dynamic Page repository """
 
-from models import DynamicPage
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
-def format_dynamic_component(system_configuration, student_token, advisor_token, comp):
-    """ Format a component by its type """
+import threading
+
+from models import (
+    DynamicPage, DynamicComponent, DynamicPageHasComponent, DynamicComponentInnerHtml, DynamicComponentInput,
+    DynamicComponentInputDateRule, DynamicComponentUpload, DynamicComponentSelect, DynamicComponentSelectOption,
+    DynamicComponentSelectUpload, DynamicComponentDownload, DynamicComponentButton, DynamicComponentDetails
+)
+from .base import BaseRepository, read_only
+from .cache import Cache
+from .workflow import WorkflowRepository
+
+# maximum quantity of cached page skeletons
+DYNAMIC_PAGE_CACHE_SIZE = 512
+
+# models whose changes invalidate the cached page skeletons
+DYNAMIC_PAGE_MODELS = (
+    DynamicPage, DynamicComponent, DynamicPageHasComponent, DynamicComponentInnerHtml, DynamicComponentInput,
+    DynamicComponentInputDateRule, DynamicComponentUpload, DynamicComponentSelect, DynamicComponentSelectOption,
+    DynamicComponentSelectUpload, DynamicComponentDownload, DynamicComponentButton, DynamicComponentDetails
+)
+
+def format_dynamic_component(comp):
+    """ Format a component by its type, inner_html components keep their raw text to be parsed by request """
     formated_comp = None
 
     if comp.type == "inner_html":
-        formated_comp = format_dc_inner_html(system_configuration, student_token, advisor_token, comp)
+        formated_comp = format_dc_inner_html(comp)
     elif comp.type == "input":
         formated_comp = format_dc_input(comp)
     elif comp.type == "upload":
@@ -28,10 +50,10 @@ def format_dynamic_component(system_configuration, student_token, advisor_token,
     
     return formated_comp
 
-def format_dc_inner_html(system_configuration, student_token, advisor_token, comp):
-    """ Format a inner_html component """
+def format_dc_inner_html(comp):
+    """ Format a inner_html component without parsing it """
     return {
-        "inner_html": system_configuration.sistem_str_parser(comp.dynamic_component_inner_html.inner_html, student_token, advisor_token)
+        "inner_html": comp.dynamic_component_inner_html.inner_html
     }
 
 def format_dc_input(comp):
@@ -144,33 +166,97 @@ def format_dc_details(comp):
         "details_type": comp.dynamic_component_details.details_type
     }
 
-class DynamicPageRepository:
-    """ The repository for a single dynamic page """
+class DynamicPageRepository(BaseRepository):
+    """ The repository for a single dynamic page
+        Formatted pages are cached by id without their user data, only the inner_html components are parsed by request """
+
+    _skeletons = Cache("dynamic_page_skeletons", max_entries=DYNAMIC_PAGE_CACHE_SIZE)
+    _hits = 0
+    _misses = 0
+    _statistics_lock = threading.Lock()
 
     @staticmethod
-    def read_dynamic_page(system_configuration, student_token, advisor_token, id, format=True):
-        """ Query and format a dynamic page by id """
-        dp = None
+    @read_only
+    def read_dynamic_page_skeleton(id):
+        """ Query and format a dynamic page by id with its inner_html components not parsed
+            The result is cached and shared by every request, it must not be modified """
+
+        # the cache keys follow the workflow version stamp, so edits done by other workers are also seen
+        skeleton_key = (WorkflowRepository.version(), id)
+
+        skeleton = DynamicPageRepository._skeletons.get(skeleton_key)
+        with DynamicPageRepository._statistics_lock:
+            if skeleton:
+                DynamicPageRepository._hits += 1
+            else:
+                DynamicPageRepository._misses += 1
+        if skeleton:
+            return skeleton
 
         # query and validate
-        dp_query = DynamicPage.query.filter_by(id=id)
-        if dp_query.count() == 1:
-            dp = dp_query.one()
-        
-        # if not format
-        if not format or not dp:
-            return dp
+        dp = DynamicPageRepository.read_one(DynamicPage.query.filter_by(id=id))
+        if not dp:
+            return None
 
         # format
-        formated_dp = {
+        skeleton = {
             "id": dp.id,
             "title": dp.title,
             "components": []
         }
         for dp_has_comp in dp.dynamic_page_has_component:
-            dynamic_component = dp_has_comp.dynamic_component
-            formated_comp = format_dynamic_component(system_configuration, student_token, advisor_token, dynamic_component)
+            formated_comp = format_dynamic_component(dp_has_comp.dynamic_component)
             formated_comp["component_order"] = dp_has_comp.dynamic_component_order
-            formated_dp["components"].append(formated_comp)
-        
-        return formated_dp
\ No newline at end of file
+            skeleton["components"].append(formated_comp)
+
+        DynamicPageRepository._skeletons.set(skeleton_key, skeleton)
+        return skeleton
+
+    @staticmethod
+    def read_dynamic_page(system_configuration, student_token, advisor_token, id, format=True):
+        """ Query and format a dynamic page by id, parsing its inner_html components with the user tokens """
+
+        # if not format
+        if not format:
+            return DynamicPageRepository.read_one(DynamicPage.query.filter_by(id=id))
+
+        skeleton = DynamicPageRepository.read_dynamic_page_skeleton(id)
+        if not skeleton:
+            return None
+
+        # only the inner_html components are copied, the others are shared with the cache
+        template_context = None
+        components = []
+        for comp in skeleton["components"]:
+            if comp["component_type"] == "inner_html":
+                template_context = template_context or system_configuration.get_template_context(student_token, advisor_token)
+                comp = dict(comp, inner_html=system_configuration.sistem_str_parser(comp["inner_html"], template_context=template_context))
+            components.append(comp)
+
+        return {
+            "id": skeleton["id"],
+            "title": skeleton["title"],
+            "components": components
+        }
+
+    @staticmethod
+    def invalidate_dynamic_pages():
+        """ Drops every cached page skeleton """
+        DynamicPageRepository._skeletons.clear()
+
+    @staticmethod
+    def cache_statistics():
+        """ Returns the page skeleton cache hits and misses of this worker """
+        with DynamicPageRepository._statistics_lock:
+            return {
+                "hits": DynamicPageRepository._hits,
+                "misses": DynamicPageRepository._misses
+            }
+
+@event.listens_for(Session, "after_flush")
+def invalidate_flushed_dynamic_pages(session, flush_context):
+    """ Drops the cached page skeletons when any dynamic page model is written """
+    for instance in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(instance, DYNAMIC_PAGE_MODELS):
+            DynamicPageRepository.invalidate_dynamic_pages()
+            return
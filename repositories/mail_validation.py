@@ -1,8 +1,9 @@
 """ Defines the MailValidation repository """
 
 from models import MailValidation
+from .base import BaseRepository
 
-class MailValidationRepository:
+class MailValidationRepository(BaseRepository):
     """ The repository for mail_validations """
 
     @staticmethod
@@ -20,14 +21,12 @@ class MailValidationRepository:
         # query by institutional_email and validation_code
         if institutional_email and validation_code:
             mail_validation_query = MailValidation.query.filter_by(institutional_email=institutional_email, validation_code=validation_code)
-            if mail_validation_query.count() == 1:
-                mail_validation = mail_validation_query.one()
+            mail_validation = MailValidationRepository.read_one(mail_validation_query)
         
         # query by institutional_email only
         elif institutional_email:
             mail_validation_query = MailValidation.query.filter_by(institutional_email=institutional_email)
-            if mail_validation_query.count() == 1:
-                mail_validation = mail_validation_query.one()
+            mail_validation = MailValidationRepository.read_one(mail_validation_query)
         
         return mail_validation
     
@@ -1,48 +1,124 @@
 """ Defines the Reason repository """
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from models import ConfigReason, ConfigReasonClass
+from .base import BaseRepository, read_only
+from .cache import Cache
+from .workflow import WorkflowRepository
 
-class ReasonsRepository:
-    """ The repository for multiple reasons """
+# length of the substrings indexed for the reason_content filter, shorter filters scan every reason
+CONTENT_INDEX_GRAM = 3
 
-    @staticmethod
-    def read_reasons(system_configuration, student_token=None, advisor_token=None, class_names=None, reason_id=None, reason_content=None):
-        """ Query reasons using user_has_state_id and filters """
+def content_grams(text):
+    """ Returns the set of lowercase substrings of CONTENT_INDEX_GRAM characters of a text """
+    text = text.lower()
+    return {text[i:i + CONTENT_INDEX_GRAM] for i in range(len(text) - CONTENT_INDEX_GRAM + 1)}
 
-        # read and format all reason classes
-        reasons_classes = ConfigReasonClass.query.all()
-        formatted_reasons_classes = []
+class ReasonCatalog:
+    """ The reasons with their raw inner_html indexed by id, class name and content substrings
+        Its dictionaries are shared by every request and must not be modified """
 
-        # format response
-        for clss in reasons_classes:
-            formatted_reasons_classes.append({
+    def __init__(self, version):
+        self.version = version
+        self.classes = []
+        self.reasons = {}
+        self.class_reason_ids = {}
+        self.content_reason_ids = {}
+
+    def build(self):
+        """ Queries and indexes all reason classes and reasons """
+
+        class_names = {}
+        for clss in ReasonsRepository.read_all(ConfigReasonClass.query.order_by(ConfigReasonClass.config_id)):
+            class_names[clss.config_id] = clss.class_name
+            self.class_reason_ids[clss.class_name] = []
+            self.classes.append({
                 "reason_class_id": clss.config_id,
                 "reason_class_name": clss.class_name
             })
-        
-        # read reasons 
-        reasons_query = ConfigReasonClass.query\
-            .join(ConfigReason, ConfigReasonClass.config_id == ConfigReason.reason_class_id)\
-            .add_columns(ConfigReason.id.label("reason_id"), ConfigReason.inner_html.label("reason_inner_html"))
 
-        # apply filters, if any
+        for reason in ReasonsRepository.read_all(ConfigReason.query.order_by(ConfigReason.id)):
+            self.reasons[reason.id] = {
+                "reason_id": reason.id,
+                "reason_inner_html": reason.inner_html,
+                "reason_class_id": reason.reason_class_id,
+                "reason_class_name": class_names.get(reason.reason_class_id)
+            }
+            self.class_reason_ids.setdefault(class_names.get(reason.reason_class_id), []).append(reason.id)
+            for gram in content_grams(reason.inner_html):
+                self.content_reason_ids.setdefault(gram, set()).add(reason.id)
+
+        return self
+
+    def filter(self, class_names=None, reason_id=None, reason_content=None):
+        """ Returns the ids of the reasons that match every filter, ordered by id """
+
         if class_names != None:
-            reason_class_list = class_names.split(",")
-            reasons_query.filter(ConfigReason.class_name.in_(reason_class_list))
+            reason_ids = set()
+            for class_name in class_names.split(","):
+                reason_ids.update(self.class_reason_ids.get(class_name, []))
+        else:
+            reason_ids = set(self.reasons)
+
         if reason_id != None:
-            reasons_query.filter(ConfigReason.id == reason_id)
+            reason_ids &= {int(reason_id)} if str(reason_id).isdigit() else set()
+
+        # the index narrows the candidates, the case insensitive substring check confirms them
         if reason_content != None:
-            reasons_query.filter(ConfigReason.inner_html.like("%{}%".format(reason_content)))
+            content = reason_content.lower()
+            for gram in content_grams(content):
+                reason_ids &= self.content_reason_ids.get(gram, set())
+            reason_ids = {id for id in reason_ids if content in self.reasons[id]["reason_inner_html"].lower()}
+
+        return sorted(reason_ids)
+
+class ReasonsRepository(BaseRepository):
+    """ The repository for multiple reasons, served from a catalog cached by each worker process
+        The catalog follows the workflow version stamp and is dropped when a reason model is written """
+
+    _catalogs = Cache("reason_catalog", max_entries=1, shared=False)
+
+    @staticmethod
+    @read_only
+    def read_catalog():
+        """ Returns the cached reason catalog, rebuilding it if it is stale """
+
+        workflow_version = WorkflowRepository.version()
+
+        catalog = ReasonsRepository._catalogs.get(workflow_version)
+        if not catalog:
+            catalog = ReasonCatalog(workflow_version).build()
+            ReasonsRepository._catalogs.set(workflow_version, catalog)
+
+        return catalog
+
+    @staticmethod
+    def read_reasons(system_configuration, student_token=None, advisor_token=None, class_names=None, reason_id=None, reason_content=None):
+        """ Read the reason classes and the filtered reasons, only the returned reasons are parsed """
+
+        catalog = ReasonsRepository.read_catalog()
 
         # format response
-        reasons = reasons_query.all()
+        template_context = system_configuration.get_template_context(student_token, advisor_token)
         formatted_reasons = []
-        for reason in reasons:
-            formatted_reasons.append({
-                "reason_id": reason.reason_id,
-                "reason_inner_html": system_configuration.sistem_str_parser(reason.reason_inner_html, student_token, advisor_token),
-                "reason_class_id": reason.ConfigReasonClass.config_id,
-                "reason_class_name": reason.ConfigReasonClass.class_name
-            })
+        for id in catalog.filter(class_names, reason_id, reason_content):
+            reason = catalog.reasons[id]
+            formatted_reasons.append(dict(reason,
+                reason_inner_html=system_configuration.sistem_str_parser(reason["reason_inner_html"], template_context=template_context)))
+
+        return { "classes": catalog.classes, "reasons": formatted_reasons }
+
+    @staticmethod
+    def invalidate_reasons():
+        """ Drops the cached reason catalog """
+        ReasonsRepository._catalogs.clear()
 
-        return { "classes": formatted_reasons_classes, "reasons": formatted_reasons }
\ No newline at end of file
+@event.listens_for(Session, "after_flush")
+def invalidate_flushed_reasons(session, flush_context):
+    """ Drops the reason catalog when any reason model is written """
+    for instance in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(instance, (ConfigReason, ConfigReasonClass)):
+            ReasonsRepository.invalidate_reasons()
+            return
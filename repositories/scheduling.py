@@ -1,8 +1,9 @@
 """ Defines the Scheduling repository """
 
-from models import Scheduling, SchedulingStateTransition
+from models import db, Scheduling, SchedulingStateTransition, UnitOfWork
+from .base import BaseRepository
 
-class SchedulingRepository:
+class SchedulingRepository(BaseRepository):
     """ The repository for singe scheduling """
 
     @staticmethod
@@ -21,7 +22,7 @@ class SchedulingRepository:
     def read_scheduling(scheduling_id):
         """ Query a scheduling by its id """
         scheduling_query = Scheduling.query.filter_by(id=scheduling_id)
-        return scheduling_query.one() if scheduling_query.count() == 1 else None
+        return SchedulingRepository.read_one(scheduling_query)
     
     @staticmethod
     def update_scheduling(scheduled_id, scheduled_status):
@@ -34,18 +35,50 @@ class SchedulingRepository:
         scheduling.scheduled_status = scheduled_status
         return scheduling.save()
 
-class SchedulingsRepository:
+# quantity of pending schedulings fetched by each round trip of the scheduler bootstrap
+PENDING_SCHEDULINGS_CHUNK_ROWS = 500
+
+class SchedulingsRepository(BaseRepository):
     """ The repository for multiple schedulings """
 
+    @staticmethod
+    def stream_pending_schedulings(chunk_rows=PENDING_SCHEDULINGS_CHUNK_ROWS):
+        """ Query the pending schedulings joined with their state transition ordered by date
+            Rows are streamed in chunks of chunk_rows, with only the columns needed to schedule them """
+
+        pending_query = Scheduling.query\
+            .join(SchedulingStateTransition, Scheduling.id == SchedulingStateTransition.scheduling_id)\
+            .with_entities(
+                Scheduling.id, Scheduling.scheduled_datetime,
+                SchedulingStateTransition.user_has_solicitation_state_id, SchedulingStateTransition.state_transition_scheduled_id
+            )\
+            .filter(Scheduling.scheduled_status == "Pending")\
+            .order_by(Scheduling.scheduled_datetime.asc())
+
+        return pending_query.yield_per(chunk_rows)
+
     @staticmethod
     def read_schedulings(user_has_state_id=None):
         """ Query all schedulings """
 
         if user_has_state_id == None:
-            return Scheduling.query.all()
+            return SchedulingsRepository.read_all(Scheduling.query)
         
         Schedulings_query = Scheduling.query\
             .join(SchedulingStateTransition, Scheduling.id == SchedulingStateTransition.scheduling_id)\
             .filter(SchedulingStateTransition.user_has_solicitation_state_id == user_has_state_id)
         
-        return Schedulings_query.all() if Schedulings_query.count() > 0 else []
\ No newline at end of file
+        return SchedulingsRepository.read_all(Schedulings_query)
+    
+    @staticmethod
+    def update_schedulings(scheduling_ids, scheduled_status):
+        """ Update the status of many schedulings with a single statement """
+
+        if not scheduling_ids:
+            return 0
+
+        updated = Scheduling.query.filter(Scheduling.id.in_(scheduling_ids))\
+            .update({Scheduling.scheduled_status: scheduled_status})
+        if not UnitOfWork.current():
+            db.session.commit()
+        return updated
\ No newline at end of file
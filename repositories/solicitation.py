@@ -2,16 +2,54 @@
 
 import json
 from datetime import datetime
-from models import Solicitation, SolicitationState, UserHasProfileAdvisorData, UserHasSolicitation, UserHasSolicitationState
+from models import (
+    Solicitation, SolicitationState, UnitOfWork, UserHasProfile, UserHasProfileAdvisorData, UserHasSolicitation, UserHasSolicitationState
+)
+from .advisors import AdvisorsRepository
+from .base import BaseRepository
+from .cache import Cache
+from .user_profile_token import UserProfileTokenRepository
 
-class SolicitationRepository:
-    """ The repository for single user solicitations """
+# maximum quantity of solicitations kept in the access index and seconds that their user ids are used
+ACCESS_INDEX_SIZE = 8192
+ACCESS_INDEX_SECONDS = 300
+
+def format_solicitation_state(ss):
+    """ Format a solicitation state with its profile editors joined by commas """
+
+    # parses state profile editors
+    state_profile_editor_acronyms = ""
+    state_profile_editor_names = ""
+    for ss_profile_editor in ss.solicitation_state_profile_editors:
+        profile = ss_profile_editor.profile
+        state_profile_editor_acronyms += ("," if len(state_profile_editor_acronyms) > 0 else "") + profile.profile_acronym
+        state_profile_editor_names += ("," if len(state_profile_editor_names) > 0 else "") + profile.profile_name
+
+    # formats the result
+    formatted_ss = ss.columns_json
+    formatted_ss["state_profile_editor_acronyms"] = state_profile_editor_acronyms
+    formatted_ss["state_profile_editor_names"] = state_profile_editor_names
+
+    return formatted_ss
+
+class SolicitationRepository(BaseRepository):
+    """ The repository for single user solicitations
+        The student and advisor ids of each solicitation are cached as an access index, checked before building any token """
+
+    # a user has solicitation state never moves to another solicitation, so its entries only leave by size
+    _state_solicitation_ids = Cache("user_solicitation_state_solicitation_ids", max_entries=ACCESS_INDEX_SIZE)
+    _solicitation_user_ids = Cache("user_solicitation_user_ids", ttl=ACCESS_INDEX_SECONDS, max_entries=ACCESS_INDEX_SIZE)
 
     @staticmethod
     def create_user_solicitation(user_id, advisor_siape, solicitation_id, actual_solicitation_state_id, is_accepted_by_advisor=False, solicitation_user_data=None):
         """ Create a user has solicitation """
         user_has_solicitation = UserHasSolicitation(user_id, advisor_siape, solicitation_id, actual_solicitation_state_id, is_accepted_by_advisor, solicitation_user_data)
-        return user_has_solicitation.save()
+        user_has_solicitation = user_has_solicitation.save()
+
+        # keeps advisor student counts and tokens current
+        AdvisorsRepository.update_advisor_student_count(user_id, None, advisor_siape)
+        UserProfileTokenRepository.invalidate_advisor_profile_tokens([advisor_siape])
+        return user_has_solicitation
     
     @staticmethod
     def create_user_solicitation_state(user_has_solicitation_id, solicitation_state_id, decision, start_datetime, reason=None, end_datetime=None):
@@ -24,12 +62,11 @@ class SolicitationRepository:
         """ Read and format a solicitation """
 
         # query solicitation
-        solicitation_query = Solicitation.query.filter_by(id=solicitation_id)
-        if solicitation_query.count() != 1:
+        solicitation = SolicitationRepository.read_one(Solicitation.query.filter_by(id=solicitation_id))
+        if not solicitation:
             return None
         
         # returns if not include state and mail
-        solicitation = solicitation_query.one()
         if not include_initial_state and not include_initial_mails:
             return solicitation
         
@@ -41,7 +78,7 @@ class SolicitationRepository:
         # add initial state
         if include_initial_state:
             initial_state_query = SolicitationState.query.filter(SolicitationState.solicitation_id == solicitation_id, SolicitationState.is_initial_state)
-            initial_state = initial_state_query.one() if initial_state_query.count() == 1 else None
+            initial_state = SolicitationRepository.read_one(initial_state_query)
             solicitation_data["solicitation_initial_state"] = initial_state.json
         
         # add initial mails
@@ -60,30 +97,15 @@ class SolicitationRepository:
         """ Read and format a solicitation state """
 
         # query solicitation
-        ss_query = SolicitationState.query.filter_by(id=solicitation_state_id)
-        if ss_query.count() != 1:
+        ss = SolicitationRepository.read_one(SolicitationState.query.filter_by(id=solicitation_state_id))
+        if not ss:
             return None
         
         # returns if not include state and mail
-        ss = ss_query.one()
         if not include_profile_editors:
             return ss
         
-        # parses state profile editors
-        ss_profile_editors = ss.solicitation_state_profile_editors
-        state_profile_editor_acronyms = ""
-        state_profile_editor_names = ""
-        for ss_profile_editor in ss_profile_editors:
-            profile = ss_profile_editor.profile
-            state_profile_editor_acronyms += ("," if len(state_profile_editor_acronyms) > 0 else "") + profile.profile_acronym
-            state_profile_editor_names += ("," if len(state_profile_editor_names) > 0 else "") + profile.profile_name
-
-        # formats the result
-        formatted_ss = ss.json
-        formatted_ss["state_profile_editor_acronyms"] = state_profile_editor_acronyms
-        formatted_ss["state_profile_editor_names"] = state_profile_editor_names
-
-        return formatted_ss
+        return format_solicitation_state(ss)
 
     @staticmethod
     def read_user_solicitation(user_has_solicitation_id=None, user_id=None, solicitation_id=None):
@@ -92,12 +114,12 @@ class SolicitationRepository:
         # returns a user_has_solicitation given its user_has_solicitation_id
         if user_has_solicitation_id:
             uhs_query = UserHasSolicitation.query.filter_by(id=user_has_solicitation_id)
-            return uhs_query.one() if uhs_query.count() == 1 else None
+            return SolicitationRepository.read_one(uhs_query)
         
         # returns a user_has_solicitation given its user_id and solicitation_id
         elif user_id and solicitation_id:
             uhs_query = UserHasSolicitation.query.filter(UserHasSolicitation.user_id == user_id, UserHasSolicitation.solicitation_id == solicitation_id)
-            return uhs_query.one() if uhs_query.count() == 1 else None
+            return SolicitationRepository.read_one(uhs_query)
         
         return None
     
@@ -105,12 +127,8 @@ class SolicitationRepository:
     def read_user_solicitation_state(user_has_state_id, format=True, convert_dates_to_str=True):
         """ Query user has solicitation state by its id """
         
-        uhss_query = UserHasSolicitationState.query.filter_by(id=user_has_state_id)
-        if uhss_query.count() != 1:
-            return None
-
-        uhss = uhss_query.one()
-        if not format:
+        uhss = SolicitationRepository.read_one(UserHasSolicitationState.query.filter_by(id=user_has_state_id))
+        if not uhss or not format:
             return uhss
 
         # read other tables
@@ -161,48 +179,55 @@ class SolicitationRepository:
         }
 
     @staticmethod
-    def read_solicitation_user_ids(user_has_solicitation_id):
-        """ Query student and advisor ids from user has solicitation by its id """
+    def read_solicitation_user_ids(user_has_solicitation_id, cached=True):
+        """ Query student and advisor ids from user has solicitation by its id, served from the access index if cached
+            The index entries of the other workers may be stale until their TTL, so writes must read them with cached=False """
 
-        user_has_solicitation = SolicitationRepository.read_user_solicitation(user_has_solicitation_id)
-        if not user_has_solicitation:
-            return None
+        user_ids = SolicitationRepository._solicitation_user_ids.get(user_has_solicitation_id) if cached else None
+        if user_ids:
+            return dict(user_ids)
 
-        # advisor
-        uhpd_query = UserHasProfileAdvisorData.query.filter_by(siape=user_has_solicitation.advisor_siape)
-        user_has_profile_advisor_data = uhpd_query.one() if uhpd_query.count() == 1 else None
-        advisor_user_has_profile = user_has_profile_advisor_data.user_has_profile if user_has_profile_advisor_data else None
+        # student and advisor ids joined in a single query
+        user_ids_query = UserHasSolicitation.query\
+            .outerjoin(UserHasProfileAdvisorData, UserHasSolicitation.advisor_siape == UserHasProfileAdvisorData.siape)\
+            .outerjoin(UserHasProfile, UserHasProfileAdvisorData.user_has_profile_id == UserHasProfile.id)\
+            .filter(UserHasSolicitation.id == user_has_solicitation_id)\
+            .with_entities(UserHasSolicitation.user_id.label("student_id"), UserHasProfile.user_id.label("advisor_id"))
+        user_ids = SolicitationRepository.read_one(user_ids_query)
+        if not user_ids:
+            return None
 
         response = {
-            "student_id": user_has_solicitation.user_id,
-            "advisor_id": advisor_user_has_profile.user_id if advisor_user_has_profile else None
+            "student_id": user_ids.student_id,
+            "advisor_id": user_ids.advisor_id
         }
-        
+        SolicitationRepository._solicitation_user_ids.set(user_has_solicitation_id, dict(response))
+
         return response
     
     @staticmethod
-    def read_solicitation_state_user_ids(user_has_state_id):
-        """ Query student and advisor ids from user has solicitation state by its id """
+    def read_solicitation_state_user_ids(user_has_state_id, cached=True):
+        """ Query student and advisor ids from user has solicitation state by its id, served from the access index if cached """
 
-        user_has_solicitation_state = SolicitationRepository.read_user_solicitation_state(user_has_state_id, format=False)
-        
-        if not user_has_solicitation_state:
-            return None
+        user_has_solicitation_id = SolicitationRepository._state_solicitation_ids.get(user_has_state_id)
+        if not user_has_solicitation_id:
+            user_has_solicitation_state = SolicitationRepository.read_user_solicitation_state(user_has_state_id, format=False)
+            if not user_has_solicitation_state:
+                return None
 
-        # user    
-        user_has_solicitation = user_has_solicitation_state.user_has_solicitation
+            user_has_solicitation_id = user_has_solicitation_state.user_has_solicitation_id
+            SolicitationRepository._state_solicitation_ids.set(user_has_state_id, user_has_solicitation_id)
 
-        # advisor
-        uhpd_query = UserHasProfileAdvisorData.query.filter_by(siape=user_has_solicitation.advisor_siape)
-        user_has_profile_advisor_data = uhpd_query.one() if uhpd_query.count() == 1 else None
-        advisor_user_has_profile = user_has_profile_advisor_data.user_has_profile if user_has_profile_advisor_data else None
+        return SolicitationRepository.read_solicitation_user_ids(user_has_solicitation_id, cached)
 
-        response = {
-            "student_id": user_has_solicitation.user_id,
-            "advisor_id": advisor_user_has_profile.user_id if advisor_user_has_profile else None
-        }
-        
-        return response
+    @staticmethod
+    def invalidate_solicitation_user_ids(user_has_solicitation_id):
+        """ Drops the cached user ids of a solicitation
+            Inside a unit of work they are dropped again after its commit, so no ids are cached from uncommitted data """
+
+        SolicitationRepository._solicitation_user_ids.delete(user_has_solicitation_id)
+        if UnitOfWork.current():
+            UnitOfWork.on_commit(SolicitationRepository.invalidate_solicitation_user_ids, user_has_solicitation_id)
 
     @staticmethod
     def update_user_solicitation(user_has_solicitation_id, solicitation_user_data=None, actual_solicitation_state_id=None, advisor_siape=None, is_accepted_by_advisor=None):
@@ -214,6 +239,7 @@ class SolicitationRepository:
             return None
 
         # update its fields and save
+        old_advisor_siape = uhs.advisor_siape
         if solicitation_user_data:
             uhs.solicitation_user_data = solicitation_user_data
         if actual_solicitation_state_id:
@@ -222,8 +248,14 @@ class SolicitationRepository:
             uhs.advisor_siape = advisor_siape
         if is_accepted_by_advisor:
             uhs.is_accepted_by_advisor = is_accepted_by_advisor
+        uhs = uhs.save()
 
-        return uhs.save()
+        # keeps advisor student counts and tokens current
+        AdvisorsRepository.update_advisor_student_count(uhs.user_id, old_advisor_siape, uhs.advisor_siape)
+        if old_advisor_siape != uhs.advisor_siape:
+            UserProfileTokenRepository.invalidate_advisor_profile_tokens([old_advisor_siape, uhs.advisor_siape])
+            SolicitationRepository.invalidate_solicitation_user_ids(uhs.id)
+        return uhs
     
     @staticmethod
     def update_user_solicitation_state(user_has_state_id, decision, reason):
@@ -1,29 +1,103 @@
 """ Defines the Solicitations repository """
 
-from models import User, UserHasSolicitation
+import base64
+import binascii
+from datetime import timedelta
+from sqlalchemy import and_
+from sqlalchemy.orm import joinedload, selectinload
 
-class SolicitationsRepository:
+from models import (
+    SolicitationState, SolicitationStateProfileEditors, UserHasProfile, UserHasProfileAdvisorData, UserHasSolicitation,
+    UserHasSolicitationState
+)
+from .base import BaseRepository, read_only
+
+# default and maximum quantity of solicitations returned by page
+DEFAULT_PAGE_ROWS = 50
+MAX_PAGE_ROWS = 200
+
+class SolicitationsRepository(BaseRepository):
     """ The repository for multiple solicitations """
 
     @staticmethod
-    def read_user_solicitations(student_id=None, advisor_id=None):
-        """ Query solicitations by student, advisor id or all """
+    def encode_cursor(last_user_has_solicitation_id):
+        """ Creates the opaque cursor token that points after a user solicitation id """
+        return base64.urlsafe_b64encode(str(last_user_has_solicitation_id).encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """ Returns the user solicitation id pointed by a cursor token or None if the token is invalid """
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8"))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    @staticmethod
+    def user_solicitations_query():
+        """ Query user solicitations eager loading everything used by their formatting
+            Does a fixed number of queries whatever the quantity of solicitations """
+
+        return UserHasSolicitation.query.options(
+            # many to one relations are joined in the main query
+            joinedload(UserHasSolicitation.solicitation),
+            joinedload(UserHasSolicitation.user),
+            joinedload(UserHasSolicitation.user_has_profile_advisor_data)
+                .joinedload(UserHasProfileAdvisorData.user_has_profile)
+                .joinedload(UserHasProfile.user),
+            # collections are batched with one select in query each
+            selectinload(UserHasSolicitation.user_has_solicitation_state)
+                .joinedload(UserHasSolicitationState.solicitation_state)
+                .selectinload(SolicitationState.solicitation_state_profile_editors)
+                .joinedload(SolicitationStateProfileEditors.profile)
+        )
+
+    @staticmethod
+    @read_only
+    def read_user_solicitations(student_id=None, advisor_id=None, solicitation_id=None, state_id=None, decision=None,
+        start_date=None, end_date=None, after_id=None, limit=DEFAULT_PAGE_ROWS):
+        """ Query a page of solicitations by student, advisor id or all, ordered by id
+            Filters are applied by the database, decision applies to the actual state and dates to the state starts
+            Returns the solicitations and the cursor to the next page, None if it is the last one """
+
+        uhs_query = SolicitationsRepository.user_solicitations_query()
 
         if student_id:
-            return UserHasSolicitation.query.filter_by(user_id=student_id).all()
-        
+            uhs_query = uhs_query.filter(UserHasSolicitation.user_id == student_id)
+
         elif advisor_id:
-            advisor_solicitations = None
+            uhs_query = uhs_query\
+                .join(UserHasProfileAdvisorData, UserHasSolicitation.advisor_siape == UserHasProfileAdvisorData.siape)\
+                .join(UserHasProfile, UserHasProfileAdvisorData.user_has_profile_id == UserHasProfile.id)\
+                .filter(UserHasProfile.user_id == advisor_id)
+
+        # filters
+        if solicitation_id != None:
+            uhs_query = uhs_query.filter(UserHasSolicitation.solicitation_id == solicitation_id)
+        if state_id != None:
+            uhs_query = uhs_query.filter(UserHasSolicitation.actual_solicitation_state_id == state_id)
+        if decision != None:
+            uhs_query = uhs_query.filter(UserHasSolicitation.user_has_solicitation_state.any(and_(
+                UserHasSolicitationState.solicitation_state_id == UserHasSolicitation.actual_solicitation_state_id,
+                UserHasSolicitationState.decision == decision
+            )))
+        if start_date != None or end_date != None:
+            date_filters = []
+            if start_date != None:
+                date_filters.append(UserHasSolicitationState.start_datetime >= start_date)
+            if end_date != None:
+                date_filters.append(UserHasSolicitationState.start_datetime < end_date + timedelta(days=1))
+            uhs_query = uhs_query.filter(UserHasSolicitation.user_has_solicitation_state.any(and_(*date_filters)))
+
+        # keyset pagination, one more row is read to know if there is a next page
+        if after_id != None:
+            uhs_query = uhs_query.filter(UserHasSolicitation.id > after_id)
 
-            advisor_query = User.query.filter_by(id=advisor_id)
-            if advisor_query.count() == 1:
-                advisor_user = advisor_query.one()
-                
-                for advisor_profile in advisor_user.user_has_profile:
-                    if advisor_profile.user_has_profile_advisor_data:
-                        advisor_siape = advisor_profile.user_has_profile_advisor_data.siape
-                        advisor_solicitations = UserHasSolicitation.query.filter_by(advisor_siape=advisor_siape).all()
+        limit = min(limit or DEFAULT_PAGE_ROWS, MAX_PAGE_ROWS)
+        user_solicitations = SolicitationsRepository.read_all(uhs_query.order_by(UserHasSolicitation.id.asc()).limit(limit + 1))
 
-            return advisor_solicitations
+        next_cursor = None
+        if len(user_solicitations) > limit:
+            user_solicitations = user_solicitations[:limit]
+            next_cursor = SolicitationsRepository.encode_cursor(user_solicitations[-1].id)
 
-        return UserHasSolicitation.query.all()
\ No newline at end of file
+        return user_solicitations, next_cursor
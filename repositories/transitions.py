@@ -1,6 +1,7 @@
 """ Defines the Transitions repository """
 
 from models import SolicitationStateTransition
+from .base import BaseRepository, read_only
 
 def format_solicitation_state_transition(sst):
     """ format each of the transitions by its type """
@@ -17,6 +18,15 @@ def format_solicitation_state_transition(sst):
     
     return formatted_sst
 
+def format_transition(sst):
+    """ formats a transition with its type fields and its states """
+    formatted_sst = format_solicitation_state_transition(sst)
+    formatted_sst["id"] = sst.id
+    formatted_sst["transition_name"] = sst.transition_name
+    formatted_sst["solicitation_state_id_from"] = sst.solicitation_state_id_from
+    formatted_sst["solicitation_state_id_to"] = sst.solicitation_state_id_to
+    return formatted_sst
+
 def format_sst_manual(sst):
     """ formats a manual transition """
     sst_manual = sst.solicitation_state_transition_manual
@@ -62,7 +72,7 @@ def format_sst_mail(sst):
         
     return formatted_sst_mails
 
-class SolicitationStateTransitionRepository:
+class SolicitationStateTransitionRepository(BaseRepository):
     """ The repository for a single solicitation state transition """
 
     @staticmethod
@@ -70,11 +80,10 @@ class SolicitationStateTransitionRepository:
         """ Query transition mails given transition id """
 
         # query the transitions
-        sst_query = SolicitationStateTransition.query.filter_by(id=transition_id)
-        if sst_query.count() != 1:
+        sst = SolicitationStateTransitionRepository.read_one(SolicitationStateTransition.query.filter_by(id=transition_id))
+        if not sst:
             return None
         
-        sst = sst_query.one()
         sst_mails = sst.solicitation_state_transition_mail
         
         # returns if it is not to format
@@ -85,33 +94,23 @@ class SolicitationStateTransitionRepository:
         
         return formatted_sst_mails
 
-class SolicitationStateTransitionsRepository:
+class SolicitationStateTransitionsRepository(BaseRepository):
     """ The repository for multiple solicitation state transitions """
 
     @staticmethod
+    @read_only
     def read_solicitation_state_transitions(solicitation_state_id_from, format=True):
         """ Query all transitions from a originating solicitation state given its id """
 
         # query the solicitations
         ssts_query = SolicitationStateTransition.query.filter_by(solicitation_state_id_from=solicitation_state_id_from)
-        if ssts_query.count() == 0:
+        ssts = SolicitationStateTransitionsRepository.read_all(ssts_query)
+        if not ssts:
             return None
         
-        ssts = ssts_query.all()
-        
         # returns if it is not to format
-        if not format or not ssts:
+        if not format:
             return ssts
 
         # format the ssts
-        formatted_ssts = []
-        for sst in ssts:
-            formatted_sst = format_solicitation_state_transition(sst)
-            formatted_sst["id"] = sst.id
-            formatted_sst["transition_name"] = sst.transition_name
-            formatted_sst["solicitation_state_id_from"] = sst.solicitation_state_id_from
-            formatted_sst["solicitation_state_id_to"] = sst.solicitation_state_id_to
-
-            formatted_ssts.append(formatted_sst)
-        
-        return formatted_ssts
\ No newline at end of file
+        return [format_transition(sst) for sst in ssts]
\ No newline at end of file
@@ -1,8 +1,10 @@
 """ Defines the User repository """
 
 from models import User, UserHasAttachment, UserHasProfileAdvisorData
+from .base import BaseRepository
+from .user_profile_token import UserProfileTokenRepository
 
-class UserRepository:
+class UserRepository(BaseRepository):
     """ The repository for one user """
 
     @staticmethod
@@ -17,14 +19,10 @@ class UserRepository:
         user = None
 
         if id:
-            user_query = User.query.filter_by(id=id)
-            if user_query.count() == 1:
-                user = user_query.one()
+            user = UserRepository.read_one(User.query.filter_by(id=id))
 
         elif institutional_email:
-            user_query = User.query.filter_by(institutional_email=institutional_email)
-            if user_query.count() == 1:
-                user = user_query.one()
+            user = UserRepository.read_one(User.query.filter_by(institutional_email=institutional_email))
 
         return user
     
@@ -32,11 +30,10 @@ class UserRepository:
     def read_advisor_profile_user(siape):
         """ Query a advisor user by siape """
 
-        uhpd_query = UserHasProfileAdvisorData.query.filter_by(siape=siape)
-        if uhpd_query.count() != 1:
+        user_has_profile_advisor_data = UserRepository.read_one(UserHasProfileAdvisorData.query.filter_by(siape=siape))
+        if not user_has_profile_advisor_data:
             return None
         
-        user_has_profile_advisor_data = uhpd_query.one()
         user_has_profile = user_has_profile_advisor_data.user_has_profile
         user = user_has_profile.user
 
@@ -52,27 +49,35 @@ class UserRepository:
         if not user:
             return None
         
-        if secondary_email:
-            user.secondary_email = secondary_email
-        if user_name:
-            user.user_name = user_name
-        if gender:
-            user.gender = gender
-        if phone:
-            user.phone = phone
+        # fields of the user profile token
+        profile_fields = {
+            "secondary_email": secondary_email, "user_name": user_name, "gender": gender, "phone": phone, "creation_datetime": creation_datetime
+        }
+        profile_changed = False
+        for field, value in profile_fields.items():
+            if value and getattr(user, field) != value:
+                setattr(user, field, value)
+                profile_changed = True
+
         if password_hash:
             user.password_hash = password_hash
         if password_salt:
             user.password_salt = password_salt
-        if creation_datetime:
-            user.creation_datetime = creation_datetime
 
-        return user.save()
+        # only the token fields change the profile version, so password updates keep the versioned tokens
+        if profile_changed:
+            user.profile_version = User.profile_version + 1
+        user = user.save()
+
+        # the user profile token has the updated fields
+        if profile_changed:
+            UserProfileTokenRepository.invalidate_user_profile_tokens([user.id])
+        return user
 
-class UsersRepository:
+class UsersRepository(BaseRepository):
     """ The repository for all users """
 
     @staticmethod
     def read_users():
         """ Query all configs """
-        return User.query.all()
\ No newline at end of file
+        return UsersRepository.read_all(User.query)
\ No newline at end of file
@@ -1,69 +1,273 @@
 """ Defines the repository to creating profile tokens """
 
-from models import User, UserHasSolicitation
+from flask import g, has_app_context
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload
 
-class UserProfileTokenRepository:
-    """ The repository for a user profile token """
+import copy
+import time
+
+from models import db, RoutingSession, UnitOfWork, User, UserHasProfile, UserHasProfileAdvisorData
+from .advisors import AdvisorsRepository
+from .base import BaseRepository
+from .cache import Cache
+
+# maximum quantity of cached tokens and seconds that a cached token is used
+TOKEN_CACHE_SIZE = 2048
+TOKEN_CACHE_SECONDS = 300
+
+def format_user_profile_token(user):
+    """ Format a user and its eager loaded profiles as a profile token, students counts are zeroed """
+
+    # creates response object with user profiles, used in jwt authentication and to parse dynamic strings
+    user_token = {
+        "user_id": user.id,
+        "institutional_email": user.institutional_email,
+        "secondary_email": user.secondary_email,
+        "user_name": user.user_name,
+        "gender": user.gender,
+        "phone": user.phone,
+        "creation_datetime": user.creation_datetime.strftime("%Y-%m-%d %H:%M:%S") if user.creation_datetime else "",
+        "profiles": [],
+        "profile_acronyms": []
+    }
+
+    # creates user fields based on its profiles
+    for user_has_profile in user.user_has_profile:
+        profile = user_has_profile.profile
+
+        # basic columns
+        formated_profile = {
+            "profile_name": profile.profile_name,
+            "profile_acronym": profile.profile_acronym,
+            "profile_dynamic_fields_metadata": profile.profile_dynamic_fields_metadata,
+            "user_dinamyc_profile_fields_data": user_has_profile.user_dinamyc_profile_fields_data,
+            "start_datetime": user_has_profile.start_datetime.strftime("%Y-%m-%d %H:%M:%S") if user_has_profile.start_datetime else "",
+            "end_datetime": user_has_profile.end_datetime.strftime("%Y-%m-%d %H:%M:%S") if user_has_profile.end_datetime else ""
+        }
+
+        # profile specific fields
+        # coordinator
+        if user_has_profile.user_has_profile_coordinator_data:
+            formated_profile["siape"] = user_has_profile.user_has_profile_coordinator_data.siape
+            formated_profile["coordinator_students"] = 0
+
+        # advisor
+        elif user_has_profile.user_has_profile_advisor_data:
+            formated_profile["siape"] = user_has_profile.user_has_profile_advisor_data.siape
+            formated_profile["advisor_students"] = 0
+
+        # student
+        elif user_has_profile.user_has_profile_student_data:
+            formated_profile["matricula"] = user_has_profile.user_has_profile_student_data.matricula
+            formated_profile["course"] = user_has_profile.user_has_profile_student_data.course
+
+        user_token["profiles"].append(formated_profile)
+        user_token["profile_acronyms"].append(formated_profile["profile_acronym"])
+
+    return user_token
+
+class UserProfileClaims(dict):
+    """ The claims of a compact jwt, expanded with the cached profile token of its user when a missing field is read
+        Requests that only read the compact claims never read the profile token """
+
+    def __init__(self, claims):
+        super().__init__(claims)
+        self.expanded = "profiles" in claims
+
+    def __missing__(self, key):
+        self.expand()
+        if key in self:
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key not in self:
+            self.expand()
+        return dict.get(self, key, default)
+
+    def expand(self):
+        """ Adds the profile token fields missing in the claims """
+
+        if self.expanded:
+            return
+        self.expanded = True
+
+        user_token = UserProfileTokenRepository.read_user_profile_token(dict.get(self, "user_id"))
+        for key, value in (user_token or {}).items():
+            self.setdefault(key, value)
+
+class UserProfileTokenRepository(BaseRepository):
+    """ The repository for a user profile token
+        Built tokens are kept in a bounded cache with TTL and memoized by request, so a request never builds the same token twice """
+
+    _cache = Cache("user_profile_tokens", ttl=TOKEN_CACHE_SECONDS, max_entries=TOKEN_CACHE_SIZE)
+    _invalidations = Cache("user_profile_tokens_invalidations")
+    _versioned_tokens = Cache("user_profile_versioned_tokens", ttl=TOKEN_CACHE_SECONDS, max_entries=TOKEN_CACHE_SIZE)
+
+    @staticmethod
+    def user_profile_graph_query():
+        """ Query users joining their whole profile graph in a single statement """
+
+        user_has_profile = joinedload(User.user_has_profile)
+        return User.query.options(
+            user_has_profile.joinedload(UserHasProfile.profile),
+            user_has_profile.joinedload(UserHasProfile.user_has_profile_coordinator_data),
+            user_has_profile.joinedload(UserHasProfile.user_has_profile_advisor_data),
+            user_has_profile.joinedload(UserHasProfile.user_has_profile_student_data)
+        )
+
+    @staticmethod
+    def request_memo():
+        """ Returns the tokens already read by the current request or app context """
+        return g.setdefault("user_profile_tokens", {}) if has_app_context() else {}
+
+    @staticmethod
+    def read_user_profile_tokens(user_ids):
+        """ Read a batch of profile tokens by user id from the request memo, the cache or the database
+            Returns a dictionary by user id with copies that can be modified, missing users are not present """
+
+        user_ids = {user_id for user_id in user_ids if user_id != None}
+        if not user_ids:
+            return {}
+
+        memo = UserProfileTokenRepository.request_memo()
+        user_tokens = {user_id: memo[user_id] for user_id in user_ids if user_id in memo}
+        missing_ids = user_ids - user_tokens.keys()
+
+        # reads the cached tokens
+        for user_id in missing_ids:
+            cached_token = UserProfileTokenRepository._cache.get(user_id)
+            if cached_token:
+                user_tokens[user_id] = cached_token
+        missing_ids -= user_tokens.keys()
+
+        # builds the remaining tokens and caches them
+        if missing_ids:
+            built_tokens = UserProfileTokenRepository.build_user_profile_tokens(missing_ids)
+            for user_id, user_token in built_tokens.items():
+                UserProfileTokenRepository._cache.set(user_id, user_token)
+            user_tokens.update(built_tokens)
+
+        memo.update(user_tokens)
+        return {user_id: copy.deepcopy(user_token) for user_id, user_token in user_tokens.items()}
+
+    @staticmethod
+    def build_user_profile_tokens(user_ids):
+        """ Query a batch of users by id and makes their profile tokens
+            Returns a dictionary by user id, missing users are not present """
+
+        # tokens are cached, so they are built from the primary to not cache the replica lag
+        with RoutingSession.writing():
+            users = UserProfileTokenRepository.read_all(
+                UserProfileTokenRepository.user_profile_graph_query().filter(User.id.in_(user_ids))
+            )
+            user_tokens = {user.id: format_user_profile_token(user) for user in users}
+
+            # coordinator and advisor students of the whole batch counted by a single grouped query
+            siape_profiles = [profile for token in user_tokens.values() for profile in token["profiles"] if "siape" in profile]
+            if siape_profiles:
+                siapes_students = AdvisorsRepository.read_advisors_students([profile["siape"] for profile in siape_profiles])
+                for profile in siape_profiles:
+                    students_key = "coordinator_students" if "coordinator_students" in profile else "advisor_students"
+                    profile[students_key] = siapes_students.get(profile["siape"], 0)
+
+        return user_tokens
+
+    @staticmethod
+    def expand_user_claims(jwt_data):
+        """ Returns the claims of a jwt as a per request dictionary, compact claims are expanded on demand """
+        return UserProfileClaims(jwt_data)
 
     @staticmethod
     def read_user_profile_token(user_id):
         """ Query a user by id and makes its profile token """
+        return UserProfileTokenRepository.read_user_profile_tokens([user_id]).get(user_id)
+
+    @staticmethod
+    def read_user_profile_version(user_id):
+        """ Select the profile version column of a user from the primary, None if the user does not exist """
+        with RoutingSession.writing():
+            return db.session.execute(select(User.profile_version).where(User.id == user_id)).scalar()
 
-        user_query = User.query.filter_by(id=user_id)
-        if user_query.count() != 1:
+    @staticmethod
+    def read_versioned_user_profile_token(user_id):
+        """ Read a profile token kept while the database profile version of the user does not change
+            Used to renew access tokens, only the version column is selected until the profile changes """
+
+        profile_version = UserProfileTokenRepository.read_user_profile_version(user_id)
+        if profile_version == None:
             return None
-        user = user_query.one()
-
-        # creates response object with user profiles, used in jwt authentication and to parse dynamic strings
-        user_token = {
-            "user_id": user.id,
-            "institutional_email": user.institutional_email,
-            "secondary_email": user.secondary_email,
-            "user_name": user.user_name,
-            "gender": user.gender,
-            "phone": user.phone,
-            "creation_datetime": user.creation_datetime.strftime("%Y-%m-%d %H:%M:%S") if user.creation_datetime else "",
-            "profiles": [],
-            "profile_acronyms": []
-        }
 
-        # creates user fields based on its profiles
-        for user_has_profile in user.user_has_profile:
-            profile = user_has_profile.profile
-
-            # basic columns
-            formated_profile = {
-                "profile_name": profile.profile_name,
-                "profile_acronym": profile.profile_acronym,
-                "profile_dynamic_fields_metadata": profile.profile_dynamic_fields_metadata,
-                "user_dinamyc_profile_fields_data": user_has_profile.user_dinamyc_profile_fields_data,
-                "start_datetime": user_has_profile.start_datetime.strftime("%Y-%m-%d %H:%M:%S") if user_has_profile.start_datetime else "",
-                "end_datetime": user_has_profile.end_datetime.strftime("%Y-%m-%d %H:%M:%S") if user_has_profile.end_datetime else ""
-            }
-            
-            # profile specific fields
-            # coordinator
-            if user_has_profile.user_has_profile_coordinator_data:
-                formated_profile["siape"] = user_has_profile.user_has_profile_coordinator_data.siape
-                formated_profile["coordinator_students"] = UserHasSolicitation.query\
-                    .with_entities(UserHasSolicitation.advisor_siape, UserHasSolicitation.user_id)\
-                    .filter_by(advisor_siape=formated_profile["siape"])\
-                    .distinct().count()
-
-            # advisor
-            elif user_has_profile.user_has_profile_advisor_data:
-                formated_profile["siape"] = user_has_profile.user_has_profile_advisor_data.siape
-                formated_profile["advisor_students"] = UserHasSolicitation.query\
-                    .with_entities(UserHasSolicitation.advisor_siape, UserHasSolicitation.user_id)\
-                    .filter_by(advisor_siape=formated_profile["siape"])\
-                    .distinct().count()
-
-            # student
-            elif user_has_profile.user_has_profile_student_data:
-                formated_profile["matricula"] = user_has_profile.user_has_profile_student_data.matricula
-                formated_profile["course"] = user_has_profile.user_has_profile_student_data.course
-
-            user_token["profiles"].append(formated_profile)
-            user_token["profile_acronyms"].append(formated_profile["profile_acronym"])
-
-        return user_token
\ No newline at end of file
+        versioned_key = (user_id, profile_version)
+        user_token = UserProfileTokenRepository._versioned_tokens.get(versioned_key)
+        if not user_token:
+            user_token = UserProfileTokenRepository.read_user_profile_token(user_id)
+            if not user_token:
+                return None
+            UserProfileTokenRepository._versioned_tokens.set(versioned_key, user_token)
+
+        return copy.deepcopy(user_token)
+
+    @staticmethod
+    def read_state_user_profile_tokens(state_user_ids):
+        """ Makes the student and advisor profile tokens of a solicitation with a single batch """
+
+        student_id = state_user_ids["student_id"]
+        advisor_id = state_user_ids["advisor_id"]
+        user_tokens = UserProfileTokenRepository.read_user_profile_tokens([student_id, advisor_id])
+
+        return user_tokens.get(student_id), user_tokens.get(advisor_id)
+
+    @staticmethod
+    def tokens_epoch():
+        """ Returns a key that changes after the token invalidations and after each cache TTL
+            Used to version the responses parsed with profile tokens """
+        return UserProfileTokenRepository._invalidations.get("last"), int(time.time() // TOKEN_CACHE_SECONDS)
+
+    @staticmethod
+    def invalidate_user_profile_tokens(user_ids):
+        """ Drops the cached and memoized tokens of the users
+            Inside a unit of work they are dropped again after its commit, so no token is cached from uncommitted data """
+
+        user_ids = {user_id for user_id in user_ids if user_id != None}
+        if not user_ids:
+            return
+
+        memo = UserProfileTokenRepository.request_memo()
+        for user_id in user_ids:
+            memo.pop(user_id, None)
+        UserProfileTokenRepository._cache.delete(*user_ids)
+        UserProfileTokenRepository._invalidations.set("last", time.time_ns())
+
+        if UnitOfWork.current():
+            UnitOfWork.on_commit(UserProfileTokenRepository.invalidate_user_profile_tokens, user_ids)
+
+    @staticmethod
+    def invalidate_advisor_profile_tokens(advisor_siapes):
+        """ Drops the cached tokens of the advisors, used when their students change """
+
+        advisor_siapes = [siape for siape in advisor_siapes if siape]
+        if not advisor_siapes:
+            return
+
+        advisors_query = UserHasProfile.query\
+            .join(UserHasProfileAdvisorData, UserHasProfileAdvisorData.user_has_profile_id == UserHasProfile.id)\
+            .filter(UserHasProfileAdvisorData.siape.in_(advisor_siapes))\
+            .with_entities(UserHasProfile.user_id)
+        advisor_ids = [advisor.user_id for advisor in UserProfileTokenRepository.read_all(advisors_query)]
+
+        UserProfileTokenRepository.increment_user_profile_versions(advisor_ids)
+        UserProfileTokenRepository.invalidate_user_profile_tokens(advisor_ids)
+
+    @staticmethod
+    def increment_user_profile_versions(user_ids):
+        """ Increments the database profile version of the users, must be called by every profile write besides update_user """
+
+        if not user_ids:
+            return
+
+        with UnitOfWork():
+            db.session.execute(
+                update(User).where(User.id.in_(user_ids)).values(profile_version=User.profile_version + 1).execution_options(synchronize_session=False)
+            )
\ No newline at end of file
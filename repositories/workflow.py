@@ -0,0 +1,192 @@
+""" Defines the workflow repository, a process wide cache of the solicitation workflows """
+
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import (
+    db, RoutingSession, Solicitation, SolicitationStartMail, SolicitationState, SolicitationStateProfileEditors, SolicitationStateTransition,
+    SolicitationStateTransitionMail, SolicitationWorkflowVersion
+)
+from .base import BaseRepository
+from .cache import Cache
+from .solicitation import format_solicitation_state
+from .transitions import format_transition
+
+logging = logging.getLogger(__name__)
+
+class WorkflowGraph:
+    """ The formatted solicitation workflows indexed by id, built with a fixed number of queries
+        Its dictionaries are shared by every request and must not be modified """
+
+    def __init__(self, version):
+        self.version = version
+        self.solicitations = {}
+        self.solicitation_initial_states = {}
+        self.solicitation_initial_mails = {}
+        self.states = {}
+        self.state_transitions = {}
+        self.transition_mails = {}
+
+    def build(self):
+        """ Queries and formats all workflows """
+
+        for solicitation in WorkflowRepository.read_all(Solicitation.query.order_by(Solicitation.id)):
+            self.solicitations[solicitation.id] = solicitation.columns_json
+            self.solicitation_initial_mails[solicitation.id] = []
+
+        # states with their profile editors
+        states_query = SolicitationState.query\
+            .options(selectinload(SolicitationState.solicitation_state_profile_editors).joinedload(SolicitationStateProfileEditors.profile))\
+            .order_by(SolicitationState.id)
+        for ss in WorkflowRepository.read_all(states_query):
+            self.states[ss.id] = format_solicitation_state(ss)
+            if ss.is_initial_state:
+                self.solicitation_initial_states[ss.solicitation_id] = self.states[ss.id]
+
+        # start mails
+        start_mails_query = SolicitationStartMail.query.options(joinedload(SolicitationStartMail.dynamic_mail)).order_by(SolicitationStartMail.id)
+        for start_mail in WorkflowRepository.read_all(start_mails_query):
+            self.solicitation_initial_mails.setdefault(start_mail.solicitation_id, []).append(start_mail.dynamic_mail.columns_json)
+
+        # transitions with their four types and mails
+        transitions_query = SolicitationStateTransition.query.options(
+            joinedload(SolicitationStateTransition.solicitation_state_transition_manual),
+            joinedload(SolicitationStateTransition.solicitation_state_transition_from_dynamic_page),
+            joinedload(SolicitationStateTransition.solicitation_state_transition_scheduled),
+            selectinload(SolicitationStateTransition.solicitation_state_transition_mail).joinedload(SolicitationStateTransitionMail.dynamic_mail)
+        ).order_by(SolicitationStateTransition.id)
+        for sst in WorkflowRepository.read_all(transitions_query):
+            self.state_transitions.setdefault(sst.solicitation_state_id_from, []).append(format_transition(sst))
+            self.transition_mails[sst.id] = [sst_mail.dynamic_mail.columns_json for sst_mail in sst.solicitation_state_transition_mail]
+
+        return self
+
+class WorkflowRepository(BaseRepository):
+    """ The repository for the solicitation workflows, served from a cached graph
+        The graph is rebuilt after invalidate or when the database version stamp changes
+        The stamp is checked by a background thread once started, so the requests do no database work while it does not change """
+
+    # seconds between the checks of the database version stamp
+    version_check_seconds = 10
+
+    _graphs = Cache("workflow_graph", max_entries=1, shared=False)
+    _graph_checked = 0.0
+    _graph_lock = threading.Lock()
+
+    # last stamp read by the version check thread, None while it is not running
+    _checked_version = None
+
+    @staticmethod
+    def read_version():
+        """ Select the workflow version stamp without the ORM, 0 if it was never set """
+        return db.session.execute(text("SELECT version FROM solicitation_workflow_version WHERE id = 1")).scalar() or 0
+
+    @staticmethod
+    def start_version_checks(flask_server):
+        """ Starts the thread that reads the database version stamp every version_check_seconds """
+
+        def check_versions():
+
+            # uses the background pool to not compete with the web app connections
+            RoutingSession.route_thread("background")
+
+            while True:
+                try:
+                    with flask_server.app_context():
+                        WorkflowRepository._checked_version = WorkflowRepository.read_version()
+                except Exception as e:
+                    logging.warning(f"WorkflowRepository: Error checking the workflow version: {e}")
+                time.sleep(WorkflowRepository.version_check_seconds)
+
+        threading.Thread(target=check_versions, daemon=True).start()
+
+    @staticmethod
+    def load(min_version=None):
+        """ Builds the graph, called at startup and whenever it is stale
+            With min_version the graph is rebuilt only if the cached one is still older, so the threads that saw it stale build it once """
+
+        with WorkflowRepository._graph_lock:
+            if min_version != None:
+                graph = WorkflowRepository._graphs.get("graph")
+                if graph != None and graph.version >= min_version:
+                    return graph
+
+            graph = WorkflowGraph(WorkflowRepository.read_version()).build()
+            WorkflowRepository._graphs.set("graph", graph)
+            WorkflowRepository._graph_checked = time.monotonic()
+
+        return graph
+
+    @staticmethod
+    def graph():
+        """ Returns the cached graph, rebuilding it if it was invalidated or the database version stamp changed """
+
+        graph = WorkflowRepository._graphs.get("graph")
+        if graph == None:
+            return WorkflowRepository.load(min_version=0)
+
+        # compares with the stamp of the check thread, a graph loaded after the last check may be newer than it
+        checked_version = WorkflowRepository._checked_version
+        if checked_version != None:
+            return WorkflowRepository.load(min_version=checked_version) if checked_version > graph.version else graph
+
+        # without the check thread, like in scripts, checks the stamp inline
+        if time.monotonic() - WorkflowRepository._graph_checked > WorkflowRepository.version_check_seconds:
+            WorkflowRepository._graph_checked = time.monotonic()
+            version = WorkflowRepository.read_version()
+            if version != graph.version:
+                return WorkflowRepository.load(min_version=version if version > graph.version else None)
+
+        return graph
+
+    @staticmethod
+    def version():
+        """ Returns the version stamp of the cached graph, used to version the responses built from workflows and configs """
+        return WorkflowRepository.graph().version
+
+    @staticmethod
+    def invalidate():
+        """ Increments the database version stamp and drops the cached graph
+            Must be called after editing any workflow, reason or config table, workers with a local cache rebuild on their next version check """
+
+        workflow_version = WorkflowRepository.read_one(SolicitationWorkflowVersion.query.filter_by(id=1))
+        if not workflow_version:
+            workflow_version = SolicitationWorkflowVersion()
+        workflow_version.version += 1
+        workflow_version.save()
+
+        WorkflowRepository._graphs.delete("graph")
+
+    @staticmethod
+    def read_solicitation(solicitation_id):
+        """ Read a formatted solicitation with its initial state and initial mails """
+
+        graph = WorkflowRepository.graph()
+        solicitation = graph.solicitations.get(solicitation_id)
+        if not solicitation:
+            return None
+
+        return {
+            "solicitation": solicitation,
+            "solicitation_initial_state": graph.solicitation_initial_states.get(solicitation_id),
+            "solicitation_initial_mails": graph.solicitation_initial_mails.get(solicitation_id, [])
+        }
+
+    @staticmethod
+    def read_solicitation_state(solicitation_state_id):
+        """ Read a formatted solicitation state with its profile editors """
+        return WorkflowRepository.graph().states.get(solicitation_state_id)
+
+    @staticmethod
+    def read_solicitation_state_transitions(solicitation_state_id_from):
+        """ Read the formatted transitions from a solicitation state, None if it has no transitions """
+        return WorkflowRepository.graph().state_transitions.get(solicitation_state_id_from)
+
+    @staticmethod
+    def read_solicitation_state_transition_mails(transition_id):
+        """ Read the formatted mails of a transition, None if the transition does not exist """
+        return WorkflowRepository.graph().transition_mails.get(transition_id)
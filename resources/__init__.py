@@ -2,7 +2,8 @@ from .advisors import AdvisorsResource
 from .config import ConfigResource, ConfigsResource
 from .dynamic_page import DynamicPageResource
 from .file_transmission import FileTransmitionResource
-from .login import LoginResource
+from .login import LoginRefreshResource, LoginResource
+from .pool_statistics import PoolStatisticsResource
 from .reasons import ReasonsResource
 from .send_mail import SendMailResource
 from .signup import SignupResource
@@ -6,8 +6,8 @@ from flask.json import jsonify
 from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
-from repositories import ConfigRepository, ConfigsRepository
-from util import parse_params
+from repositories import ConfigRepository, ConfigsRepository, WorkflowRepository
+from util import etag_headers, is_etag_fresh, make_etag, not_modified, parse_params, PUBLIC_CACHE_CONTROL
 
 class ConfigResource(Resource):
     """ HTTP methods relative to the config """
@@ -15,8 +15,15 @@ class ConfigResource(Resource):
     @staticmethod
     def get(config_name):
         """ Return an config key information based on its config_name """
+
+        etag = make_etag("config", WorkflowRepository.version(), config_name)
+        if is_etag_fresh(etag):
+            return not_modified(etag, PUBLIC_CACHE_CONTROL)
+
         config = ConfigRepository.read_config(config_name=config_name)
-        return jsonify({"config": config.json})
+        response = jsonify({"config": config.json})
+        response.headers.update(etag_headers(etag, PUBLIC_CACHE_CONTROL))
+        return response
 
 class ConfigsResource(Resource):
     """ HTTP methods relative to all configs """
@@ -24,5 +31,12 @@ class ConfigsResource(Resource):
     @staticmethod
     def get():
         """ Return all configurations """
+
+        etag = make_etag("configs", WorkflowRepository.version())
+        if is_etag_fresh(etag):
+            return not_modified(etag, PUBLIC_CACHE_CONTROL)
+
         configs = ConfigsRepository.read_configs()
-        return jsonify({"configs": [config.json for config in configs]})
\ No newline at end of file
+        response = jsonify({"configs": [config.json for config in configs]})
+        response.headers.update(etag_headers(etag, PUBLIC_CACHE_CONTROL))
+        return response
\ No newline at end of file
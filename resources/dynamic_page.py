@@ -6,8 +6,8 @@ from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
 import logging
-from repositories import DynamicPageRepository, SolicitationRepository, UserProfileTokenRepository
-from util import parse_params_with_user_authentication, sysconf
+from repositories import DynamicPageRepository, SolicitationRepository, UserProfileTokenRepository, WorkflowRepository
+from util import etag_headers, is_etag_fresh, make_etag, not_modified, parse_params_with_user_authentication, sysconf
 
 logging = logging.getLogger(__name__)
 
@@ -22,6 +22,12 @@ class DynamicPageResource(Resource):
     def get(jwt_data, page_id, user_has_state_id=None):
         """ Get a dynamic page and its components """
 
+        # versioned by the page and, when it is parsed with user data, by the profile tokens
+        etag = make_etag("dynamic_page", WorkflowRepository.version(), page_id, user_has_state_id,
+            UserProfileTokenRepository.tokens_epoch() if user_has_state_id else None)
+        if is_etag_fresh(etag):
+            return not_modified(etag)
+
         student_token = None
         advisor_token = None
 
@@ -32,8 +38,7 @@ class DynamicPageResource(Resource):
         
             # read student and advisor tokens to parse the strings from reasons
             if(state_user_ids):
-                student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-                advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
+                student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
 
         formatted_dynamic_page = DynamicPageRepository.read_dynamic_page(sysconf, student_token, advisor_token, page_id)
-        return formatted_dynamic_page, 200
\ No newline at end of file
+        return formatted_dynamic_page, 200, etag_headers(etag)
\ No newline at end of file
@@ -2,6 +2,7 @@
 Define the REST HTTP verbs for user login
 """
 
+from flask import request
 from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
@@ -9,7 +10,7 @@ import logging
 from base64 import b64decode
 from repositories import UserRepository, UserProfileTokenRepository
 from util import parse_params
-from util import syssecurity
+from util import sysratelimiter, syssecurity
 
 logging = logging.getLogger(__name__)
 
@@ -26,6 +27,12 @@ class LoginResource(Resource):
         login_institutional_email, login_plain_password = b64decode(Authorization.replace("Basic ", "")).decode("utf-8").split(':', 1)
         logging.info(f"Starting Login authentication for {login_institutional_email}")
 
+        # rejects clients and emails with too many attempts before any database work
+        retry_after = sysratelimiter.hit_all(("login_ip", request.remote_addr), ("login_email", login_institutional_email.lower()))
+        if retry_after:
+            logging.info(f"A user authentication was throttled, for {login_institutional_email}")
+            return "Muitas tentativas de login, tente novamente mais tarde", 429, {"Retry-After": str(retry_after)}
+
         db_user = UserRepository.read_user(institutional_email=login_institutional_email)
 
         # checks for user data in db
@@ -38,17 +45,53 @@ class LoginResource(Resource):
             return "Usuário não cadastrado", 401
 
         # verifies password
-        login_password_hash, _ = syssecurity.get_password_hash(login_plain_password, db_user.password_salt)
+        try:
+            password_valid, password_needs_upgrade = syssecurity.verify_password(
+                login_plain_password, db_user.password_hash, db_user.password_salt)
+        except TimeoutError:
+            logging.warning(f"A user authentication failed, for {login_institutional_email}, password hash pool busy")
+            return "Servidor ocupado, tente novamente em instantes", 503
 
-        if login_password_hash != db_user.password_hash:
+        if not password_valid:
             logging.info(f"A user authentication failed, for {login_institutional_email}, incorrect password")
             return "Senha incorreta", 401
 
+        # upgrades the hashes of older key derivations, the login is not blocked if the pool is busy
+        if password_needs_upgrade:
+            try:
+                password_hash, password_salt = syssecurity.hash_password(login_plain_password)
+                UserRepository.update_user(id=db_user.id, password_hash=password_hash, password_salt=password_salt)
+                logging.info(f"Password hash upgraded for {login_institutional_email}")
+            except TimeoutError:
+                logging.warning(f"Password hash upgrade skipped for {login_institutional_email}, password hash pool busy")
+
         # creates resoponse object with user profiles to make the jwt
         user_profile_token = UserProfileTokenRepository.read_user_profile_token(db_user.id)
 
-        # creates the jwt
-        jwt_token = syssecurity.jwt_encode(user_profile_token)
+        # creates the jwt with the whole token or with its compact claims, with its refresh jwt if enabled
+        user_tokens = syssecurity.get_user_tokens(user_profile_token)
 
         logging.info(f"User authentication for {login_institutional_email} done")
-        return jwt_token, 200
\ No newline at end of file
+        return user_tokens, 200
+
+class LoginRefreshResource(Resource):
+    """ HTTP methods relative to the access token refresh """
+
+    @staticmethod
+    @parse_params(
+        Argument("Authorization", location="headers", type=str, required=True, help="Required. Bearer with the refresh jwt given by the login.")
+    )
+    def post(Authorization):
+        """ Renews the access jwt of a refresh jwt, without the password and from the cached profile token """
+
+        refresh_token = Authorization.replace("Bearer ", "")
+        try:
+            refresh_data = syssecurity.jwt_decode_refresh_token(refresh_token)
+        except Exception:
+            return "Falha ao atualizar, token de atualização inválido", 401
+
+        user_profile_token = UserProfileTokenRepository.read_versioned_user_profile_token(refresh_data["user_id"])
+        if not user_profile_token:
+            return "Usuário não encontrado no sistema", 401
+
+        return syssecurity.get_user_tokens(user_profile_token, refresh_token), 200
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+Define the REST HTTP verbs relative to the database pool statistics
+"""
+
+from flask_restful import Resource
+
+import logging
+import os
+from models import db
+from repositories import Cache, DynamicPageRepository
+from util import get_pools_statistics, parse_params_with_user_authentication, syssecurity
+
+logging = logging.getLogger(__name__)
+
+class PoolStatisticsResource(Resource):
+    """ HTTP methods relative to the database pool statistics """
+
+    @staticmethod
+    @parse_params_with_user_authentication(accepted_profiles=["ADM"])
+    def get(jwt_data):
+        """ Get the live statistics of the database pools and caches of the worker that answers the request """
+        return {
+            "worker_pid": os.getpid(),
+            "pools": get_pools_statistics(db.engines),
+            "dynamic_page_cache": DynamicPageRepository.cache_statistics(),
+            "cache": Cache.statistics(),
+            "jwt_claims_cache": syssecurity.claims_cache_statistics()
+        }, 200
@@ -6,8 +6,8 @@ from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
 import logging
-from repositories import ReasonsRepository, SolicitationRepository, UserProfileTokenRepository
-from util import parse_params_with_user_authentication, sysconf
+from repositories import ReasonsRepository, SolicitationRepository, UserProfileTokenRepository, WorkflowRepository
+from util import etag_headers, is_etag_fresh, make_etag, not_modified, parse_params_with_user_authentication, sysconf
 
 logging = logging.getLogger(__name__)
 
@@ -23,7 +23,13 @@ class ReasonsResource(Resource):
     ])
     def get(jwt_data, user_has_state_id, class_names=None, reason_id=None, reason_content=None):
         """ Get a filtered list of reasons """
-        
+
+        # versioned by the reasons, the filters and the profile tokens used to parse them
+        etag = make_etag("reasons", WorkflowRepository.version(), user_has_state_id, class_names, reason_id, reason_content,
+            UserProfileTokenRepository.tokens_epoch())
+        if is_etag_fresh(etag):
+            return not_modified(etag)
+
         # read user ids from solicitation state
         state_user_ids = SolicitationRepository.read_solicitation_state_user_ids(user_has_state_id)
         
@@ -32,9 +38,8 @@ class ReasonsResource(Resource):
         advisor_token = None
 
         if(state_user_ids):
-            student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-            advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
+            student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
 
         # format the reasons
         formatted_reasons_response = ReasonsRepository.read_reasons(sysconf, student_token, advisor_token, class_names, reason_id, reason_content)
-        return formatted_reasons_response, 200
\ No newline at end of file
+        return formatted_reasons_response, 200, etag_headers(etag)
\ No newline at end of file
@@ -6,8 +6,8 @@ from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
 import logging
-from repositories import SolicitationRepository, UserProfileTokenRepository
-from util import parse_params_with_user_authentication, sysconf, syssmtpserver
+from repositories import UserProfileTokenRepository
+from util import parse_params_with_user_authentication, solicitation_access_required, sysconf, syssmtpserver
 
 logging = logging.getLogger(__name__)
 
@@ -23,25 +23,17 @@ class SendMailResource(Resource):
         Argument("is_sent_to_advisor", location="json", type=bool, help="If the mail is sent to advisor."),
         Argument("is_sent_to_coordinator", location="json", type=bool, help="If the mail is sent to coordinator."),
     ])
-    def post(jwt_data, user_has_state_id, mail_subject, mail_body, is_sent_to_student=False, is_sent_to_advisor=False, is_sent_to_coordinator=False):
+    @solicitation_access_required()
+    def post(jwt_data, user_has_state_id, mail_subject, mail_body, state_user_ids, is_sent_to_student=False, is_sent_to_advisor=False, is_sent_to_coordinator=False):
         """ Post to send a mail """
 
-        # read user ids from solicitation state
-        state_user_ids = SolicitationRepository.read_solicitation_state_user_ids(user_has_state_id)
-        
         # read student and advisor tokens to parse the strings in the mail message
-        student_token = None
-        advisor_token = None
-
-        if not state_user_ids:
-            return "Estado do usuário não encontrado", 404
-
-        student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-        advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
+        student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
 
         # parses the subject and the body
-        parsed_subject = sysconf.sistem_str_parser(mail_subject, student_token, advisor_token)
-        parsed_body = sysconf.sistem_str_parser(mail_body, student_token, advisor_token)
+        template_context = sysconf.get_template_context(student_token, advisor_token)
+        parsed_subject = sysconf.sistem_str_parser(mail_subject, template_context=template_context)
+        parsed_body = sysconf.sistem_str_parser(mail_body, template_context=template_context)
 
         # sends the e-mail messages
         if is_sent_to_student:
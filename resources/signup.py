@@ -1,6 +1,7 @@
 """
 Define the REST HTTP verbs for user signup
 """
+from flask import request
 from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
@@ -10,7 +11,7 @@ import random
 import string
 from datetime import datetime
 from repositories import UserRepository, MailValidationRepository
-from util import parse_params, syssecurity, syssmtpserver
+from util import parse_params, sysratelimiter, syssecurity, syssmtpserver
 
 logging = logging.getLogger(__name__)
 
@@ -26,6 +27,12 @@ class SignupResource(Resource):
 
         logging.info(f"Starting user Get Authentication Code for {institutional_email}")
 
+        # rejects clients and emails with too many attempts before any database work or mail
+        retry_after = sysratelimiter.hit_all(("signup_ip", request.remote_addr), ("signup_email", institutional_email.lower()))
+        if retry_after:
+            logging.info(f"Signup code request throttled for {institutional_email}")
+            return "Muitas solicitações de cadastro, tente novamente mais tarde", 429, {"Retry-After": str(retry_after)}
+
         # checks for user data in db
         db_user = UserRepository.read_user(institutional_email=institutional_email)
 
@@ -129,7 +136,12 @@ class SignupResource(Resource):
             return "Chave de cadastro inválida para este email", 401
 
         # register the user
-        password_hash, password_salt = syssecurity.get_password_hash(plain_password)
+        try:
+            password_hash, password_salt = syssecurity.hash_password(plain_password)
+        except TimeoutError:
+            logging.warning(f"Signup failed for {institutional_email}, password hash pool busy")
+            return "Servidor ocupado, tente novamente em instantes", 503
+
         datetime_now = datetime.now()
 
         UserRepository.update_user(
@@ -8,14 +8,14 @@ from flask_restful.reqparse import Argument
 import json
 import logging
 from datetime import datetime, timedelta
+from models import UnitOfWork
 from repositories import (
-    DynamicPageRepository, SolicitationRepository, SolicitationStateTransitionsRepository, 
-    UserProfileTokenRepository
+    DynamicPageRepository, SolicitationRepository, UserProfileTokenRepository, WorkflowRepository
 )
 from util import (
     is_solicitation_dynamic_page_components_valid, is_solicitation_profile_edition_allowed, 
     is_solicitation_edition_allowed, parse_new_old_solicitation_user_data, parse_params_with_user_authentication,
-    resolve_solicitation_state_change, schedule_transitions, sysconf, SystemConfiguration, syssmtpserver
+    resolve_solicitation_state_change, schedule_transitions, solicitation_access_required, sysconf, SystemConfiguration, syssmtpserver
 )
 
 logging = logging.getLogger(__name__)
@@ -27,31 +27,20 @@ class SolicitationResource(Resource):
     @parse_params_with_user_authentication(reqparse_arguments=[
         Argument("user_has_state_id", location="args", type=int, required=True, help="Required. Id of the user has state.")
     ])
-    def get(jwt_data, user_has_state_id):
+    @solicitation_access_required()
+    def get(jwt_data, user_has_state_id, state_user_ids):
         """ Get data from a user solicitation state """
 
-        # read user ids from solicitation state
-        state_user_ids = SolicitationRepository.read_solicitation_state_user_ids(user_has_state_id)
-
-        if not state_user_ids:
-            return "Estado do usuário não encontrado", 404
-
-        # get student and advisor tokens to parse the strings from dynamic page components and e-mails
-        student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-        advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
-
-        # check if user has access
-        if not "ADM" in jwt_data["profile_acronyms"] and not "COO" in jwt_data["profile_acronyms"]:
-            if jwt_data["user_id"] != state_user_ids["student_id"] and jwt_data["user_id"] != state_user_ids["advisor_id"]:
-                return "Acesso a solicitação não permitido", 401
-
         # get user has solicitation state data formatted
         formatted_uhss = SolicitationRepository.read_user_solicitation_state(user_has_state_id)
         if not formatted_uhss:
             return "Usuario não possui o estado da solicitação", 404
 
+        # get student and advisor tokens to parse the strings from dynamic page components and e-mails
+        student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
+
         # get transitions and dynamic page
-        transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
+        transitions = WorkflowRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
         dynamic_page = DynamicPageRepository.read_dynamic_page(sysconf, student_token, advisor_token, formatted_uhss["state_dynamic_page_id"])
         
         # get profile tokens
@@ -82,14 +71,14 @@ class SolicitationResource(Resource):
         """ Put to create a student solicitation """
 
         # read solicitation data
-        solicitation_data = SolicitationRepository.read_solicitation(solicitation_id)
+        solicitation_data = WorkflowRepository.read_solicitation(solicitation_id)
         if not solicitation_data or not solicitation_data["solicitation"] or not solicitation_data["solicitation_initial_state"]:
             return "Dados da solicitação não encontrados", 404
         
         solicitation = solicitation_data["solicitation"]
         s_initial_state = solicitation_data["solicitation_initial_state"]
         s_initial_mails = solicitation_data["solicitation_initial_mails"]
-        s_initial_state_transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(s_initial_state["id"])
+        s_initial_state_transitions = WorkflowRepository.read_solicitation_state_transitions(s_initial_state["id"])
 
         # checks if user has solicitation
         uhs = SolicitationRepository.read_user_solicitation(user_id=jwt_data["user_id"], solicitation_id=solicitation_id)
@@ -102,11 +91,12 @@ class SolicitationResource(Resource):
             else (datetime.now() + timedelta(days=s_initial_state["state_max_duration_days"])).strftime("%Y-%m-%d %H:%M:%S")
 
         # send mails
+        template_context = sysconf.get_template_context(jwt_data)
         for mail in s_initial_mails:
       
             # parses mail subject and body
-            parsed_subject = sysconf.sistem_str_parser(mail["mail_subject"], jwt_data)
-            parsed_body = sysconf.sistem_str_parser(mail["mail_body_html"], jwt_data)
+            parsed_subject = sysconf.sistem_str_parser(mail["mail_subject"], template_context=template_context)
+            parsed_body = sysconf.sistem_str_parser(mail["mail_body_html"], template_context=template_context)
 
             # sends to student and coordinator profiles
             if mail["is_sent_to_student"]:
@@ -143,19 +133,10 @@ class SolicitationResource(Resource):
         Argument("transition_id", location="json", type=int, required=True, help="Required. Id of the transition to be executed"),
         Argument("validate_dynamicpage_fields", location="json", type=int, help="If the validation is necessary")
     ])
-    def post(jwt_data, user_has_state_id, solicitation_user_data, transition_id, validate_dynamicpage_fields=1):
+    @solicitation_access_required()
+    def post(jwt_data, user_has_state_id, solicitation_user_data, transition_id, state_user_ids, validate_dynamicpage_fields=1):
         """ Post to update and transit in the state machine of a solicitation """
 
-        # read user ids from solicitation state
-        state_user_ids = SolicitationRepository.read_solicitation_state_user_ids(user_has_state_id)
-
-        if not state_user_ids:
-            return "Estado do usuário não encontrado", 404
-
-        # get student and advisor tokens to parse the strings from dynamic page components and e-mails
-        student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-        advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
-
         # parses the solicitation_user_data to a correct json format
         if solicitation_user_data:
             solicitation_user_data = json.loads(
@@ -170,15 +151,18 @@ class SolicitationResource(Resource):
             return "Estado do usuário não encontrado", 404
 
         # checks if the edition of the solicitation can be done
-        is_allowed, error_msg = is_solicitation_profile_edition_allowed(jwt_data, student_token, advisor_token, formatted_uhss)
+        is_allowed, error_msg = is_solicitation_profile_edition_allowed(jwt_data, state_user_ids, formatted_uhss)
         if not is_allowed:
             return error_msg, 401
         is_allowed, error_msg = is_solicitation_edition_allowed(formatted_uhss)
         if not is_allowed:
             return error_msg, 401
 
+        # get student and advisor tokens to parse the strings from dynamic page components and e-mails
+        student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
+
         # gets sstate transitions and validade
-        transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
+        transitions = WorkflowRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
         if not transitions or len(transitions) == 0:
             return "Transições da solicitação inválidas", 500
 
@@ -205,13 +189,16 @@ class SolicitationResource(Resource):
                     return error_msg, 401
 
         # gets next sstate data
-        next_ss_data = SolicitationRepository.read_solicitation_state(transition["solicitation_state_id_to"])\
+        next_ss_data = WorkflowRepository.read_solicitation_state(transition["solicitation_state_id_to"])\
             if transition["solicitation_state_id_to"] else None
 
         # get parsed solicitation user data using old and new data
         parsed_user_Data = parse_new_old_solicitation_user_data(formatted_uhss["solicitation_user_data"], solicitation_user_data)
 
-        # resolve solicitation change
-        response, status = resolve_solicitation_state_change(formatted_uhss, transition, next_ss_data, parsed_user_Data, student_token, advisor_token)
+        # resolve solicitation change in a single transaction, rolled back on errors
+        with UnitOfWork() as unit_of_work:
+            response, status = resolve_solicitation_state_change(formatted_uhss, transition, next_ss_data, parsed_user_Data, student_token, advisor_token)
+            if status != 200:
+                unit_of_work.rollback()
 
         return response, status
\ No newline at end of file
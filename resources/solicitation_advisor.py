@@ -6,7 +6,7 @@ from flask_restful.reqparse import Argument
 
 import logging
 from repositories import SolicitationRepository, UserRepository, UserProfileTokenRepository
-from util import parse_params_with_user_authentication
+from util import parse_params_with_user_authentication, solicitation_access_required
 
 logging = logging.getLogger(__name__)
 
@@ -38,18 +38,9 @@ class SolicitationAdvisorResource(Resource):
         Argument("user_has_solicitation_id", location="json", type=int, required=True, help="Required. Id of the user solicitation."),
         Argument("advisor_siape", location="json", type=str, required=True, help="Required. Advisor unique Siape")
     ])
-    def put(jwt_data, user_has_solicitation_id, advisor_siape):
+    @solicitation_access_required(id_argument="user_has_solicitation_id")
+    def put(jwt_data, user_has_solicitation_id, advisor_siape, state_user_ids):
         """ A student put a advisor and waits for its aproval in patch """
-        
-        # read user ids from solicitation
-        state_user_ids = SolicitationRepository.read_solicitation_user_ids(user_has_solicitation_id)
-        if not state_user_ids:
-            return "Estado do usuário não encontrado", 404
-
-        # check if the user can perform the put
-        if not "ADM" in jwt_data["profile_acronyms"] and not "COO" in jwt_data["profile_acronyms"]:
-            if jwt_data["user_id"] != state_user_ids["student_id"] and jwt_data["user_id"] != state_user_ids["advisor_id"]:
-                return "Acesso a solicitação não permitido", 401
 
         # check if siape exists
         advisor = UserRepository.read_advisor_profile_user(advisor_siape)
@@ -67,19 +58,10 @@ class SolicitationAdvisorResource(Resource):
         Argument("user_has_solicitation_id", location="json", type=int, required=True, help="Required. Id of the user solicitation."),
         Argument("advisor_siape", location="json", type=str, required=True, help="Required. Advisor unique Siape")
     ])
-    def patch(jwt_data, user_has_solicitation_id, advisor_siape):
+    @solicitation_access_required(id_argument="user_has_solicitation_id", allowed_users=("advisor_id",))
+    def patch(jwt_data, user_has_solicitation_id, advisor_siape, state_user_ids):
         """ A student put a advisor and waits for its aproval in patch """
 
-        # read user ids from solicitation
-        state_user_ids = SolicitationRepository.read_solicitation_user_ids(user_has_solicitation_id)
-        if not state_user_ids:
-            return "Estado do usuário não encontrado", 404
-
-        # check if the user can perform the put
-        if not "ADM" in jwt_data["profile_acronyms"] and not "COO" in jwt_data["profile_acronyms"]:
-            if jwt_data["user_id"] != state_user_ids["advisor_id"]:
-                return "Acesso a solicitação não permitido", 401
-        
         # check if siape exists
         advisor = UserRepository.read_advisor_profile_user(advisor_siape)
         if not advisor:
@@ -2,25 +2,38 @@
 Define the REST HTTP verbs for solicitations
 """
 
-from flask_restful import Resource
+from flask_restful import inputs, Resource
+from flask_restful.reqparse import Argument
 
 import logging
-from repositories import UserRepository, SolicitationsRepository
+from repositories import SolicitationsRepository
 from util import parse_params_with_user_authentication
 
 logging = logging.getLogger(__name__)
 
-def get_formated_user_solicitations(user_solicitations):
-    """ Reusable function that formats all solicitation """
+# filters and keyset pagination arguments shared by the solicitation lists
+SOLICITATIONS_FILTER_ARGUMENTS = [
+    Argument("solicitation_id", location="args", type=int, help="Solicitation id for filtering."),
+    Argument("state_id", location="args", type=int, help="Actual solicitation state id for filtering."),
+    Argument("decision", location="args", type=str, help="Actual state decision for filtering."),
+    Argument("start_date", location="args", type=inputs.date, help="States started from this date(YYYY-MM-DD) for filtering."),
+    Argument("end_date", location="args", type=inputs.date, help="States started until this date(YYYY-MM-DD) for filtering."),
+    Argument("cursor", location="args", type=str, help="Cursor given by the previous page, used to read the next page."),
+    Argument("quantity_rows", location="args", type=inputs.positive, help="Quantity of solicitations in the page.")
+]
+
+def get_formated_user_solicitations(user_solicitations, next_cursor=None):
+    """ Reusable function that formats all solicitation
+        Uses only relations eager loaded by SolicitationsRepository, avoiding a query per solicitation """
 
     # for each solicitation
-    formated_user_solicitations = {"solicitations":[], "count": len(user_solicitations)}
+    formated_user_solicitations = {"solicitations":[], "count": len(user_solicitations), "next_cursor": next_cursor}
     for us in user_solicitations:
 
         # get its users
         solicitation = us.solicitation
-        us_student = UserRepository.read_user(id=us.user_id)
-        us_advisor = UserRepository.read_advisor_profile_user(siape=us.advisor_siape)
+        us_student = us.user
+        us_advisor = us.user_has_profile_advisor_data.user_has_profile.user if us.user_has_profile_advisor_data else None
 
         # format
         us_formatted = {
@@ -64,35 +77,46 @@ def get_formated_user_solicitations(user_solicitations):
         formated_user_solicitations["solicitations"].append(us_formatted)
     return formated_user_solicitations
 
+def read_formated_user_solicitations(filters, student_id=None, advisor_id=None):
+    """ Reusable function that reads and formats a page of solicitations given the list filters """
+
+    # decodes the cursor of the requested page
+    after_id = None
+    if filters["cursor"]:
+        after_id = SolicitationsRepository.decode_cursor(filters["cursor"])
+        if after_id == None:
+            return "Cursor da página inválido", 400
+
+    user_solicitations, next_cursor = SolicitationsRepository.read_user_solicitations(
+        student_id=student_id, advisor_id=advisor_id, solicitation_id=filters["solicitation_id"], state_id=filters["state_id"],
+        decision=filters["decision"], start_date=filters["start_date"], end_date=filters["end_date"], after_id=after_id,
+        limit=filters["quantity_rows"]
+    )
+    return get_formated_user_solicitations(user_solicitations, next_cursor), 200
+
 class SolicitationsCoordinatorResource(Resource):
     """ HTTP methods relative to coordinator solicitations """
 
     @staticmethod
-    @parse_params_with_user_authentication(accepted_profiles=["ADM","COO"])
-    def get(jwt_data):
-        """ Get list of all solicitations of a authorized coordinator or admin """
-        all_user_solicitations = SolicitationsRepository.read_user_solicitations()
-        response = get_formated_user_solicitations(all_user_solicitations)
-        return response, 200
+    @parse_params_with_user_authentication(accepted_profiles=["ADM","COO"], reqparse_arguments=SOLICITATIONS_FILTER_ARGUMENTS)
+    def get(jwt_data, **filters):
+        """ Get a page of all solicitations of a authorized coordinator or admin """
+        return read_formated_user_solicitations(filters)
 
 class SolicitationsAdvisorResource(Resource):
     """ HTTP methods relative to advisor solicitations """
 
     @staticmethod
-    @parse_params_with_user_authentication(accepted_profiles=["ADV"])
-    def get(jwt_data):
-        """ Get list of all solicitations of a authorized advisor """
-        advisor_solicitations = SolicitationsRepository.read_user_solicitations(advisor_id=jwt_data["user_id"])
-        response = get_formated_user_solicitations(advisor_solicitations)
-        return response, 200
+    @parse_params_with_user_authentication(accepted_profiles=["ADV"], reqparse_arguments=SOLICITATIONS_FILTER_ARGUMENTS)
+    def get(jwt_data, **filters):
+        """ Get a page of all solicitations of a authorized advisor """
+        return read_formated_user_solicitations(filters, advisor_id=jwt_data["user_id"])
 
 class SolicitationsStudentResource(Resource):
     """ HTTP methods relative to student solicitations """
 
     @staticmethod
-    @parse_params_with_user_authentication(accepted_profiles=["STU"])
-    def get(jwt_data):
-        """ Get list all solicitations of a authorized student """
-        student_solicitations = SolicitationsRepository.read_user_solicitations(student_id=jwt_data["user_id"])
-        response = get_formated_user_solicitations(student_solicitations)
-        return response, 200
\ No newline at end of file
+    @parse_params_with_user_authentication(accepted_profiles=["STU"], reqparse_arguments=SOLICITATIONS_FILTER_ARGUMENTS)
+    def get(jwt_data, **filters):
+        """ Get a page of all solicitations of a authorized student """
+        return read_formated_user_solicitations(filters, student_id=jwt_data["user_id"])
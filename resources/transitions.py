@@ -6,8 +6,8 @@ from flask_restful import Resource
 from flask_restful.reqparse import Argument
 
 import logging
-from repositories import SolicitationStateTransitionsRepository
-from util import parse_params_with_user_authentication
+from repositories import WorkflowRepository
+from util import etag_headers, is_etag_fresh, make_etag, not_modified, parse_params_with_user_authentication
 
 logging = logging.getLogger(__name__)
 
@@ -20,5 +20,10 @@ class SolicitationStateTransitionsResource(Resource):
     ])
     def get(jwt_data, solicitation_state_id_from):
         """ Get a formatted list of transitions """
-        formatted_transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(solicitation_state_id_from)
-        return formatted_transitions, 200
\ No newline at end of file
+
+        etag = make_etag("transitions", WorkflowRepository.version(), solicitation_state_id_from)
+        if is_etag_fresh(etag):
+            return not_modified(etag)
+
+        formatted_transitions = WorkflowRepository.read_solicitation_state_transitions(solicitation_state_id_from)
+        return formatted_transitions, 200, etag_headers(etag)
\ No newline at end of file
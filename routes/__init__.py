@@ -2,7 +2,8 @@ from .advisors import ADVISORS_BLUEPRINT
 from .config import CONFIG_BLUEPRINT, CONFIGS_BLUEPRINT
 from .dynamic_page import DYNAMIC_PAGE_BLUEPRINT
 from .file_transmission import FILE_TRANSMITION_BLUEPRINT
-from .login import LOGIN_BLUEPRINT
+from .login import LOGIN_BLUEPRINT, LOGIN_REFRESH_BLUEPRINT
+from .pool_statistics import POOL_STATISTICS_BLUEPRINT
 from .reasons import REASONS_BLUEPRINT
 from .send_mail import SEND_MAIL_BLUEPRINT
 from .signup import SIGNUP_BLUEPRINT
@@ -1,12 +1,17 @@
 """
-Defines the blueprint for user login authentication
+Defines the blueprints for user login authentication and its access token refresh
 """
 from flask import Blueprint
 from flask_restful import Api
 
-from resources import LoginResource
+from resources import LoginRefreshResource, LoginResource
 
 LOGIN_BLUEPRINT = Blueprint("login", __name__)
 Api(LOGIN_BLUEPRINT).add_resource(
     LoginResource, "/login"
+)
+
+LOGIN_REFRESH_BLUEPRINT = Blueprint("login_refresh", __name__)
+Api(LOGIN_REFRESH_BLUEPRINT).add_resource(
+    LoginRefreshResource, "/login/refresh"
 )
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+Defines the blueprint for database pool statistics
+"""
+from flask import Blueprint
+from flask_restful import Api
+
+from resources import PoolStatisticsResource
+
+POOL_STATISTICS_BLUEPRINT = Blueprint("pool_statistics", __name__)
+Api(POOL_STATISTICS_BLUEPRINT).add_resource(
+    PoolStatisticsResource, "/pool/statistics"
+)
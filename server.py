@@ -4,9 +4,10 @@ Server Flask
 The app starts here
 """
 from datetime import datetime, timedelta
-from flask import Flask
+from flask import Flask, request
 from flask.blueprints import Blueprint
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 import logging
 import routes
@@ -15,15 +16,18 @@ import time
 
 sqlalchemy
 
-from models import db
+from models import db, RoutingSession
+from repositories import AdvisorsRepository, Cache, QueryCounter, SqliteCacheBackend, WorkflowRepository
 import env
-from util import db_check_create, sysconf, syssecurity, syssmtpserver, sysscheduler
+from util import db_check_create, db_migrate, sysconf, sysratelimiter, syssecurity, syssmtpserver, sysscheduler, TimedQueuePool
 
 # configurates logger
 logging.basicConfig(level=logging.NOTSET)
 
-# creates tables before starting the server
+# creates tables and applies pending migrations before starting the server
 db_check_create()
+if env.SQL_MIGRATE_ON_STARTUP:
+    db_migrate()
 
 # creates the Flask server for the API
 server = Flask(__name__)
@@ -39,21 +43,55 @@ CORS(
 # enable debug mode based on .env
 server.debug = env.DEBUG
 
+# reads the client address forwarded by the trusted reverse proxies, used by the rate limits
+if env.TRUSTED_PROXIES:
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=env.TRUSTED_PROXIES, x_proto=env.TRUSTED_PROXIES, x_host=env.TRUSTED_PROXIES)
+
 # starts database
 server.config["SQLALCHEMY_DATABASE_URI"] = env.DB_URI
 server.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = env.SQLALCHEMY_TRACK_MODIFICATIONS
+
+# configures the web app pool and the background pool used by the scheduler thread
+server.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"poolclass": TimedQueuePool, **env.SQL_POOL}
+server.config["SQLALCHEMY_BINDS"] = {
+    "background": {"url": env.DB_URI, "poolclass": TimedQueuePool, **env.SQL_BACKGROUND_POOL}
+}
+
+# configures the optional read replica used by GET requests and read only repository methods
+if env.REPLICA_DB_URI:
+    server.config["SQLALCHEMY_BINDS"][RoutingSession.REPLICA_BIND_KEY] = {
+        "url": env.REPLICA_DB_URI, "poolclass": TimedQueuePool, **env.SQL_REPLICA_POOL
+    }
+    RoutingSession.read_your_writes_seconds = env.SQL_REPLICA_READ_YOUR_WRITES_SECONDS
 db.init_app(server)
 db.app = server
 
+# shares the repository caches between the workers of the host
+if env.CACHE_BACKEND == "sqlite":
+    Cache.configure(SqliteCacheBackend(env.CACHE_SQLITE_PATH))
+
+# reads the advisor students from the count table
+AdvisorsRepository.configure_student_count_table(env.ADVISOR_STUDENT_COUNT_TABLE)
+
+# limits the login and signup attempts
+sysratelimiter.configure(env.RATE_LIMIT_ENABLED, env.RATE_LIMIT_SHARED, env.RATE_LIMITS)
+
 # wait for app context to avoid database not initialized problems
 with server.app_context():
 
     # load sistem configurations
     sysconf.load_sys_config()
 
-    # load JWT authentication keys
-    private_key_Path, public_key_Path = sysconf.get_key_files_path()
-    syssecurity.load_keys(private_key_Path, public_key_Path)
+    # load the solicitation workflows graph and check its version stamp out of the requests
+    WorkflowRepository.load()
+    WorkflowRepository.start_version_checks(server)
+
+    # load JWT authentication key ring
+    syssecurity.load_keys(sysconf.get_key_files_path(), env.JWT_ALGORITHM, env.JWT_SIGNING_KID)
+    syssecurity.configure_password_hasher(env.PASSWORD_HASH_ALGORITHM, env.PASSWORD_HASH_COST, env.PASSWORD_HASH_WORKERS, env.PASSWORD_HASH_TIMEOUT)
+    syssecurity.configure_access_tokens(env.JWT_ACCESS_TOKEN_SECONDS, env.JWT_REFRESH_TOKEN_SECONDS)
+    syssecurity.configure_compact_claims(env.JWT_COMPACT_CLAIMS, env.JWT_COMPACT_CLAIMS_SECONDS)
+    syssecurity.configure_claims_cache(env.JWT_CLAIMS_CACHE, env.JWT_CLAIMS_CACHE_SIZE, env.JWT_CLAIMS_CACHE_SECONDS)
 
     # start smtp server and wait its async loading for a maximum of 10 seconds
     syssmtpserver.start(env.SMTP_HOST, env.SMTP_PORT, env.SMTP_LOGIN, env.SMTP_PASSWORD)
@@ -82,6 +120,21 @@ with server.app_context():
     
     #test()
 
+# counts the database round trips done by each request
+@server.before_request
+def reset_query_counter():
+    QueryCounter.reset()
+
+# GET requests read from the replica, authenticated users inside their read-your-writes window are moved back to the primary
+@server.before_request
+def route_request_reads():
+    RoutingSession.route_reads(request.method == "GET")
+
+@server.after_request
+def log_query_counter(response):
+    logging.debug(f"{request.method} {request.path} done with {QueryCounter.count()} database queries")
+    return response
+
 # register server route decoupled blueprints
 for blueprint in vars(routes).values():
     if isinstance(blueprint, Blueprint):
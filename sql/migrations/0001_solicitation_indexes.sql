@@ -0,0 +1,9 @@
+/* Indexes used by the solicitation lists, the advisor students count and the state transitions */
+CREATE INDEX user_has_solicitation_user_solicitation_idx ON user_has_solicitation(user_id, solicitation_id);
+CREATE INDEX user_has_solicitation_advisor_siape_idx ON user_has_solicitation(advisor_siape);
+CREATE INDEX user_has_solicitation_state_user_has_solicitation_idx ON user_has_solicitation_state(user_has_solicitation_id);
+CREATE INDEX solicitation_state_transition_state_from_idx ON solicitation_state_transition(solicitation_state_id_from);
+
+/* Indexes used by the event scheduler */
+CREATE INDEX scheduling_state_transition_user_has_solicitation_state_idx ON scheduling_state_transition(user_has_solicitation_state_id);
+CREATE INDEX scheduling_status_datetime_idx ON scheduling(scheduled_status, scheduled_datetime)
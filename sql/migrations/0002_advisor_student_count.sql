@@ -0,0 +1,10 @@
+/* Advisor students count table for schemas created before it, filled from the user solicitations */
+CREATE TABLE IF NOT EXISTS user_has_profile_advisor_student_count(
+	advisor_siape VARCHAR(15) NOT NULL,
+    student_count INT DEFAULT 0 NOT NULL,
+	PRIMARY KEY (advisor_siape),
+    FOREIGN KEY (advisor_siape) REFERENCES user_has_profile_advisor_data(siape)
+);
+INSERT INTO user_has_profile_advisor_student_count(advisor_siape, student_count)
+    SELECT advisor_siape, COUNT(DISTINCT user_id) FROM user_has_solicitation WHERE advisor_siape IS NOT NULL GROUP BY advisor_siape
+    ON DUPLICATE KEY UPDATE student_count = VALUES(student_count)
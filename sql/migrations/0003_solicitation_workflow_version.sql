@@ -0,0 +1,7 @@
+/* Version stamp of the solicitation workflows, incremented by every workflow edit to refresh the workers cached graphs */
+CREATE TABLE IF NOT EXISTS solicitation_workflow_version(
+	id INT NOT NULL,
+    version INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (id)
+);
+INSERT IGNORE INTO solicitation_workflow_version(id, version) VALUES (1, 0)
@@ -0,0 +1,2 @@
+/* Password hashes of the key derivations store their algorithm and cost with the digest */
+ALTER TABLE user_account MODIFY password_hash VARCHAR(128)
@@ -0,0 +1,2 @@
+/* Version of each user profile, incremented by every profile write so the access token renewals see the changes of any worker */
+ALTER TABLE user_account ADD profile_version INT DEFAULT 0 NOT NULL
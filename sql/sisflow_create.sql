@@ -57,9 +57,10 @@ CREATE TABLE user_account(
     user_name VARCHAR(100) NOT NULL,
     gender ENUM('M', 'F') NOT NULL,
     phone VARCHAR(15),
-    password_hash CHAR(65),
+    password_hash VARCHAR(128),
     password_salt CHAR(16),
     creation_datetime DATETIME,
+    profile_version INT DEFAULT 0 NOT NULL,
     PRIMARY KEY (id)
 );
 CREATE TABLE profile(
@@ -93,6 +94,12 @@ CREATE TABLE user_has_profile_advisor_data(
 	PRIMARY KEY (user_has_profile_id),
     FOREIGN KEY (user_has_profile_id) REFERENCES user_has_profile(id)
 );
+CREATE TABLE user_has_profile_advisor_student_count(
+	advisor_siape VARCHAR(15) NOT NULL,
+    student_count INT DEFAULT 0 NOT NULL,
+	PRIMARY KEY (advisor_siape),
+    FOREIGN KEY (advisor_siape) REFERENCES user_has_profile_advisor_data(siape)
+);
 CREATE TABLE user_has_profile_student_data(
 	user_has_profile_id INT NOT NULL,
     matricula VARCHAR(15) NOT NULL UNIQUE,
@@ -352,6 +359,11 @@ CREATE TABLE solicitation_state_transition_mail(
     FOREIGN KEY (solicitation_state_transition_id) REFERENCES solicitation_state_transition(id),
     FOREIGN KEY (dynamic_mail_id) REFERENCES dynamic_mail(id)
 );
+CREATE TABLE solicitation_workflow_version(
+	id INT NOT NULL,
+    version INT DEFAULT 0 NOT NULL,
+    PRIMARY KEY (id)
+);
 CREATE TABLE user_has_solicitation(
 	id INT NOT NULL AUTO_INCREMENT,
     user_id INT NOT NULL,
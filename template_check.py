@@ -0,0 +1,164 @@
+"""
+Template check
+
+Renders every dynamic string of sql/sisflow_insert_default.sql with the compiled template engine and with the previous
+string parser, for each combination of student and advisor data, and checks that both outputs are equal
+The previous parser raised when a user value was missing, the compiled engine renders it as empty text,
+so those inputs are compared with the previous parser rendering an empty user, and the deliberate differences with their expected outputs
+Usage: python template_check.py
+"""
+import logging
+import re
+import sys
+
+from util.template import render_template, TemplateContext
+
+COORDINATOR_NAME = "Coordenador Teste"
+
+INSERT_DEFAULT_PATH = "./sql/sisflow_insert_default.sql"
+
+# quoted sql strings with a command
+TEMPLATE_REGEX = re.compile(r"'([^']*\[\[\[[^']*)'")
+
+def make_student(gender, course):
+    return {"user_name": f"Aluno {gender} {course}", "gender": gender, "profiles": [
+        {"profile_acronym": "STU", "matricula": f"11{course}0001", "course": course}
+    ]}
+
+def make_advisor(gender):
+    return {"user_name": f"Orientador {gender}", "gender": gender, "profiles": [
+        {"profile_acronym": "ADV", "siape": f"90{gender}01"}
+    ]}
+
+STUDENTS = [make_student(gender, course) for gender in ("M", "F") for course in ("BCC", "BSI")]
+ADVISORS = [make_advisor(gender) for gender in ("M", "F")] + [None]
+
+# a user whose values are all empty, the previous parser renders with it what the compiled engine renders for a missing user
+EMPTY_STUDENT = {"user_name": "", "gender": None, "profiles": [{"profile_acronym": "STU", "matricula": "", "course": None}]}
+EMPTY_ADVISOR = {"user_name": "", "gender": None, "profiles": [{"profile_acronym": "ADV", "siape": ""}]}
+
+# inputs rendered differently on purpose, the previous parser raised on the first four and parsed the user value of the last one
+#   a missing user or user value renders as empty text and a user value with a command is not parsed again
+EXPECTED_OUTPUTS = [
+    ("Siape [[[advisorSiape]]].", None, None, "Siape ."),
+    ("[[[studentName]]] e [[[advisorSiape]]]", make_student("M", "BCC"), None, "Aluno M BCC e "),
+    ("Aluno [[[studentName]]]", {"gender": "M", "profiles": []}, None, "Aluno "),
+    ("Orientador [[[advisorName]]]", None, {"gender": "F", "profiles": []}, "Orientador "),
+    ("[[[studentName]]]!", {"user_name": "[[[coordinatorName]]]", "gender": "M", "profiles": []}, None, "[[[coordinatorName]]]!")
+]
+
+def legacy_get_user_token_profile(user_token, profile_acronym):
+    """ The previous SystemConfiguration.get_user_token_profile """
+
+    if not user_token or not user_token["profiles"]:
+        return None
+
+    for profile in user_token["profiles"]:
+        if profile["profile_acronym"] == profile_acronym:
+            return profile
+
+    return None
+
+def legacy_get_parser_substring(raw_str):
+    """ The previous SystemConfiguration.get_parser_substring """
+
+    substr_start = raw_str.find("[[[")
+    if substr_start == -1:
+        return None
+
+    substr_end = raw_str.find("]]]", substr_start)
+    if substr_end == -1:
+        return None
+
+    return raw_str[substr_start:substr_end+3]
+
+def legacy_str_parser(raw_str, student_data=None, advisor_data=None):
+    """ The previous SystemConfiguration.sistem_str_parser, kept as the reference of the compiled engine """
+
+    student_profile = None
+
+    if student_data:
+        student_profile = legacy_get_user_token_profile(student_data, "STU")
+    if advisor_data:
+        advisor_profile = legacy_get_user_token_profile(advisor_data, "ADV")
+
+    parser_substr = legacy_get_parser_substring(raw_str)
+    while parser_substr:
+        command = parser_substr.replace("[[[",'').replace("]]]",'').strip()
+
+        if "studentName" in command:
+            raw_str = raw_str.replace(parser_substr, student_data.get("user_name") if student_data else "")
+        elif "advisorName" in command:
+            raw_str = raw_str.replace(parser_substr, advisor_data.get("user_name") if advisor_data else "")
+        elif "coordinatorName" in command:
+            raw_str = raw_str.replace(parser_substr, COORDINATOR_NAME)
+        elif "studentMatricula" in command:
+            raw_str = raw_str.replace(parser_substr, student_profile.get("matricula") if student_profile else "")
+        elif "studentCourse" in command:
+            raw_str = raw_str.replace(parser_substr, student_profile.get("course") if student_profile else "")
+        elif "advisorSiape" in command:
+            raw_str = raw_str.replace(parser_substr, advisor_profile.get("siape") if advisor_profile else "")
+        elif ":::" in command:
+            if "ifStudentMale?" in command and student_data and student_data.get("gender"):
+                raw_str = raw_str.replace(parser_substr, command.replace("ifStudentMale?",'').split(":::")
+                    [ 0 if student_data["gender"] == 'M' else 1 ])
+            elif "ifAdvisorMale?" in command and advisor_data and advisor_data.get("gender"):
+                raw_str = raw_str.replace(parser_substr, command.replace("ifAdvisorMale?",'').split(":::")
+                    [ 0 if advisor_data["gender"] == 'M' else 1 ])
+            elif "ifBCCStudent?" in command and student_profile and student_profile.get("course"):
+                raw_str = raw_str.replace(parser_substr, command.replace("ifBCCStudent?",'').split(":::")
+                    [ 0 if student_profile["course"] == "BCC" else 1 ])
+            else:
+                raw_str = raw_str.replace(parser_substr, '')
+        else:
+            raw_str = raw_str.replace(parser_substr, '')
+
+        parser_substr = legacy_get_parser_substring(raw_str)
+
+    return raw_str
+
+def render(raw_str, student_data, advisor_data):
+    return render_template(raw_str, TemplateContext(student_data, advisor_data, COORDINATOR_NAME))
+
+if __name__ == "__main__":
+
+    logging.disable(logging.WARNING)
+
+    with open(INSERT_DEFAULT_PATH, "r", encoding="utf-8") as txt_file:
+        templates = TEMPLATE_REGEX.findall(txt_file.read())
+
+    renders = 0
+    empty_renders = 0
+    mismatches = []
+
+    # the default templates render as before for every user combination
+    #   where the previous parser raised for a missing user, as it renders with that user empty
+    for template in templates:
+        for student_data in STUDENTS:
+            for advisor_data in ADVISORS:
+                renders += 1
+                try:
+                    expected = legacy_str_parser(template, student_data, advisor_data)
+                except Exception:
+                    empty_renders += 1
+                    expected = legacy_str_parser(template, student_data or EMPTY_STUDENT, advisor_data or EMPTY_ADVISOR)
+                output = render(template, student_data, advisor_data)
+                if output != expected:
+                    mismatches.append((template, student_data, advisor_data, expected, output))
+
+    # the deliberate differences render as expected and not as before
+    for template, student_data, advisor_data, expected in EXPECTED_OUTPUTS:
+        renders += 1
+        try:
+            legacy_output = legacy_str_parser(template, student_data, advisor_data)
+        except Exception as e:
+            legacy_output = e
+        output = render(template, student_data, advisor_data)
+        if output != expected or legacy_output == expected:
+            mismatches.append((template, student_data, advisor_data, expected, output))
+
+    for template, student_data, advisor_data, expected, output in mismatches:
+        print(f"Mismatch rendering {template[:80]!r}\n  student {student_data}\n  advisor {advisor_data}\n  expected {expected!r}\n  output   {output!r}")
+
+    print(f"# {len(templates)} default templates, {renders} renders, {empty_renders} with a missing user, {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
@@ -1,11 +1,16 @@
+from .db_pool import get_pools_statistics, TimedQueuePool
+from .db_migrations import db_migrate, db_pending_migrations
 from .db_utils import db_check_create
+from .etag import etag_headers, is_etag_fresh, make_etag, not_modified, PUBLIC_CACHE_CONTROL
 from .event_scheduler import EventScheduler
+from .rate_limit import RateLimiter
 from .security import Security
 from .smtp_server import SmtpServer
 from .system_config import SystemConfiguration
 
 sysconf = SystemConfiguration()
 syssecurity = Security()
+sysratelimiter = RateLimiter()
 syssmtpserver = SmtpServer()
 sysscheduler = EventScheduler()
 
@@ -15,3 +20,4 @@ from .solicitations_utils import (
     resolve_solicitation_state_change
 )
 from .parse_params import parse_params, parse_params_with_user_authentication
+from .access import solicitation_access_required
@@ -0,0 +1,48 @@
+"""
+Access
+
+Solicitation access checks made only with the JWT claims and the cached access index, before any token is built
+"""
+from flask import request
+from functools import wraps
+
+from repositories import SolicitationRepository
+
+# profiles that access every solicitation
+SOLICITATION_ACCESS_PROFILES = ("ADM", "COO")
+
+def solicitation_access_required(id_argument="user_has_state_id", allowed_users=("student_id", "advisor_id")):
+    """
+    Rejects the callers that are not one of the allowed users of the solicitation, unless they have an access profile
+    The id_argument is a user_has_state_id or a user_has_solicitation_id, the solicitation user ids are forwarded as state_user_ids
+    Only GET requests use the cached access index, the other methods check the database so a removed advisor is refused at once
+    Use it after parse_params_with_user_authentication
+    """
+
+    read_user_ids = SolicitationRepository.read_solicitation_state_user_ids if id_argument == "user_has_state_id"\
+        else SolicitationRepository.read_solicitation_user_ids
+
+    def check(func):
+        """ Wrapper """
+
+        @wraps(func)
+        def resource_verb(*args, **kwargs):
+            """ Decorated function """
+
+            # read user ids from the access index
+            state_user_ids = read_user_ids(kwargs[id_argument], cached=request.method == "GET")
+            if not state_user_ids:
+                return "Estado do usuário não encontrado", 404
+
+            # check if user has access
+            jwt_data = kwargs["jwt_data"]
+            if not any(acronym in jwt_data["profile_acronyms"] for acronym in SOLICITATION_ACCESS_PROFILES):
+                if not jwt_data["user_id"] in [state_user_ids[allowed_user] for allowed_user in allowed_users]:
+                    return "Acesso a solicitação não permitido", 401
+
+            kwargs["state_user_ids"] = state_user_ids
+            return func(*args, **kwargs)
+
+        return resource_verb
+
+    return check
@@ -0,0 +1,108 @@
+"""
+Database Migrations
+
+Applies the versioned sql scripts of sql/migrations to existing schemas
+Each script is named with its version, like 0001_description.sql, and the applied version is kept in the schema_version table
+"""
+from datetime import datetime
+
+import logging
+import os
+import re
+
+from .db_utils import db_connect
+
+logging = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = "./sql/migrations/"
+MIGRATION_FILE_REGEX = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# mysql named lock that keeps concurrent workers from migrating at the same time
+MIGRATION_LOCK = "sisflow_migrations"
+MIGRATION_LOCK_TIMEOUT = 300
+
+def get_migrations():
+    """ Returns the migration scripts as (version, name, path) tuples ordered by version """
+
+    migrations = []
+    for file_name in os.listdir(MIGRATIONS_PATH):
+        match = MIGRATION_FILE_REGEX.match(file_name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_PATH, file_name)))
+
+    return sorted(migrations)
+
+def get_schema_version(db_cursor):
+    """ Returns the last applied migration version, 0 if none was applied """
+
+    db_cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version(
+            version INT NOT NULL,
+            migration_name VARCHAR(100) NOT NULL,
+            applied_datetime DATETIME NOT NULL,
+            PRIMARY KEY (version)
+        )
+    """)
+    db_cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+    return db_cursor.fetchone()["version"] or 0
+
+def apply_migration(db_connection, db_cursor, version, name, path):
+    """ Executes a migration script and records its version
+        Mysql commits each DDL statement, so a failed script must be fixed and applied again by hand """
+
+    with open(path, "r", encoding="utf-8") as txt_file:
+        sql_scrypt = txt_file.read()
+
+    for statement in sql_scrypt.split(";"):
+        if statement.strip():
+            db_cursor.execute(statement)
+
+    db_cursor.execute("INSERT INTO schema_version(version, migration_name, applied_datetime) VALUES (%s, %s, %s)",
+        (version, name, datetime.now()))
+    db_connection.commit()
+
+def db_migrate(target_version=None):
+    """ Applies the pending migrations up to target_version, all if None
+        Returns the schema version after migrating """
+
+    db_connection = db_connect(os.getenv("SQL_SCHEMA"))
+    db_cursor = db_connection.cursor(buffered=True, dictionary=True)
+
+    try:
+        db_cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not db_cursor.fetchone()["locked"]:
+            raise TimeoutError("Timeout waiting the migrations lock")
+
+        try:
+            schema_version = get_schema_version(db_cursor)
+
+            for version, name, path in get_migrations():
+                if version <= schema_version or (target_version != None and version > target_version):
+                    continue
+
+                logging.info(f"Applying migration {version} {name}")
+                apply_migration(db_connection, db_cursor, version, name, path)
+                schema_version = version
+
+            logging.info(f"Schema {os.getenv('SQL_SCHEMA')} is in version {schema_version}")
+            return schema_version
+
+        finally:
+            db_cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+
+    finally:
+        db_cursor.close()
+        db_connection.close()
+
+def db_pending_migrations():
+    """ Returns the (version, name, path) tuples of the migrations not applied yet """
+
+    db_connection = db_connect(os.getenv("SQL_SCHEMA"))
+    db_cursor = db_connection.cursor(buffered=True, dictionary=True)
+
+    try:
+        schema_version = get_schema_version(db_cursor)
+        return [migration for migration in get_migrations() if migration[0] > schema_version]
+    finally:
+        db_cursor.close()
+        db_connection.close()
@@ -0,0 +1,75 @@
+"""
+Database Pool
+
+Connection pool that measures its checkout wait times, used to size the pool for the server workers
+"""
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+class TimedQueuePool(QueuePool):
+    """ QueuePool that keeps a histogram of the time waited to check out a connection """
+
+    # histogram upper bounds in seconds, the last bucket counts the waits above all bounds
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_lock = threading.Lock()
+        self.wait_histogram = [0] * (len(TimedQueuePool.WAIT_BUCKETS) + 1)
+        self.wait_count = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        """ Checks out a connection measuring the time waited """
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.__observe_wait(time.perf_counter() - start)
+
+    def __observe_wait(self, wait_seconds):
+        bucket = 0
+        while bucket < len(TimedQueuePool.WAIT_BUCKETS) and wait_seconds > TimedQueuePool.WAIT_BUCKETS[bucket]:
+            bucket += 1
+
+        with self.wait_lock:
+            self.wait_histogram[bucket] += 1
+            self.wait_count += 1
+            self.wait_seconds_sum += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def statistics(self):
+        """ Returns the live pool statistics """
+
+        with self.wait_lock:
+            wait_histogram = list(self.wait_histogram)
+            wait_count = self.wait_count
+            wait_seconds_sum = self.wait_seconds_sum
+            wait_seconds_max = self.wait_seconds_max
+
+        bucket_labels = [f"<={bound}s" for bound in TimedQueuePool.WAIT_BUCKETS] + [f">{TimedQueuePool.WAIT_BUCKETS[-1]}s"]
+
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "wait": {
+                "count": wait_count,
+                "seconds_avg": wait_seconds_sum / wait_count if wait_count else 0.0,
+                "seconds_max": wait_seconds_max,
+                "histogram": dict(zip(bucket_labels, wait_histogram))
+            }
+        }
+
+def get_pools_statistics(engines):
+    """ Returns the statistics of each engine pool by its bind key, the default engine is named default """
+    return {
+        bind_key if bind_key else "default": engine.pool.statistics() if isinstance(engine.pool, TimedQueuePool) else engine.pool.status()
+        for bind_key, engine in engines.items()
+    }
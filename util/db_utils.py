@@ -4,16 +4,21 @@ import os
 
 logging = logging.getLogger(__name__)
 
-def db_check_create():
+def db_connect(database=None):
 
-    db_connection = mysql.connector.connect(
+    return mysql.connector.connect(
         host = os.getenv("SQL_HOST"),
         port = os.getenv("SQL_PORT"),
         user = os.getenv("SQL_USER"),
         passwd = os.getenv("SQL_PASSWORD"),
+        database = database,
         auth_plugin="mysql_native_password"
     )
 
+def db_check_create():
+
+    db_connection = db_connect()
+
     db_cursor = db_connection.cursor(buffered=True, dictionary=True)
 
     if db_connection:
@@ -0,0 +1,33 @@
+"""
+ETag
+
+Conditional GET helpers, the ETags are computed from cheap version keys instead of the response bodies
+"""
+
+from flask import request
+
+import hashlib
+
+# changes every ETag, must be incremented when the format of a cached response changes
+ETAG_FORMAT_VERSION = 1
+
+# authenticated responses are cached only by the browser and always revalidated
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+PUBLIC_CACHE_CONTROL = "public, no-cache"
+
+def make_etag(*version_key):
+    """ Returns a strong ETag from the values that version a response, like its resource name, arguments and data versions """
+    key = repr((ETAG_FORMAT_VERSION, *version_key)).encode("utf-8")
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+def is_etag_fresh(etag):
+    """ Returns if the request If-None-Match header has the ETag """
+    return request.if_none_match.contains(etag)
+
+def etag_headers(etag, cache_control=PRIVATE_CACHE_CONTROL):
+    """ Returns the ETag and Cache-Control headers of a response """
+    return {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+
+def not_modified(etag, cache_control=PRIVATE_CACHE_CONTROL):
+    """ Returns the flask_restful 304 response of a fresh ETag """
+    return "", 304, etag_headers(etag, cache_control)
@@ -11,10 +11,14 @@ import threading
 import time
 import util
 
+from models import RoutingSession
 from repositories import SchedulingsRepository
 
 logging = logging.getLogger(__name__)
 
+# quantity of events loaded between each bootstrap progress log
+PROGRESS_LOG_EVENTS = 1000
+
 class EventScheduler:
 
     def __init__(self):
@@ -45,27 +49,32 @@ class EventScheduler:
     
     def __load_from_db(self):
 
-        # Load database stored events
-        schedulings = SchedulingsRepository.read_schedulings()
-
-        # Stores in scheduler
+        # streams the database stored pending events
         added_events = 0
-        for sch in schedulings:
-            print(sch.id, sch.scheduled_action, sch.scheduled_datetime, sch.scheduled_status)
-            print(sch.scheduling_state_transition.user_has_solicitation_state_id, )
-            if sch.scheduled_status == "Pending":
-                added_events += 1
-                self.add_transition(
-                    sch.id,
-                    sch.scheduled_datetime,
-                    sch.scheduling_state_transition.user_has_solicitation_state_id,
-                    sch.scheduling_state_transition.state_transition_scheduled_id,
-                    util.resolve_scheduled_solicitation
-                )
+        for sch in SchedulingsRepository.stream_pending_schedulings():
+
+            # stores in scheduler
+            self.add_transition(
+                sch.id,
+                sch.scheduled_datetime,
+                sch.user_has_solicitation_state_id,
+                sch.state_transition_scheduled_id,
+                util.resolve_scheduled_solicitation
+            )
+
+            added_events += 1
+            if added_events % PROGRESS_LOG_EVENTS == 0:
+                logging.info(f"EventScheduler: {added_events} pending events loaded")
+
+        logging.info(f"EventScheduler: {added_events} pending events loaded from database")
 
     # Private method used by thread to run scheduler asynchronous
     def __run(self):
         logging.info(f"EventScheduler thread {threading.get_ident()}: Scheduler running")
+
+        # uses the background pool to not compete with the web app connections
+        RoutingSession.route_thread("background")
+
         while self.finish_thread == False:
             with self.flask_server.app_context():
                 self.scheduler.run(blocking=False)
@@ -5,9 +5,104 @@ Because flask_restful reqparse is ugly
 Reused from flask-api-starter-kit
 """
 from functools import wraps
+from flask import current_app, request
 from flask_restful import reqparse
+from werkzeug.datastructures import MultiDict
+
+from models import RoutingSession
+from repositories import UserProfileTokenRepository
 from . import syssecurity
 
+# argument types that reqparse ends up calling with the value only, so they are called directly
+DIRECT_TYPES = (str, int, float, bool)
+
+class CompiledArgument:
+    """ A reqparse Argument checked once at decoration time
+        Arguments using options beyond name, location, type, required, default and help are parsed by reqparse itself """
+
+    def __init__(self, argument):
+        self.argument = argument
+        self.name = argument.name
+        self.key = argument.dest or argument.name
+        self.location = argument.location
+        self.required = argument.required
+        self.default = argument.default
+        self.direct_type = argument.type in DIRECT_TYPES
+        self.compiled = (
+            isinstance(argument.location, str) and argument.action == "store" and tuple(argument.operators) == ("=",)
+            and not argument.choices and argument.case_sensitive and not argument.trim and not argument.ignore
+            and argument.nullable
+        )
+
+    def convert(self, value):
+        """ Converts a value like reqparse, None is kept because the arguments are nullable """
+
+        if value is None:
+            return None
+        if self.direct_type:
+            return self.argument.type(value)
+        return self.argument.convert(value, "=")
+
+    def parse(self, sources):
+        """ Returns the argument value and if it was found, aborting with the reqparse 400 message when it is not valid """
+
+        if not self.compiled:
+            return self.argument.parse(request, False)
+
+        source = sources.get(self.location)
+        if source is None:
+            source = sources[self.location] = get_request_source(self.location)
+
+        if self.name in source:
+            values = source.getlist(self.name) if hasattr(source, "getlist") else [source.get(self.name)]
+            try:
+                results = [self.convert(value) for value in values]
+            except Exception as error:
+                self.argument.handle_validation_error(error, False)
+            if results:
+                return results[0], True
+
+        if self.required:
+            location = reqparse._friendly_location.get(self.location, self.location)
+            self.argument.handle_validation_error(ValueError(f"Missing required parameter in {location}"), False)
+
+        return (self.default() if callable(self.default) else self.default), False
+
+def get_request_source(location):
+    """ Returns the request values of a location, like reqparse an empty MultiDict if it is missing """
+
+    source = getattr(request, location, None)
+    if callable(source):
+        source = source()
+    return source if source is not None else MultiDict()
+
+class CompiledParser:
+    """ A request parser compiled once at decoration time, returns the same values of reqparse.RequestParser
+        Each location is read once by request and only when one of its arguments is parsed """
+
+    def __init__(self, arguments):
+        self.arguments = [CompiledArgument(argument) for argument in arguments]
+
+        # bundled errors are reported by reqparse itself
+        self.request_parser = reqparse.RequestParser()
+        for argument in arguments:
+            self.request_parser.add_argument(argument)
+
+    def parse_args(self):
+        """ Parses the current request arguments into a dictionary by argument name """
+
+        if current_app.config.get("BUNDLE_ERRORS", False):
+            return self.request_parser.parse_args()
+
+        sources = {}
+        parsed_arguments = {}
+        for argument in self.arguments:
+            value, found = argument.parse(sources)
+            if found or argument.argument.store_missing:
+                parsed_arguments[argument.key] = value
+
+        return parsed_arguments
+
 def parse_params_with_user_authentication(name="Authorization", location="headers", type=str, required=True, 
     help="Required. Bearer with jwt given by server in user autentication", accepted_profiles=None, reqparse_arguments=None):
     """
@@ -16,6 +111,11 @@ def parse_params_with_user_authentication(name="Authorization", location="header
     Forward all params without formating, use it before parse_params if needed
     """
     
+    # compiles the authorization bearer with JWT argument and the other arguments
+    parser = CompiledParser([
+        reqparse.Argument(name, location=location, type=type, required=required, help=help), *(reqparse_arguments or [])
+    ])
+
     def parse(func):
         """ Wrapper """
 
@@ -23,13 +123,6 @@ def parse_params_with_user_authentication(name="Authorization", location="header
         def resource_verb(*args, **kwargs):
             """ Decorated function """
 
-            parser = reqparse.RequestParser()
-            # add authorization bearer with JWT argument
-            parser.add_argument(reqparse.Argument(name, location=location, type=type, required=required, help=help))
-            # add other arguments
-            if reqparse_arguments:
-                for argument in reqparse_arguments:
-                    parser.add_argument(argument)
             # parse all arguments
             parsed_reqparse_arguments = parser.parse_args()
             
@@ -41,11 +134,23 @@ def parse_params_with_user_authentication(name="Authorization", location="header
 
             # create dictionary with the jwt_data field
             parsed_dict = {key: value for key, value in parsed_reqparse_arguments.items() if key is not name}
-            parsed_dict['jwt_data'] = jwt_data
+            parsed_dict['jwt_data'] = jwt_data = UserProfileTokenRepository.expand_user_claims(jwt_data)
+
+            # users inside their read-your-writes window read only from the primary
+            user_id = jwt_data.get("user_id")
+            if RoutingSession.is_user_write_recent(user_id):
+                RoutingSession.route_reads(False, replica_blocked=True)
 
             # update decorated function kwargs with the new dictionary
             kwargs.update(parsed_dict)
-            return func(*args, **kwargs)
+            response = func(*args, **kwargs)
+
+            # successful writes of the user start its read-your-writes window
+            status = response[1] if isinstance(response, tuple) and len(response) > 1 else 200
+            if request.method != "GET" and isinstance(status, int) and status < 400:
+                RoutingSession.mark_user_write(user_id)
+
+            return response
 
         return resource_verb
 
@@ -57,6 +162,8 @@ def parse_params(*arguments):
     Forward them to the wrapped function as named parameters
     """
 
+    parser = CompiledParser(arguments)
+
     def parse(func):
         """ Wrapper """
 
@@ -64,9 +171,6 @@ def parse_params(*arguments):
         def resource_verb(*args, **kwargs):
             """ Decorated function """
 
-            parser = reqparse.RequestParser()
-            for argument in arguments:
-                parser.add_argument(argument)
             kwargs.update(parser.parse_args())
             return func(*args, **kwargs)
 
@@ -0,0 +1,112 @@
+"""
+Rate Limit
+
+Sliding window rate limits of the unauthenticated routes, checked before any database work
+"""
+from collections import OrderedDict
+
+import math
+import threading
+import time
+
+from repositories import Cache
+
+# default limits by name as (hits, window seconds)
+DEFAULT_RATE_LIMITS = {
+    "login_ip": (30, 60),
+    "login_email": (10, 300),
+    "signup_ip": (10, 600),
+    "signup_email": (3, 600)
+}
+
+# maximum quantity of counted keys of each limit kept by a worker
+RATE_LIMIT_MAX_KEYS = 100000
+
+class RateLimiter:
+    """ Counts the hits of each limit by key in a sliding window, approximated by the counts of the current and previous fixed windows
+        Each key keeps only its window start and the two counts, in the worker or in the shared cache backend """
+
+    def __init__(self):
+        self.enabled = True
+        self.shared = False
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        self.caches = {}
+
+    def configure(self, enabled=True, shared=False, limits=None):
+        """ Sets the limits, shared counts the hits of every worker through the repository cache backend """
+
+        self.enabled = enabled
+        self.shared = shared
+        self.limits.update(limits or {})
+        self.caches = {
+            name: Cache(f"rate_limit_{name}", ttl=2 * window, max_entries=RATE_LIMIT_MAX_KEYS) for name, (hits, window) in self.limits.items()
+        }
+
+        with self.counters_lock:
+            self.counters = {}
+
+    def update_counter(self, name, key, count_hit):
+        """ Replaces the (window start, current count, previous count) of a key by count_hit(counter or None) atomically
+            Shared counters are updated in a single backend transaction, so the hits of every worker are counted """
+
+        if self.shared:
+            self.caches[name].update(key, count_hit)
+            return
+
+        # the oldest keys are dropped beyond the maximum
+        with self.counters_lock:
+            counters = self.counters.setdefault(name, OrderedDict())
+            counters[key] = count_hit(counters.get(key))
+            counters.move_to_end(key)
+            while len(counters) > RATE_LIMIT_MAX_KEYS:
+                counters.popitem(last=False)
+
+    def hit(self, name, key):
+        """ Counts a hit of the key, returns 0 if it is allowed or the seconds to wait before the next allowed hit """
+
+        if not self.enabled or key == None:
+            return 0
+
+        limit, window = self.limits[name]
+        retry_after = 0
+
+        def count_hit(counter):
+            nonlocal retry_after
+
+            now = time.time()
+            window_start = now - now % window
+            counter_start, current, previous = counter or (window_start, 0, 0)
+
+            # moves the counts to the window of now
+            if counter_start != window_start:
+                previous = current if window_start - counter_start == window else 0
+                current = 0
+
+            elapsed = now - window_start
+            estimated = previous * (1 - elapsed / window) + current
+            if estimated >= limit:
+                retry_after = RateLimiter.get_retry_after(limit, window, elapsed, current, previous)
+                return (window_start, current, previous)
+
+            retry_after = 0
+            return (window_start, current + 1, previous)
+
+        self.update_counter(name, key, count_hit)
+        return retry_after
+
+    @staticmethod
+    def get_retry_after(limit, window, elapsed, current, previous):
+        """ Returns the whole seconds until the estimated hits of the sliding window fall below the limit """
+
+        # the current count alone reaches the limit, waits it to become the previous count of the next window
+        if current >= limit:
+            return math.floor(window - elapsed + window * (1 - limit / current)) + 1
+
+        # waits the previous count weight to fall
+        return max(math.floor(window * (1 - (limit - current) / previous) - elapsed) + 1, 1)
+
+    def hit_all(self, *name_keys):
+        """ Counts a hit for each (name, key), returns 0 if all are allowed or the longest wait """
+        return max([self.hit(name, key) for name, key in name_keys], default=0)
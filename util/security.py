@@ -3,59 +3,305 @@ Security
 
 Handles security topics
 """
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from datetime import datetime
+
 import hashlib
+import hmac
 import jwt
 import logging
 import random
+import secrets
 import string
-
-from Crypto.PublicKey import RSA
+import threading
+import time
 
 logging = logging.getLogger(__name__)
 
+# key generators of the supported jwt algorithms
+JWT_ALGORITHMS = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": lambda: ed25519.Ed25519PrivateKey.generate()
+}
+
+# password key derivations with their default cost, the log2 of n for scrypt and the iterations for pbkdf2_sha256
+#   stored as algorithm$cost$hex digest, hashes without $ are the legacy single sha256 ones
+PASSWORD_HASH_COSTS = {
+    "scrypt": 14,
+    "pbkdf2_sha256": 600000
+}
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# minimum seconds between the key ring reloads caused by unknown kids
+KEY_RING_RELOAD_SECONDS = 10
+
+# key ring files, named by their kid, and the key pair used before the key ring, kept to verify its tokens
+KEY_RING_FILE_PREFIX = "jwt-"
+KEY_RING_FILE_SUFFIX = ".pem"
+LEGACY_PRIVATE_KEY_FILE = "private-key.pem"
+LEGACY_PUBLIC_KEY_FILE = "public-key.pem"
+
+def generate_private_key(algorithm):
+    """ Generates a private key of the algorithm type """
+    if algorithm not in JWT_ALGORITHMS:
+        raise ValueError(f"Unsupported jwt algorithm {algorithm}, use one of {list(JWT_ALGORITHMS)}")
+    return JWT_ALGORITHMS[algorithm]()
+
+def get_key_algorithm(key):
+    """ Returns the jwt algorithm of a private or public key """
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and isinstance(key.curve, ec.SECP256R1):
+        return "ES256"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported jwt key type {type(key).__name__}")
+
+class SecurityKey:
+    """ A key of the key ring, its algorithm comes from its type so a token can not choose another one """
+
+    def __init__(self, kid, public_key, private_key=None):
+        self.kid = kid
+        self.public_key = public_key
+        self.private_key = private_key
+        self.algorithm = get_key_algorithm(public_key)
+
 class Security:
     
     def __init__(self):
-        self.private_key = None
-        self.public_key = None
+        self.keys_path = None
+        self.algorithm = "RS256"
+        self.signing_kid = None
+        self.keys = {}
+        self.keys_lock = threading.Lock()
+        self.keys_loaded = 0.0
 
-    def load_keys(self, private_key_Path, public_key_Path):
+        # verified claims by token digest, repeated tokens skip the signature verification
+        self.claims_cache_enabled = True
+        self.claims_cache_size = 4096
+        self.claims_cache_seconds = 300
+        self.claims_cache = OrderedDict()
+        self.claims_cache_lock = threading.Lock()
+        self.claims_cache_hits = 0
+        self.claims_cache_misses = 0
 
-        # when first executed generate key pair
-        if not private_key_Path.is_file() or not public_key_Path.is_file():
-            self.__generate_keys(private_key_Path, public_key_Path)
-        
-        self.private_key = open(private_key_Path).read()
-        self.public_key = open(public_key_Path).read()
+        # password key derivations run in a bounded pool, so they never use more than its workers
+        self.password_hash_pool = None
+        self.configure_password_hasher()
 
-        logging.info(f'Application key pair loaded for JWT authentication')
-    
-    def __generate_keys(self, private_key_Path, public_key_Path):
-
-        # generate private key file
-        pvk = RSA.generate(2048)
-        pvk_str = pvk.exportKey()
-        with open(private_key_Path, 'w') as pvk_file:
-            print("{}".format(pvk_str.decode()), file=pvk_file)
-
-        # generate public key file
-        pbk = pvk.publickey()
-        pbk_str = pbk.exportKey()
-        with open(public_key_Path, 'w') as pbk_file:
-            print("{}".format(pbk_str.decode()), file=pbk_file)
+        # user tokens signed with only the claims needed to authenticate, the profiles are expanded by the server
+        self.compact_claims_enabled = False
+        self.compact_claims_seconds = 86400
+
+        # short lived access tokens renewed by refresh tokens, disabled when access_token_seconds is 0
+        self.access_token_seconds = 0
+        self.refresh_token_seconds = 604800
+
+    # Loads the key ring of keys_path, tokens are signed by the newest key of the algorithm or by signing_kid
+    #   when first executed, or when the algorithm changes, a key of the algorithm is generated
+    def load_keys(self, keys_path, algorithm="RS256", signing_kid=None):
+
+        if algorithm not in JWT_ALGORITHMS:
+            raise ValueError(f"Unsupported jwt algorithm {algorithm}, use one of {list(JWT_ALGORITHMS)}")
+
+        self.keys_path = keys_path
+        self.algorithm = algorithm
+
+        self.__load_key_ring()
+        if not any(key.private_key and key.algorithm == algorithm for key in self.keys.values()):
+            self.__generate_keys()
+            self.__load_key_ring()
+
+        # kids start with the algorithm and its creation time, so the newest key of the algorithm is the last one
+        if signing_kid:
+            if signing_kid not in self.keys or not self.keys[signing_kid].private_key:
+                raise ValueError(f"Missing private key of kid {signing_kid}")
+            self.signing_kid = signing_kid
+        else:
+            self.signing_kid = max(kid for kid, key in self.keys.items() if key.private_key and key.algorithm == algorithm)
+
+        self.clear_claims_cache()
+
+        logging.info(f'Application key ring loaded for JWT authentication, signing with {self.signing_kid}')
+
+    def __load_key_ring(self):
+
+        keys = {}
+
+        # tokens without kid were signed by the legacy pair
+        legacy_public_key_path = self.keys_path / LEGACY_PUBLIC_KEY_FILE
+        if legacy_public_key_path.is_file():
+            keys[None] = SecurityKey(None, serialization.load_pem_public_key(legacy_public_key_path.read_bytes()))
+
+        for key_path in sorted(self.keys_path.glob(f"{KEY_RING_FILE_PREFIX}*{KEY_RING_FILE_SUFFIX}")):
+            kid = key_path.name[len(KEY_RING_FILE_PREFIX):-len(KEY_RING_FILE_SUFFIX)]
+            private_key = serialization.load_pem_private_key(key_path.read_bytes(), password=None)
+            keys[kid] = SecurityKey(kid, private_key.public_key(), private_key)
+
+        with self.keys_lock:
+            self.keys = keys
+            self.keys_loaded = time.monotonic()
+
+    def __generate_keys(self):
+
+        # generate private key file, its public key is derived when loaded
+        kid = f"{self.algorithm.lower()}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        pvk = generate_private_key(self.algorithm)
+        pvk_str = pvk.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        with open(self.keys_path / f"{KEY_RING_FILE_PREFIX}{kid}{KEY_RING_FILE_SUFFIX}", 'wb') as pvk_file:
+            pvk_file.write(pvk_str)
         
-        logging.info(f'Application key pair generated for JWT authentication')
-    
+        logging.info(f'Application key {kid} generated for JWT authentication')
+        return kid
+
+    # Generates a new key of the configured algorithm and signs the new tokens with it
+    #   the old keys stay in the ring, so the live tokens are still valid, and are removed by deleting their files
+    def rotate_keys(self):
+        self.load_keys(self.keys_path, self.algorithm, self.__generate_keys())
+
     # Encode a json data to creates a jwt token with signature
     def jwt_encode(self, token_json_data):
-        token_jwt = jwt.encode(token_json_data, self.private_key, algorithm="RS256")
+        signing_key = self.keys[self.signing_kid]
+        token_jwt = jwt.encode(token_json_data, signing_key.private_key, algorithm=signing_key.algorithm, headers={"kid": signing_key.kid})
         return token_jwt
 
-    # Decode a jwt token verifying its signature
+    # Decode a jwt token verifying its signature with the key of its kid
+    #   an unknown kid reloads the ring, it may have been rotated by another worker
     def jwt_decode(self, token_jwt):
-        jwt_data = jwt.decode(token_jwt, self.public_key, algorithms=["RS256"])
+        kid = jwt.get_unverified_header(token_jwt).get("kid")
+
+        key = self.keys.get(kid)
+        if not key and time.monotonic() - self.keys_loaded > KEY_RING_RELOAD_SECONDS:
+            self.__load_key_ring()
+            key = self.keys.get(kid)
+        if not key:
+            raise jwt.InvalidKeyError(f"Unknown jwt kid {kid}")
+
+        jwt_data = jwt.decode(token_jwt, key.public_key, algorithms=[key.algorithm])
         return jwt_data
-    
+
+    # Sets the compact user claims, signed with an exp of seconds after the login
+    def configure_compact_claims(self, enabled=False, seconds=86400):
+        self.compact_claims_enabled = enabled
+        self.compact_claims_seconds = seconds
+
+    # Sets the access tokens lifetime and the refresh tokens lifetime, access_token_seconds of 0 signs tokens without exp
+    def configure_access_tokens(self, access_token_seconds=0, refresh_token_seconds=604800):
+        self.access_token_seconds = access_token_seconds
+        self.refresh_token_seconds = refresh_token_seconds
+
+    # Returns the claims signed in the jwt of a user profile token, the whole token unless compact claims are enabled
+    #   compact claims have the user id, profile acronyms, the siape or matricula of each profile and exp
+    def get_user_claims(self, user_profile_token):
+
+        if not self.compact_claims_enabled:
+            if self.access_token_seconds:
+                return {**user_profile_token, "exp": int(time.time()) + self.access_token_seconds}
+            return user_profile_token
+
+        role_keys = {}
+        for profile in user_profile_token["profiles"]:
+            role_key = profile.get("siape") or profile.get("matricula")
+            if role_key:
+                role_keys[profile["profile_acronym"]] = role_key
+
+        return {
+            "user_id": user_profile_token["user_id"],
+            "profile_acronyms": user_profile_token["profile_acronyms"],
+            "role_keys": role_keys,
+            "exp": int(time.time()) + (self.access_token_seconds or self.compact_claims_seconds)
+        }
+
+    # Returns the login response of a user, the access jwt or, with access tokens enabled,
+    #   the short lived access jwt with a refresh jwt that renews it without the password
+    def get_user_tokens(self, user_profile_token, refresh_token=None):
+
+        access_token = self.jwt_encode(self.get_user_claims(user_profile_token))
+        if not self.access_token_seconds:
+            return access_token
+
+        if not refresh_token:
+            refresh_token = self.jwt_encode({
+                "user_id": user_profile_token["user_id"],
+                "token_type": "refresh",
+                "exp": int(time.time()) + self.refresh_token_seconds
+            })
+
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": self.access_token_seconds
+        }
+
+    # Decode a refresh jwt verifying its signature, raises jwt.InvalidTokenError if it is not a refresh token
+    def jwt_decode_refresh_token(self, token_jwt):
+
+        jwt_data = self.jwt_decode(token_jwt)
+        if jwt_data.get("token_type") != "refresh":
+            raise jwt.InvalidTokenError("Not a refresh token")
+        return jwt_data
+
+    # Sets the verified claims cache, a size or seconds of 0 also turns it off
+    def configure_claims_cache(self, enabled=True, size=4096, seconds=300):
+        self.claims_cache_enabled = enabled and size > 0 and seconds > 0
+        self.claims_cache_size = size
+        self.claims_cache_seconds = seconds
+        self.clear_claims_cache()
+
+    def clear_claims_cache(self):
+        with self.claims_cache_lock:
+            self.claims_cache.clear()
+
+    # Returns the hits, misses and size of the verified claims cache
+    def claims_cache_statistics(self):
+        with self.claims_cache_lock:
+            requests = self.claims_cache_hits + self.claims_cache_misses
+            return {
+                "enabled": self.claims_cache_enabled,
+                "hits": self.claims_cache_hits,
+                "misses": self.claims_cache_misses,
+                "hit_rate": self.claims_cache_hits / requests if requests else 0.0,
+                "tokens": len(self.claims_cache)
+            }
+
+    # Decode a jwt token verifying its signature only if it is not in the verified claims cache
+    #   the cached claims are shared by the requests of the same token and must not be modified
+    def jwt_decode_cached(self, token_jwt):
+
+        if not self.claims_cache_enabled:
+            return self.jwt_decode(token_jwt)
+
+        token_digest = hashlib.sha256(token_jwt.encode("utf-8")).digest()
+        now = time.time()
+
+        with self.claims_cache_lock:
+            cached = self.claims_cache.get(token_digest)
+            if cached and cached[1] > now:
+                self.claims_cache.move_to_end(token_digest)
+                self.claims_cache_hits += 1
+                return cached[0]
+            self.claims_cache_misses += 1
+
+        jwt_data = self.jwt_decode(token_jwt)
+
+        # a cached token is never used after its exp claim
+        expiration = now + self.claims_cache_seconds
+        if isinstance(jwt_data, dict) and isinstance(jwt_data.get("exp"), (int, float)):
+            expiration = min(expiration, jwt_data["exp"])
+
+        with self.claims_cache_lock:
+            self.claims_cache[token_digest] = (jwt_data, expiration)
+            self.claims_cache.move_to_end(token_digest)
+            while len(self.claims_cache) > self.claims_cache_size:
+                self.claims_cache.popitem(last=False)
+
+        return jwt_data
+
     # Verify if an jwt token given in request bearer is valid based on jwt signature and its profile
     def is_auth_token_valid(self, bearer_token, allowed_profiles_acronyms=None):
 
@@ -63,20 +309,19 @@ class Security:
 
         jwt_data = None
         try:
-            jwt_data = self.jwt_decode(token_jwt)
+            jwt_data = self.jwt_decode_cached(token_jwt)
         except:
             return False, "Falha ao autenticar, token de autenticação inválido", None
         
-        if not jwt_data:
+        if not jwt_data or jwt_data.get("token_type") == "refresh":
             return False, "Token inválido", None
 
+        # full and compact tokens have the profile acronyms
         if allowed_profiles_acronyms:
-            token_profiles = jwt_data["profiles"]
-
             acess_allowed = False
 
-            for profile in token_profiles:
-                if profile["profile_acronym"] in allowed_profiles_acronyms:
+            for profile_acronym in jwt_data["profile_acronyms"]:
+                if profile_acronym in allowed_profiles_acronyms:
                     acess_allowed = True
             
             if not acess_allowed:
@@ -84,7 +329,70 @@ class Security:
 
         return True, "", jwt_data
 
-    # hashes password with random or given salt using sha256
+    # Sets the password key derivation and the size of its pool
+    #   hashlib releases the GIL while deriving, so the workers threads do not block the request threads
+    def configure_password_hasher(self, algorithm="scrypt", cost=None, workers=2, timeout=10):
+
+        if algorithm not in PASSWORD_HASH_COSTS:
+            raise ValueError(f"Unsupported password hash algorithm {algorithm}, use one of {list(PASSWORD_HASH_COSTS)}")
+
+        self.password_hash_algorithm = algorithm
+        self.password_hash_cost = cost or PASSWORD_HASH_COSTS[algorithm]
+        self.password_hash_timeout = timeout
+
+        old_pool = self.password_hash_pool
+        self.password_hash_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        if old_pool:
+            old_pool.shutdown(wait=False)
+
+    # derives the stored hash of a password
+    @staticmethod
+    def derive_password_hash(password, salt, algorithm, cost):
+
+        if algorithm == "scrypt":
+            n = 2 ** cost
+            digest = hashlib.scrypt(bytes(password, "utf-8"), salt=bytes(salt, "utf-8"), n=n, r=SCRYPT_R, p=SCRYPT_P,
+                maxmem=256 * SCRYPT_R * n, dklen=32)
+        else:
+            digest = hashlib.pbkdf2_hmac("sha256", bytes(password, "utf-8"), bytes(salt, "utf-8"), cost)
+
+        return f"{algorithm}${cost}${digest.hex()}"
+
+    # derives a password hash in the pool, raises TimeoutError when the pool is too busy to answer in time
+    def run_password_hash(self, password, salt, algorithm, cost):
+
+        future = self.password_hash_pool.submit(Security.derive_password_hash, password, salt, algorithm, cost)
+        try:
+            return future.result(timeout=self.password_hash_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError("Timeout waiting the password hash pool")
+
+    # hashes a new password with a random salt using the configured key derivation
+    def hash_password(self, password):
+        password_salt = secrets.token_hex(8)
+        return self.run_password_hash(password, password_salt, self.password_hash_algorithm, self.password_hash_cost), password_salt
+
+    # verifies a password with its stored hash and salt
+    #   returns if it is valid and if its hash must be upgraded to the configured key derivation
+    def verify_password(self, password, password_hash, password_salt):
+
+        if not password_hash:
+            return False, False
+
+        if "$" not in password_hash:
+            legacy_password_hash, _ = Security.get_password_hash(password, password_salt)
+            return hmac.compare_digest(legacy_password_hash, password_hash), True
+
+        algorithm, cost, _ = password_hash.split("$", 2)
+        if algorithm not in PASSWORD_HASH_COSTS:
+            return False, False
+
+        derived_password_hash = self.run_password_hash(password, password_salt, algorithm, int(cost))
+        needs_upgrade = algorithm != self.password_hash_algorithm or int(cost) != self.password_hash_cost
+        return hmac.compare_digest(derived_password_hash, password_hash), needs_upgrade
+
+    # hashes password with random or given salt using sha256, the legacy hash verified and upgraded at the login
     @staticmethod
     def get_password_hash(password, salt=None):
 
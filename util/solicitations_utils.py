@@ -5,14 +5,18 @@ Reusable pieces of code related to solicitations to avoid code duplication
 """
 
 import json
+import logging
 import threading
 import util
 from datetime import datetime, timedelta
+from models import UnitOfWork
 from repositories import (
-    AttachmentRepository, SchedulingRepository, SchedulingsRepository, SolicitationRepository,
-    SolicitationStateTransitionRepository, SolicitationStateTransitionsRepository, UserProfileTokenRepository
+    AttachmentRepository, SchedulingRepository, SchedulingsRepository, SolicitationRepository, UserProfileTokenRepository,
+    WorkflowRepository
 )
 
+logging = logging.getLogger(__name__)
+
 def is_solicitation_dynamic_page_components_valid(user_id, components, solicitation_user_data):
 
     for component in components:
@@ -48,11 +52,11 @@ def is_solicitation_dynamic_page_components_valid(user_id, components, solicitat
     return True, ""
 
 # returns bool, message indicating if the user profile can edit the solicitation
-def is_solicitation_profile_edition_allowed(user_data, student_token, advisor_token, s_state_data):
+def is_solicitation_profile_edition_allowed(user_data, state_user_ids, s_state_data):
 
     # if not adm check if is student or advisor to edit the solicitation
     if not "ADM" in user_data["profile_acronyms"] and not "COO" in user_data["profile_acronyms"]:
-        if user_data["user_id"] != student_token["user_id"] and user_data["user_id"] != advisor_token["user_id"]:
+        if user_data["user_id"] != state_user_ids["student_id"] and user_data["user_id"] != state_user_ids["advisor_id"]:
             return False, "Edição a solicitação não permitida, perfil não pertence a solicitação"
   
     # checks if profile is allowed to change solicitation
@@ -113,6 +117,7 @@ def parse_new_old_solicitation_user_data(old_user_data, new_user_data):
     return parsed_user_data
 
 # Resolves solicitation change, made here to allow scheduler to call the function without circular import problems
+# call it inside a UnitOfWork to do all its writes in a single transaction, mails are only sent after the commit
 def resolve_solicitation_state_change(uhss_data, transition, next_ss_data, parsed_user_data, student_token, advisor_token):
     
     # updates actual user state
@@ -157,7 +162,7 @@ def resolve_solicitation_state_change(uhss_data, transition, next_ss_data, parse
         if not user_has_next_ss:
             return "Erro ao criar o novo estado da solicitação do usuário", 500
 
-        next_ss_transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(transition["solicitation_state_id_to"])
+        next_ss_transitions = WorkflowRepository.read_solicitation_state_transitions(transition["solicitation_state_id_to"])
 
         # updates user solicitation data and changes its actual state
         uhs = SolicitationRepository.update_user_solicitation(uhss_data["user_has_solicitation_id"], parsed_user_data, transition["solicitation_state_id_to"])
@@ -175,20 +180,21 @@ def resolve_solicitation_state_change(uhss_data, transition, next_ss_data, parse
             return "Erro ao atualizar a solicitação do usuário", 500
     
     # send mails
-    transition_mails = SolicitationStateTransitionRepository.read_solicitation_state_transition_mails(transition["id"])
+    transition_mails = WorkflowRepository.read_solicitation_state_transition_mails(transition["id"])
+    template_context = util.sysconf.get_template_context(student_token, advisor_token)
     for mail in transition_mails:
       
         # parses mail subject and body
-        parsed_subject = util.sysconf.sistem_str_parser(mail["mail_subject"], student_token, advisor_token)
-        parsed_body = util.sysconf.sistem_str_parser(mail["mail_body_html"], student_token, advisor_token)
+        parsed_subject = util.sysconf.sistem_str_parser(mail["mail_subject"], template_context=template_context)
+        parsed_body = util.sysconf.sistem_str_parser(mail["mail_body_html"], template_context=template_context)
 
         # sends mail to profiles
         if mail["is_sent_to_student"]:
-            util.syssmtpserver.add_email(student_token['institutional_email'], parsed_subject, parsed_body)
+            UnitOfWork.on_commit(util.syssmtpserver.add_email, student_token['institutional_email'], parsed_subject, parsed_body)
         if mail["is_sent_to_advisor"]:
-            util.syssmtpserver.add_email(advisor_token['institutional_email'], parsed_subject, parsed_body)
+            UnitOfWork.on_commit(util.syssmtpserver.add_email, advisor_token['institutional_email'], parsed_subject, parsed_body)
         if mail["is_sent_to_coordinator"]:
-            util.syssmtpserver.add_email(util.sysconf.coordinator_email, parsed_subject, parsed_body)
+            UnitOfWork.on_commit(util.syssmtpserver.add_email, util.sysconf.coordinator_email, parsed_subject, parsed_body)
 
     return {}, 200
 
@@ -215,17 +221,22 @@ def schedule_transitions(user_has_state_id, state_transitions):
                 if not scheduling_state_transition:
                     return "Erro ao realizar o agendamento da transição"
 
-                # insert event to the scheduler
-                util.sysscheduler.add_transition(scheduling.id, send_date_time, user_has_state_id, transition["id"], resolve_scheduled_solicitation)
+                # insert event to the scheduler after the scheduling is committed
+                UnitOfWork.on_commit(
+                    util.sysscheduler.add_transition, scheduling.id, send_date_time, user_has_state_id, transition["id"], resolve_scheduled_solicitation
+                )
 
-                print(f"# Added transition {transition['id']} to event Scheduler!")
+                logging.debug(f"Added transition {transition['id']} to event Scheduler")
 
 def remove_scheduled_solicitations(user_has_state_id):
 
     schedulings = SchedulingsRepository.read_schedulings(user_has_state_id)
-    for sch in schedulings:
-        util.sysscheduler.remove_event(sch.id)
-        SchedulingRepository.update_scheduling(sch.id, "Canceled")
+    scheduling_ids = [sch.id for sch in schedulings]
+
+    # cancels all with a single update and removes their events after it is committed
+    SchedulingsRepository.update_schedulings(scheduling_ids, "Canceled")
+    for scheduling_id in scheduling_ids:
+        UnitOfWork.on_commit(util.sysscheduler.remove_event, scheduling_id)
 
 def resolve_scheduled_solicitation(event_id, user_has_state_id, transition_id):
     
@@ -233,30 +244,29 @@ def resolve_scheduled_solicitation(event_id, user_has_state_id, transition_id):
     state_user_ids = SolicitationRepository.read_solicitation_state_user_ids(user_has_state_id)
 
     if not state_user_ids:
-        print(f"# EventScheduler thread {threading.get_ident()}: Error: Usuario não possui o estado da solicitação", 401)
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Error: Usuario não possui o estado da solicitação")
         return
 
     # get student and advisor tokens to parse the strings from dynamic page components and e-mails
-    student_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["student_id"])
-    advisor_token = UserProfileTokenRepository.read_user_profile_token(state_user_ids["advisor_id"])
+    student_token, advisor_token = UserProfileTokenRepository.read_state_user_profile_tokens(state_user_ids)
 
     # gets user solicitation and state data 
     formatted_uhss = SolicitationRepository.read_user_solicitation_state(user_has_state_id, convert_dates_to_str=False)
     if not formatted_uhss:
-        print(f"# EventScheduler thread {threading.get_ident()}: Error: Estado do usuário não encontrado", 404)
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Error: Estado do usuário não encontrado")
         return "Estado do usuário não encontrado", 404
 
     # Verify solicitation args correcteness
-    print(f"# EventScheduler thread {threading.get_ident()}: Validating data")
+    logging.debug(f"EventScheduler thread {threading.get_ident()}: Validating data")
     is_allowed, error_msg = is_solicitation_edition_allowed(formatted_uhss)
     if not is_allowed:
-        print(f"# EventScheduler thread {threading.get_ident()}: Error: {error_msg}", 401)
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Error: {error_msg}")
         return
     
     # gets sstate transitions and validade
-    transitions = SolicitationStateTransitionsRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
+    transitions = WorkflowRepository.read_solicitation_state_transitions(formatted_uhss["state_id"])
     if not transitions or len(transitions) == 0:
-        print(f"# EventScheduler thread {threading.get_ident()}: Error: Transições da solicitação inválidas", 500)
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Error: Transições da solicitação inválidas")
         return "", 500
 
     transition = None
@@ -266,26 +276,30 @@ def resolve_scheduled_solicitation(event_id, user_has_state_id, transition_id):
             break
 
     if transition == None:
-        print(f"# EventScheduler thread {threading.get_ident()}: Transição não encontrada para este estado", 404)
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Transição não encontrada para este estado")
         return
     
     # gets next sstate data
-    next_ss_data = SolicitationRepository.read_solicitation_state(transition["solicitation_state_id_to"])\
+    next_ss_data = WorkflowRepository.read_solicitation_state(transition["solicitation_state_id_to"])\
         if transition["solicitation_state_id_to"] else None
 
     # get parsed solicitation user data using old and new data
     parsed_user_Data = parse_new_old_solicitation_user_data(formatted_uhss["solicitation_user_data"], None)
 
-    # resolve solicitation change
-    response, status = resolve_solicitation_state_change(formatted_uhss, transition, next_ss_data, parsed_user_Data, student_token, advisor_token)
+    # resolve solicitation change and finishes the event in a single transaction
+    with UnitOfWork() as unit_of_work:
+        response, status = resolve_solicitation_state_change(formatted_uhss, transition, next_ss_data, parsed_user_Data, student_token, advisor_token)
+
+        if status != 200:
+            unit_of_work.rollback()
+        else:
+            SchedulingRepository.update_scheduling(event_id, "Sended")
 
     # check for errors
     if status != 200:
-        print(f"# EventScheduler thread {threading.get_ident()}: Scheduled solicitation resolve error: {response}")
+        logging.warning(f"EventScheduler thread {threading.get_ident()}: Scheduled solicitation resolve error: {response}")
         return
     else:
-        # sends the event to finish it
-        SchedulingRepository.update_scheduling(event_id, "Sended")
-        print(f"# EventScheduler thread {threading.get_ident()}: Done without errors")
+        logging.info(f"EventScheduler thread {threading.get_ident()}: Done without errors")
     
     return
\ No newline at end of file
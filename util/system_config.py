@@ -14,7 +14,8 @@ import os
 import requests
 import traceback
 
-from repositories import ConfigRepository, ConfigsRepository
+from repositories import ConfigRepository, ConfigsRepository, WorkflowRepository
+from .template import render_template, TemplateContext
 
 logging = logging.getLogger(__name__)
 
@@ -25,7 +26,6 @@ class SystemConfiguration():
         self.coordinator_name = None
         self.key_files_path = None
         self.user_files_path = None
-        self.holiday_data = None
     
     def load_sys_config(self):
         
@@ -93,16 +93,24 @@ class SystemConfiguration():
             for holiday in holidays_res:
                 actual_config_year_holiday = ConfigRepository.create_config_year_holiday(
                     actual_config_year.year, 'API', holiday["name"], holiday["date"])
+
+            # the new configs change the version of the configs responses
+            WorkflowRepository.invalidate()
             
-        self.holiday_data = ConfigsRepository.read_config_year_holidays(actual_year)
+        # warms the holidays cache shared with the other workers
+        ConfigsRepository.read_config_year_holidays(actual_year)
 
         logging.info("Holidays loaded")
 
+    @property
+    def holiday_data(self):
+        """ The formatted holidays of this year, read from the repository cache """
+        return ConfigsRepository.read_config_year_holidays(str(datetime.today().year))
+
     def get_key_files_path(self):
-        return self.key_files_path / "private-key.pem", self.key_files_path / "public-key.pem"
+        return self.key_files_path
     
     def get_user_file_path(self, user_file_hash):
-        print(self.user_files_path, user_file_hash)
         return self.user_files_path / user_file_hash
 
     @staticmethod
@@ -145,66 +153,18 @@ class SystemConfiguration():
 
         return raw_str[substr_start:substr_end+3]
 
-    # PARSER - parses a given string changing text commands to user data
-    def sistem_str_parser(self, raw_str, student_data=None, advisor_data=None):
+    # creates the user values used by the PARSER, build it once to parse many strings of the same users
+    def get_template_context(self, student_data=None, advisor_data=None):
+        return TemplateContext(student_data, advisor_data, self.coordinator_name)
 
-        student_profile = None
+    # PARSER - parses a given string changing text commands to user data
+    #   the string is compiled once and cached, a template_context avoids rebuilding the user values
+    def sistem_str_parser(self, raw_str, student_data=None, advisor_data=None, template_context=None):
 
         if not raw_str:
             return None
-  
-        if student_data:
-            student_profile = SystemConfiguration.get_user_token_profile(student_data, "STU")
-        if advisor_data:
-            advisor_profile = SystemConfiguration.get_user_token_profile(advisor_data, "ADV")
-  
-        parser_substr = SystemConfiguration.get_parser_substring(raw_str)
-        while parser_substr:
-            command = parser_substr.replace("[[[",'').replace("]]]",'').strip()
-
-            # single attributes parsing
-            # replace command with names
-            if "studentName" in command:
-                raw_str = raw_str.replace(parser_substr, student_data.get("user_name") if student_data else "")
-            elif "advisorName" in command:
-                raw_str = raw_str.replace(parser_substr, advisor_data.get("user_name") if advisor_data else "")
-            elif "coordinatorName" in command:
-                raw_str = raw_str.replace(parser_substr, self.coordinator_name)
-    
-            # replace with matricula
-            elif "studentMatricula" in command:
-                raw_str = raw_str.replace(parser_substr, student_profile.get("matricula") if student_profile else "")
-    
-            # replace with student course
-            elif "studentCourse" in command:
-                raw_str = raw_str.replace(parser_substr, student_profile.get("course") if student_profile else "")
-    
-            # replace with advisor siape
-            elif "advisorSiape" in command:
-                raw_str = raw_str.replace(parser_substr, advisor_profile.get("siape") if advisor_profile else "")
-      
-            # conditional parsing
-            elif ":::" in command:
-      
-                # gender differences
-                if "ifStudentMale?" in command and student_data and student_data.get("gender"):
-                    raw_str = raw_str.replace(parser_substr, command.replace("ifStudentMale?",'').split(":::")
-                        [ 0 if student_data["gender"] == 'M' else 1 ])
-                elif "ifAdvisorMale?" in command and advisor_data and advisor_data.get("gender"):
-                    raw_str = raw_str.replace(parser_substr, command.replace("ifAdvisorMale?",'').split(":::")
-                        [ 0 if advisor_data["gender"] == 'M' else 1 ])
-
-                # course differences, works only with students
-                elif "ifBCCStudent?" in command and student_profile and student_profile.get("course"):
-                    raw_str = raw_str.replace(parser_substr, command.replace("ifBCCStudent?",'').split(":::")
-                        [ 0 if student_profile["course"] == "BCC" else 1 ])
-                
-                # avoid loops when not configured correctly
-                else:
-                    raw_str = raw_str.replace(parser_substr, '')
-            else:
-                raw_str = raw_str.replace(parser_substr, '')
-
-            parser_substr = SystemConfiguration.get_parser_substring(raw_str)
-  
-        return raw_str
\ No newline at end of file
+
+        if not template_context:
+            template_context = self.get_template_context(student_data, advisor_data)
+
+        return render_template(raw_str, template_context)
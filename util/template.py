@@ -0,0 +1,123 @@
+"""
+Template
+
+Compiles the [[[ ]]] commands of the dynamic strings once, so each render is a single pass over the compiled parts
+"""
+
+from functools import lru_cache
+
+import logging
+
+logging = logging.getLogger(__name__)
+
+# quantity of compiled templates kept by each worker
+TEMPLATE_CACHE_SIZE = 4096
+
+# conditional commands in their resolution order, with the context flag that chooses between their two texts
+CONDITIONAL_COMMANDS = (
+    ("ifStudentMale?", "student_male"),
+    ("ifAdvisorMale?", "advisor_male"),
+    ("ifBCCStudent?", "student_bcc")
+)
+
+class TemplateContext:
+    """ The user values used by the template commands, built once and reused to render many templates
+        Conditional flags are None when the data needed to resolve them is missing """
+
+    def __init__(self, student_data=None, advisor_data=None, coordinator_name=None):
+
+        student_profile = TemplateContext.get_user_token_profile(student_data, "STU")
+        advisor_profile = TemplateContext.get_user_token_profile(advisor_data, "ADV")
+
+        self.student_name = (student_data.get("user_name") if student_data else None) or ""
+        self.advisor_name = (advisor_data.get("user_name") if advisor_data else None) or ""
+        self.coordinator_name = coordinator_name or ""
+        self.student_matricula = (student_profile.get("matricula") if student_profile else None) or ""
+        self.student_course = (student_profile.get("course") if student_profile else None) or ""
+        self.advisor_siape = (advisor_profile.get("siape") if advisor_profile else None) or ""
+
+        self.student_male = student_data["gender"] == "M" if student_data and student_data.get("gender") else None
+        self.advisor_male = advisor_data["gender"] == "M" if advisor_data and advisor_data.get("gender") else None
+        self.student_bcc = student_profile["course"] == "BCC" if student_profile and student_profile.get("course") else None
+
+    @staticmethod
+    def get_user_token_profile(user_token, profile_acronym):
+        """ Returns a specific profile object from a user jwt token """
+
+        if not user_token or not user_token.get("profiles"):
+            return None
+
+        for profile in user_token["profiles"]:
+            if profile["profile_acronym"] == profile_acronym:
+                return profile
+
+        return None
+
+def compile_command(command):
+    """ Compiles the text inside a [[[ ]]] to a function that returns its value from a TemplateContext """
+
+    # single attributes
+    if "studentName" in command:
+        return lambda context: context.student_name
+    elif "advisorName" in command:
+        return lambda context: context.advisor_name
+    elif "coordinatorName" in command:
+        return lambda context: context.coordinator_name
+    elif "studentMatricula" in command:
+        return lambda context: context.student_matricula
+    elif "studentCourse" in command:
+        return lambda context: context.student_course
+    elif "advisorSiape" in command:
+        return lambda context: context.advisor_siape
+
+    # conditionals, the first one with its data in the context chooses the text, the text is empty if none has
+    elif ":::" in command:
+        conditionals = [
+            (flag, command.replace(condition, "").split(":::"))
+            for condition, flag in CONDITIONAL_COMMANDS if condition in command
+        ]
+
+        def conditional(context):
+            for flag, texts in conditionals:
+                value = getattr(context, flag)
+                if value != None:
+                    return texts[0 if value else 1]
+            return ""
+
+        return conditional
+
+    return lambda context: ""
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(raw_str):
+    """ Compiles a template to a tuple of literal texts and command functions, cached by the template text
+        A [[[ without its ]]] stops the compilation, keeping the rest of the text as it is """
+
+    parts = []
+    position = 0
+
+    while True:
+        command_start = raw_str.find("[[[", position)
+        if command_start == -1:
+            break
+
+        command_end = raw_str.find("]]]", command_start)
+        if command_end == -1:
+            logging.warning("Error while parsing an string, parser not closed")
+            break
+
+        if command_start > position:
+            parts.append(raw_str[position:command_start])
+
+        command = raw_str[command_start:command_end+3].replace("[[[", "").replace("]]]", "").strip()
+        parts.append(compile_command(command))
+        position = command_end + 3
+
+    if position < len(raw_str):
+        parts.append(raw_str[position:])
+
+    return tuple(parts)
+
+def render_template(raw_str, context):
+    """ Renders a template with the values of a TemplateContext """
+    return "".join(part if isinstance(part, str) else part(context) for part in compile_template(raw_str))